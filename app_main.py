@@ -30,11 +30,25 @@ with st.sidebar:
     
     st.divider()
     # === ОСЬ ЦЯ КНОПКА ===
-    # Вона очищує кеш (змушує програму заново скачати дані з Google)
-    # і перезапускає скрипт, не гублячи логін лікаря
+    # Вона скидає кеш джерел даних (змушує програму заново перевірити таблиці Google)
+    # і перезапускає скрипт, не гублячи логін лікаря. Інші кеші не чіпаються.
     if st.button("🔄 Перевірити нові відповіді", type="primary"):
-        st.cache_data.clear()
+        data_manager.invalidate()
+        with st.spinner("Перевіряємо нові відповіді..."):
+            data_manager.refresh(wait=True)
         st.rerun()
+
+    # Заміри етапів оновлення - лише для адміністративних ролей
+    if auth.is_privileged():
+        patient_view.show_timings()
+        # Колонки форм, які не розпізнались (перейменували питання в Google Формі)
+        patient_view.show_schema_warnings()
+        # Нового лікаря додали в таблицю користувачів - не чекаємо USERS_TTL
+        if st.button("👥 Оновити список користувачів"):
+            try:
+                st.success(f"Користувачів у таблиці: {auth.refresh_users()}")
+            except Exception as e:
+                st.error(f"Помилка з'єднання з базою користувачів: {e}")
         
     st.divider()
     if st.button("🚪 Вийти з системи", type="secondary"):
@@ -53,6 +67,7 @@ st.title("Головна панель")
 try:
     with st.spinner("🔄 Отримання свіжих даних з бази пацієнтів..."):
         # Ця функція має завантажити всі 6 форм, об'єднати їх і порахувати бали
+        # (чекати доводиться лише при найпершому запуску - далі оновлення йде у фоні)
         df = data_manager.get_processed_data()
         
 except Exception as e:
@@ -65,3 +80,11 @@ if df.empty:
     st.info("📭 База даних поки що порожня. Чекаємо на перших пацієнтів.")
 else:
     patient_view.show_dashboard(df)
+
+    # Пацієнти, що через описку в ПІБ не злилися з анкетою лікаря
+    patient_view.show_link_proposals(df)
+
+    # Пакетний друк - лише для адміністративних ролей
+    if auth.is_privileged():
+        st.divider()
+        patient_view.show_batch_export(df)
@@ -0,0 +1,178 @@
+"""
+Еталон для перевірки: оригінальний порядковий підрахунок балів і вердиктів,
+яким він був до оптимізацій (apply по рядках, пошук колонок на кожен виклик).
+Не використовується застосунком - лише benchmarks.run порівнює з ним результати.
+Словники балів беремо з modules/questionnaires.py, щоб еталон не розходився з ними.
+"""
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from modules.questionnaires import (FINDRISC_MAPPING, POINTS_MAP_AUDIT, POINTS_MAP_GAD,
+                                    POINTS_MAP_PHQ, POINTS_MAP_SMOKE)
+
+
+def parse_dates(values):
+    return pd.to_datetime(values, dayfirst=True, errors='coerce')
+
+
+def calculate_age(born):
+    if pd.isnull(born): return 0
+    today = datetime.today()
+    try:
+        return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+    except: return 0
+
+
+def calculate_section_score(df, tag, mapping):
+    cols = [c for c in df.columns if tag in c]
+    if not cols: return 0
+    return df[cols].apply(lambda x: x.map(mapping)).fillna(0).sum(axis=1)
+
+
+def get_depression_verdict(s):
+    if s >= 20: return "🔴 Тяжка депресія"
+    if s >= 15: return "🟠 Середньої тяжкості депресія"
+    if s >= 10: return "🟡 Помірної тяжкості депресія"
+    if s >= 5:  return "🟢 Легка («субклінічна») депресія"
+    return "⚪ Депресія відсутня"
+
+def get_gad7_verdict(s):
+    if s >= 15: return "🔴 Клінічно значимі симптоми"
+    if s >= 10: return "🟠 Помірні симптоми"
+    if s >= 5:  return "🟡 Легкі симптоми"
+    return "🟢 Без симптомів"
+
+def get_smoke_verdict(s):
+    if s >= 8: return "🔴 Дуже високий рівень нікотинової залежності"
+    if s >= 6: return "🟠 Високий рівень нікотинової залежності"
+    if s >= 1: return "🟡 Низький рівень нікотинової залежності"
+    return "🟢 Без нікотинової залежності"
+
+def get_audit_verdict(s):
+    if s >= 20: return "🔴 Можлива алкогольна залежність"
+    if s >= 8: return "🟠 Споживання з високим ризиком"
+    if s >= 1: return "🟡 Споживання з низьким ризиком"
+    return "🟢 Ймовірно пацієнт утримується від споживання"
+
+def get_findrisc_verdict(s):
+    if s > 20: return "🔴 Дуже високий ризик: 1 із 2 (50%)"
+    if s >= 15: return "🟠 Високий ризик: 1 із 3 (33%)"
+    if s >= 12: return "🟡 Помірний ризик: 1 із 6 (16%)"
+    if s >= 7: return "🟢 Дещо підвищений ризик: 1 із 25 (4%)"
+    return "✅ Низький ризик: 1 із 100 (1%)"
+
+
+def get_score2_verdict_row(row):
+    sex = row.get('Вкажіть стать', 'Не вказано')
+    smoke = row.get('[SCORE2] Куріння тютюнових виробів', 'Ні')
+    age = int(row.get('Вік', 0))
+    sbp = float(row.get('[SCORE2] Систолічний артеріальний тиск', 0))
+    chol = float(row.get('[SCORE2] Рівень non-HDL холестерину (ммоль/л)', 0))
+
+    if age == 0: return "⚪ Недостатньо даних (Вік)"
+    if chol <= 0: return "⚪ Введіть холестерин"
+
+    def is_green():
+        if sex == 'жінка' and smoke == 'Ні':
+            if age < 45 and sbp < 120 and chol <= 5: return True
+            if 49 < age < 55 and sbp < 120 and chol <= 3: return True
+        return False
+
+    def is_yellow():
+        if sbp >= 180 or chol >= 8: return False
+        if sex == 'жінка':
+            if smoke == 'Ні':
+                if age < 50: return True
+                if 50 <= age < 55: return not (sbp >= 160 or (sbp >= 140 and chol >= 6))
+                if 55 <= age < 60: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
+                if 60 <= age < 70: return not (sbp >= 140 or chol >= 6)
+                if 70 <= age < 90: return not (sbp >= 160 or chol >= 7)
+            else:
+                if age < 50: return not (sbp >= 160 or (sbp >= 140 and chol >= 6))
+                if 50 <= age < 55: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
+                if 55 <= age < 70: return not (sbp >= 140 or (sbp >= 120 and chol >= 5))
+                if 70 <= age < 90: return not (sbp >= 140 or chol >= 6)
+        elif sex == 'чоловік':
+            if smoke == 'Ні':
+                if age < 50: return not (sbp >= 160 or (sbp >= 140 and chol >= 6))
+                if 50 <= age < 55: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
+                if 55 <= age < 70: return not (sbp >= 140 or chol >= 6)
+                if 70 <= age < 90: return not (sbp >= 140 or chol >= 6)
+            else:
+                if age < 50: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
+                if 50 <= age < 55: return not (sbp >= 140 or chol >= 6)
+                if 55 <= age < 70: return not (sbp >= 120 or chol >= 4)
+                if 70 <= age < 90: return not (sbp >= 120 or chol >= 5)
+        return False
+
+    if is_green(): return "🟢 Низький ризик"
+    elif is_yellow(): return "🟡 Помірний ризик"
+    else: return "🔴 Високий ризик"
+
+
+def to_float_safe(series):
+    return pd.to_numeric(series.astype(str).str.replace(',', '.', regex=False), errors='coerce').fillna(0)
+
+
+def process_patient_data(df):
+    df = df.copy()
+    df['Score_PHQ'] = calculate_section_score(df, '[PHQ]', POINTS_MAP_PHQ)
+    df['Verdict_PHQ'] = df['Score_PHQ'].apply(get_depression_verdict)
+    df['Score_GAD'] = calculate_section_score(df, '[GAD]', POINTS_MAP_GAD)
+    df['Verdict_GAD'] = df['Score_GAD'].apply(get_gad7_verdict)
+
+    smoke_qty_col = '[Паління] 4. Скільки сигарет ви викурюєте на день?'
+    found_col = next((c for c in df.columns if "[Паління] 4." in c), None)
+    if found_col:
+        df[found_col] = to_float_safe(df[found_col])
+        df[found_col] = pd.cut(df[found_col], bins=[-1, 10, 20, 30, float('inf')], labels=[0, 1, 2, 3]).astype(int)
+        if found_col != smoke_qty_col: df[smoke_qty_col] = df[found_col]
+
+    df['Score_Smoke'] = calculate_section_score(df, '[Паління]', POINTS_MAP_SMOKE)
+    df['Verdict_Smoke'] = df['Score_Smoke'].apply(get_smoke_verdict)
+    df['Score_Audit'] = calculate_section_score(df, '[ AUDIT]', POINTS_MAP_AUDIT)
+    df['Verdict_Audit'] = df['Score_Audit'].apply(get_audit_verdict)
+    df['Status_Patient_Done'] = True
+    return df
+
+
+def process_doctor_data(df):
+    df = df.copy()
+    col_sbp = next((c for c in df.columns if "Систолічний" in c and "SCORE2" in c), None)
+    col_chol = next((c for c in df.columns if "non-HDL" in c and "SCORE2" in c), None)
+    if col_sbp: df['[SCORE2] Систолічний артеріальний тиск'] = to_float_safe(df[col_sbp])
+    if col_chol: df['[SCORE2] Рівень non-HDL холестерину (ммоль/л)'] = to_float_safe(df[col_chol])
+
+    df['Score_FINDRISK'] = 0
+    for col_name, mapping in FINDRISC_MAPPING.items():
+        actual_col = next((c for c in df.columns if col_name.strip() in c), None)
+        if actual_col:
+            df['Score_FINDRISK'] += df[actual_col].map(mapping).fillna(0)
+
+    if 'Вік' in df.columns:
+        age_points = pd.cut(df['Вік'], bins=[0, 44, 54, 64, float('inf')], labels=[0, 2, 3, 4], include_lowest=True).fillna(0).astype(int)
+        df['Score_FINDRISK'] += age_points
+
+    col_bmi = next((c for c in df.columns if "ІМТ (кг/м2)" in c), None)
+    if col_bmi:
+        bmi_points = pd.cut(to_float_safe(df[col_bmi]), bins=[0, 25, 30, float('inf')], labels=[0, 1, 3], include_lowest=True, right=False).fillna(0).astype(int)
+        df['Score_FINDRISK'] += bmi_points
+
+    col_waist = next((c for c in df.columns if "Окружність талії" in c), None)
+    col_sex = 'Вкажіть стать'
+    if col_waist and col_sex in df.columns:
+        waist_numeric = to_float_safe(df[col_waist])
+        is_male = df[col_sex].astype(str).str.lower() == 'чоловік'
+        conditions = [
+            (is_male & (waist_numeric > 102)) | (~is_male & (waist_numeric > 88)),
+            (is_male & (waist_numeric > 94)) | (~is_male & (waist_numeric > 80))
+        ]
+        df['Score_FINDRISK'] += np.select(conditions, [4, 3], default=0)
+
+    df['Verdict_FINDRISK'] = df['Score_FINDRISK'].apply(get_findrisc_verdict)
+    df['Status_Doctor_Done'] = True
+    return df
+
+
+def score2_verdicts(df):
+    return df.apply(get_score2_verdict_row, axis=1)
@@ -0,0 +1,201 @@
+"""
+Заміри швидкодії конвеєра на синтетичних даних і перевірка вердиктів.
+
+    python -m benchmarks.run --rows 100000
+    python -m benchmarks.run --data bench_data --pdf 20 --check-rows 5000
+
+Кожен етап get_processed_data міряється окремо (читання, підготовка форм,
+бали лікаря/пацієнта, злиття, виправлення, SCORE2, стиснення типів, пошук
+збігів ПІБ), потім - увесь конвеєр застосунку (холодний старт, повторне
+оновлення без змін, виправлення одного пацієнта з дашборду, оновлення після
+кількох нових анкет) і генерація PDF.
+Наприкінці бали й вердикти порівнюються з еталоном (benchmarks/reference.py);
+якщо хоч один не збігся - код виходу 1.
+"""
+import argparse
+import sys
+import tempfile
+import time
+import pandas as pd
+from benchmarks import reference, synthetic
+from modules import compact, data_manager, dates, journal, linkage, pdf_gen, report, score2, snapshot
+
+DOCTOR_CONF, PATIENT_CONF = data_manager.FORMS_CONFIG
+CHOL_COL = score2.CHOL_COL
+
+
+class Timer:
+    """Збирає (етап, секунди, рядків) у порядку виконання."""
+
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, stage, func, *args, rows=None):
+        started = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - started
+        if rows is None: rows = len(result) if hasattr(result, "__len__") else 0
+        self.rows.append((stage, seconds, rows))
+        return result
+
+    def table(self):
+        width = max(len(stage) for stage, _, _ in self.rows)
+        lines = [f"{'Етап':<{width}}  {'час, с':>9}  {'рядків':>9}  {'мкс/рядок':>10}"]
+        for stage, seconds, rows in self.rows:
+            per_row = f"{seconds / rows * 1e6:10.2f}" if rows else f"{'':>10}"
+            lines.append(f"{stage:<{width}}  {seconds:9.3f}  {rows:9d}  {per_row}")
+        return "\n".join(lines)
+
+
+def _with_age(df):
+    df = df.copy()
+    df['Вік'] = dates.ages(df['Дата народження'])
+    return df
+
+
+def bench_stages(timer, paths):
+    """Етапи _build_processed_data окремо, на вже прочитаних CSV."""
+    raw_doc = timer("read_csv: лікар", lambda: pd.read_csv(paths["doctor"]).fillna(0))
+    raw_pat = timer("read_csv: пацієнт", lambda: pd.read_csv(paths["patient"]).fillna(0))
+    raw_corr = timer("read_csv: виправлення", lambda: pd.read_csv(paths["corrections"]).fillna(""))
+
+    doc = timer("підготовка форми: лікар", data_manager._prepare_form, raw_doc, DOCTOR_CONF)
+    pat = timer("підготовка форми: пацієнт", data_manager._prepare_form, raw_pat, PATIENT_CONF)
+    doc = timer("вік: лікар", _with_age, doc)
+    pat = timer("вік: пацієнт", _with_age, pat)
+
+    doc_scored = timer("process_doctor_data", data_manager.process_doctor_data, doc)
+    pat_scored = timer("process_patient_data", data_manager.process_patient_data, pat)
+    merged = timer("злиття форм", data_manager._merge_forms, [doc_scored, pat_scored])
+    corr = timer("підготовка виправлень", data_manager._prepare_corrections, raw_corr)
+    timer("SCORE2 (лише вердикти)", score2.score2_verdicts, merged)
+    full = timer("виправлення + SCORE2 + статуси", data_manager._apply_corrections_and_finalize, merged, corr)
+    timer("стиснення типів", lambda: data_manager.compact_cohort(full)[0])
+    timer("пошук збігів ПІБ", linkage.propose, full)
+    return raw_doc, doc, pat
+
+
+def append_submissions(paths, count, seed):
+    """Дописує в CSV форм анкети ще count пацієнтів - як нові відповіді з Google Форми."""
+    doctor, patient, _ = synthetic.generate(count, seed)
+    doctor.to_csv(paths["doctor"], mode="a", header=False, index=False)
+    patient.to_csv(paths["patient"], mode="a", header=False, index=False)
+    data_manager.invalidate()
+    return data_manager.get_fresh_data()
+
+
+def bench_pipeline(timer, paths, new_rows=0, seed=0):
+    """
+    Увесь конвеєр застосунку: холодний старт, повторне оновлення без змін у джерелах
+    і (new_rows > 0) оновлення після кількох нових анкет - перебудовуються лише їхні рядки.
+    """
+    data_manager.set_source_url("doctor_form", paths["doctor"])
+    data_manager.set_source_url("patient_form", paths["patient"])
+    data_manager.set_source_url("corrections", paths["corrections"])
+    cohort = timer("get_processed_data: холодний", data_manager.get_fresh_data)
+    data_manager.invalidate()
+    timer("get_processed_data: без змін", data_manager.get_fresh_data)
+    timer("виправлення з дашборду (1 пацієнт)", data_manager.record_correction, cohort.iloc[0], "chol", 6.5, rows=1)
+    if new_rows:
+        timer(f"get_processed_data: +{new_rows} анкет", append_submissions, paths, new_rows, seed + 1, rows=new_rows)
+    timer("process_sources (CLI, шматками)", data_manager.process_sources,
+          paths["doctor"], paths["patient"], paths["corrections"])
+    return cohort
+
+
+def bench_pdf(timer, cohort, count):
+    """build_print_dict + create_report для перших count пацієнтів (без кешу PDF)."""
+    records = [cohort.iloc[i] for i in range(min(count, len(cohort)))]
+    if not records: return
+    date_str = time.strftime("%d.%m.%Y")
+    dicts = timer("build_print_dict", lambda: [report.build_print_dict(r) for r in records])
+
+    def render():
+        for record, data_dict in zip(records, dicts):
+            pdf = pdf_gen.create_report(patient_name=str(record['ПІБ']), date_str=date_str,
+                                        verdict=report.SUMMARY_TEXT, score="", data_dict=data_dict)
+            if pdf.startswith(b"ERROR"): raise RuntimeError(pdf.decode("utf-8", "replace"))
+        return records
+    timer("pdf_gen.create_report", render)
+
+
+def _mismatches(ours, theirs, columns):
+    """Колонки, де значення розходяться: [(колонка, скільки рядків)]."""
+    bad = []
+    for col in columns:
+        a = ours[col].astype(object).reset_index(drop=True)
+        b = theirs[col].astype(object).reset_index(drop=True)
+        same = (a == b) | (a.isna() & b.isna())
+        numeric = pd.to_numeric(a, errors="coerce"), pd.to_numeric(b, errors="coerce")
+        same |= (numeric[0] - numeric[1]).abs() < 1e-9
+        if not same.all(): bad.append((col, int((~same).sum())))
+    return bad
+
+
+def check_verdicts(raw_doc, doc, pat, sample):
+    """Дати, вік, бали і вердикти оптимізованого конвеєра проти еталонного порядкового коду."""
+    raw_dob = raw_doc['Дата народження'].head(sample)
+    doc = doc.head(sample)
+    pat = pat.head(sample)
+    # Старий розбір на суміші форматів частину дат губить (NaT) - звіряємо ті, що він розібрав
+    ours_dob, ref_dob = dates.birth_dates(raw_dob), reference.parse_dates(raw_dob)
+    parsed = ref_dob.notna()
+    ours_doc, ref_doc = data_manager.process_doctor_data(doc), reference.process_doctor_data(doc)
+    ours_pat, ref_pat = data_manager.process_patient_data(pat), reference.process_patient_data(pat)
+    results = {
+        "дати народження": _mismatches(pd.DataFrame({"dob": ours_dob[parsed]}), pd.DataFrame({"dob": ref_dob[parsed]}), ["dob"]),
+        "вік": _mismatches(pd.DataFrame({"age": dates.ages(doc['Дата народження'])}),
+                           pd.DataFrame({"age": doc['Дата народження'].apply(reference.calculate_age)}), ["age"]),
+        "лікар": _mismatches(ours_doc, ref_doc, ["Score_FINDRISK", "Verdict_FINDRISK"]),
+        "пацієнт": _mismatches(ours_pat, ref_pat, [f"{kind}_{tag}" for tag in ("PHQ", "GAD", "Smoke", "Audit")
+                                                   for kind in ("Score", "Verdict")]),
+    }
+    # SCORE2 - з різним холестерином, щоб зачепити всі гілки (порожній, межові, високий)
+    score_df = ours_doc.copy()
+    for chol in [None, 0, 3, 4, 5, 6, 7, 8]:
+        if chol is not None: score_df[CHOL_COL] = chol
+        ours = pd.DataFrame({"Verdict_Score2": score2.score2_verdicts(score_df)})
+        theirs = pd.DataFrame({"Verdict_Score2": reference.score2_verdicts(score_df)})
+        label = "з форми" if chol is None else chol
+        results[f"SCORE2, холестерин {label}"] = _mismatches(ours, theirs, ["Verdict_Score2"])
+    return results, len(doc) + len(pat)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Заміри швидкодії конвеєра скринінгу")
+    parser.add_argument("--rows", type=int, default=10_000, help="Скільки пацієнтів згенерувати")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", help="Папка з doctor.csv/patient.csv/corrections.csv (замість генерації)")
+    parser.add_argument("--new-rows", type=int, default=50, help="Скільки нових анкет дописати для замірів оновлення")
+    parser.add_argument("--pdf", type=int, default=20, help="Скільки PDF-звітів згенерувати")
+    parser.add_argument("--check-rows", type=int, default=5_000, help="Скільки рядків звіряти з еталоном")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Знімок застосунку - у тимчасову папку, щоб не зачепити робочий .snapshot
+        snapshot.SNAPSHOT_DIR = tmp
+        linkage.LINKS_FILE = tmp + "/patient_links.json"
+        journal.JOURNAL_FILE = tmp + "/corrections_journal.db"
+        timer = Timer()
+        if args.data:
+            paths = {name: f"{args.data}/{name}.csv" for name in ("doctor", "patient", "corrections")}
+        else:
+            paths = timer("генерація синтетичних CSV", synthetic.write, tmp + "/data", args.rows, args.seed,
+                          rows=args.rows)
+
+        raw_doc, doc, pat = bench_stages(timer, paths)
+        # Свої дані (--data) не чіпаємо: нові анкети дописуємо лише до згенерованих
+        cohort = bench_pipeline(timer, paths, 0 if args.data else args.new_rows, args.seed)
+        bench_pdf(timer, cohort, args.pdf)
+        print(timer.table())
+
+        results, checked = check_verdicts(raw_doc, doc, pat, args.check_rows)
+        failed = {name: bad for name, bad in results.items() if bad}
+        print(f"\nЗвірка з еталоном ({checked} рядків):")
+        for name, bad in results.items():
+            print(f"  {'❌' if bad else '✅'} {name}: {bad or 'збігається'}")
+        return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Синтетичні таблиці для замірів: анкета лікаря, анкета пацієнта і виправлення.
+
+    python -m benchmarks.synthetic --rows 100000 --out bench_data
+
+Заголовки - як у справжніх формах ([PHQ], [GAD], [ AUDIT], [Паління], [Findrisc], [SCORE2]),
+дані навмисно "брудні": різні формати дат, коми в числах, зайві пробіли в ПІБ,
+повторні відправлення форми, порожні клітинки і трохи сміття.
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from modules import questionnaires
+
+PHQ_QUESTIONS = [
+    "Мало цікавості або задоволення від виконання будь-яких справ",
+    "Пригнічений настрій, депресія або відчуття безнадії",
+    "Проблеми із засинанням, переривчастий сон або надмірна сонливість",
+    "Відчуття втоми або брак енергії",
+    "Поганий апетит або переїдання",
+    "Погана думка про себе, відчуття невдачі",
+    "Труднощі з концентрацією уваги",
+    "Сповільненість рухів і мови або, навпаки, неспокій",
+    "Думки, що краще було б померти, або про самоушкодження",
+]
+GAD_QUESTIONS = [
+    "Відчуття нервозності, тривоги або сильного напруження",
+    "Неможливість зупинити або контролювати занепокоєння",
+    "Надмірне занепокоєння з різних приводів",
+    "Труднощі з розслабленням",
+    "Настільки сильний неспокій, що важко всидіти на місці",
+    "Легко дратуєтесь або стаєте роздратованими",
+    "Відчуття страху, ніби може статися щось жахливе",
+]
+# (питання, можливі відповіді)
+SMOKE_QUESTIONS = [
+    ("Як скоро після пробудження ви викурюєте першу сигарету?",
+     ["Через 1 год.", "Від 1/2 до 1 години", "Від 6 до 30 хв.", "5 хв або менше"]),
+    ("Чи важко вам утримуватися від куріння там, де воно заборонене?", ["Так", "Ні"]),
+    ("Від якої сигарети вам найважче відмовитися?", ["Першої вранці", "Будь-якої іншої"]),
+]
+SMOKE_QTY_QUESTION = "[Паління] 4. Скільки сигарет ви викурюєте на день?"
+AUDIT_FREQ = ["Ніколи", "Один раз на місяць або рідше", "2–4 рази на місяць", "2–3 рази на тиждень", "4 рази на тиждень або частіше"]
+AUDIT_QTY = ["1–2 СП", "3–4 СП", "5–6 СП", "7–9 СП", "10 СП і більше"]
+AUDIT_OFTEN = ["Ніколи", "Один раз на місяць або рідше", "Щомісяця", "Щотижня", "Щодня або майже щодня"]
+AUDIT_YES_NO = ["Ні", "Так, більше ніж 12 місяців тому", "Так, упродовж останніх 12 місяців"]
+AUDIT_QUESTIONS = [
+    ("Як часто ви вживаєте напої, що містять алкоголь?", AUDIT_FREQ),
+    ("Скільки стандартних порцій алкоголю ви випиваєте у звичайний день?", AUDIT_QTY),
+    ("Як часто ви випиваєте 6 або більше порцій за один раз?", AUDIT_OFTEN),
+    ("Як часто за останній рік ви не могли зупинитися, почавши пити?", AUDIT_OFTEN),
+    ("Як часто за останній рік через алкоголь ви не зробили того, що від вас очікували?", AUDIT_OFTEN),
+    ("Як часто вам потрібно було випити зранку, щоб прийти до тями?", AUDIT_OFTEN),
+    ("Як часто ви відчували провину або каяття після вживання алкоголю?", AUDIT_OFTEN),
+    ("Як часто ви не могли згадати, що було напередодні, через алкоголь?", AUDIT_OFTEN),
+    ("Чи були ви або інші люди травмовані через ваше вживання алкоголю?", AUDIT_YES_NO),
+    ("Чи радили вам лікар або близькі зменшити вживання алкоголю?", AUDIT_YES_NO),
+]
+
+SURNAMES = ["Шевченко", "Коваленко", "Бондаренко", "Ткаченко", "Кравченко", "Олійник", "Мельник", "Бойко",
+            "Ковальчук", "Савченко", "Петренко", "Марченко", "Руденко", "Лисенко", "Мороз", "Павленко"]
+FIRST_NAMES = ["Олександр", "Андрій", "Сергій", "Іван", "Олена", "Наталія", "Тетяна", "Ірина", "Марія", "Ольга",
+               "Юрій", "Василь", "Оксана", "Світлана", "Дмитро", "Катерина"]
+PATRONYMICS = ["Іванович", "Петрівна", "Олександрович", "Миколаївна", "Васильович", "Сергіївна", "Андрійович", "Юріївна"]
+
+# Частки "бруду"
+DUPLICATE_SHARE = 0.05   # повторне відправлення форми тим самим пацієнтом
+MESSY_NAME_SHARE = 0.05  # зайві пробіли навколо ПІБ
+VARIANT_SHARE = 0.03     # пацієнт написав ПІБ інакше, ніж лікар (регістр, подвійний пробіл, латинська "о")
+TYPO_SHARE = 0.01        # описка в ПІБ пацієнта (пропущена літера) - для пошуку збігів
+BAD_DATE_SHARE = 0.005   # дата, яку неможливо розібрати
+ONLY_ONE_FORM = 0.2      # пацієнт заповнив лише одну з двох форм
+
+
+def _names(rng, n):
+    idx = np.arange(n)
+    # Номер у ПІБ робить кожного пацієнта унікальним, але тезки за іменем-прізвищем часті
+    return (pd.Series(np.array(SURNAMES)[rng.integers(0, len(SURNAMES), n)]) + "-" + pd.Series(idx).astype(str)
+            + " " + np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), n)]
+            + " " + np.array(PATRONYMICS)[rng.integers(0, len(PATRONYMICS), n)])
+
+
+def _variants(rng, names):
+    """Те саме ПІБ, набране інакше: малими літерами, з подвійним пробілом або з латинськими о/і."""
+    kind = rng.integers(0, 3, len(names))
+    return names.where(kind != 0, names.str.lower()).where(
+        kind != 1, names.str.replace(" ", "  ", n=1, regex=False)).where(
+        kind != 2, names.str.replace("о", "o", regex=False).str.replace("і", "i", regex=False))
+
+
+def _typos(rng, names):
+    """ПІБ з однією пропущеною літерою (не першою і не останньою)."""
+    cut = rng.integers(1, names.str.len().clip(lower=3) - 1)
+    return pd.Series([name[:i] + name[i + 1:] for name, i in zip(names, cut)], index=names.index)
+
+
+def _dates(rng, n):
+    """Дати народження у трьох форматах, що трапляються у формах, плюс трохи сміття."""
+    year = pd.Series(rng.integers(1935, 1986, n)).astype(str)
+    month = pd.Series(rng.integers(1, 13, n)).astype(str)
+    day = pd.Series(rng.integers(1, 29, n)).astype(str)
+    dotted = day.str.zfill(2) + "." + month.str.zfill(2) + "." + year
+    iso = year + "-" + month.str.zfill(2) + "-" + day.str.zfill(2)
+    short = day + "." + month + "." + year
+    kind = rng.choice(3, n, p=[0.8, 0.15, 0.05])
+    dates = dotted.where(kind == 0, iso.where(kind == 1, short))
+    return dates.where(rng.random(n) >= BAD_DATE_SHARE, "не пам'ятаю")
+
+
+def _timestamps(rng, n):
+    """Позначка часу Google Sheets: 25.01.2025 9:05:07."""
+    moment = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, n), unit="s")
+    return (moment.strftime("%d.%m.%Y ") + pd.Series(moment.hour).astype(str).values + moment.strftime(":%M:%S")).tolist()
+
+
+def _decimal(values, digits=1):
+    """Число з комою замість крапки, як вводять у формах."""
+    return pd.Series(np.round(values, digits)).astype(str).str.replace(".", ",", regex=False)
+
+
+def _pick(rng, choices, n):
+    return np.array(choices, dtype=object)[rng.integers(0, len(choices), n)]
+
+
+def _resubmit(rng, df):
+    """Дописує повторні відправлення частини пацієнтів з пізнішою позначкою часу."""
+    extra = df.sample(frac=DUPLICATE_SHARE, random_state=int(rng.integers(1 << 31))).copy()
+    extra["Позначка часу"] = _timestamps(rng, len(extra))
+    return pd.concat([df, extra], ignore_index=True)
+
+
+def generate(rows, seed=0):
+    """Повертає (doctor_df, patient_df, corrections_df) приблизно на rows пацієнтів."""
+    rng = np.random.default_rng(seed)
+    names = _names(rng, rows)
+    messy = rng.random(rows) < MESSY_NAME_SHARE
+    names_typed = names.where(~messy, " " + names + "  ")
+    dobs = _dates(rng, rows)
+
+    # Анкета лікаря
+    doc_idx = np.flatnonzero(rng.random(rows) >= ONLY_ONE_FORM / 2)
+    n = len(doc_idx)
+    doctor = pd.DataFrame({
+        "Позначка часу": _timestamps(rng, n),
+        "ПІБ": names_typed.values[doc_idx],
+        "Дата народження": dobs.values[doc_idx],
+        "Вкажіть стать": _pick(rng, ["жінка", "чоловік"], n),
+        "[SCORE2] Куріння тютюнових виробів": _pick(rng, ["Так", "Ні"], n),
+        "[SCORE2] Систолічний артеріальний тиск": rng.integers(100, 200, n).astype(str),
+        # Холестерин часто ще не готовий на момент огляду
+        "[SCORE2] Рівень non-HDL холестерину (ммоль/л)": _decimal(rng.uniform(2, 9, n)).where(rng.random(n) < 0.6, "").values,
+        "[Findrisc] ІМТ (кг/м2)": _decimal(rng.uniform(18, 42, n)).values,
+        "[Findrisc] Окружність талії (см)": rng.integers(60, 135, n).astype(str),
+    })
+    for question, mapping in questionnaires.FINDRISC_MAPPING.items():
+        doctor[question] = _pick(rng, list(mapping), n)
+    doctor = _resubmit(rng, doctor)
+
+    # Анкета пацієнта
+    pat_idx = np.flatnonzero(rng.random(rows) >= ONLY_ONE_FORM / 2)
+    n = len(pat_idx)
+    pat_names = pd.Series(names_typed.values[pat_idx])
+    varied = rng.random(n) < VARIANT_SHARE
+    pat_names[varied] = _variants(rng, pat_names[varied])
+    typo = rng.random(n) < TYPO_SHARE
+    pat_names[typo] = _typos(rng, pat_names[typo])
+    patient = pd.DataFrame({
+        "Позначка часу": _timestamps(rng, n),
+        "ПІБ": pat_names.values,
+        "Дата народження": dobs.values[pat_idx],
+    })
+    for k, text in enumerate(PHQ_QUESTIONS, 1):
+        patient[f"[PHQ] {k}. {text}"] = _pick(rng, list(questionnaires.POINTS_MAP_PHQ), n)
+    for k, text in enumerate(GAD_QUESTIONS, 1):
+        patient[f"[GAD] {k}. {text}"] = _pick(rng, list(questionnaires.POINTS_MAP_GAD), n)
+    for k, (text, answers) in enumerate(SMOKE_QUESTIONS, 1):
+        patient[f"[Паління] {k}. {text}"] = _pick(rng, answers, n)
+    patient[SMOKE_QTY_QUESTION] = _pick(rng, ["", "5", "10", "15", "20", "25", "40", "12,5"], n)
+    for k, (text, answers) in enumerate(AUDIT_QUESTIONS, 1):
+        patient[f"[ AUDIT] {k}. {text}"] = _pick(rng, answers, n)
+    # Незаповнені необов'язкові питання
+    blanks = rng.random((n, 3)) < 0.03
+    for j, col in enumerate([patient.columns[4], patient.columns[14], patient.columns[-1]]):
+        patient.loc[blanks[:, j], col] = ""
+    patient = _resubmit(rng, patient)
+
+    # Виправлення показників (приблизно кожен сьомий пацієнт лікаря): здебільшого
+    # холестерин, часом - тиск або талія; незаповнене поле - порожня клітинка
+    corr_idx = doc_idx[rng.random(len(doc_idx)) < 1 / 7]
+    n = len(corr_idx)
+    corrections = pd.DataFrame({
+        "Позначка часу": _timestamps(rng, n),
+        "ПІБ пацієнта": names.values[corr_idx],
+        "Дата народження": dobs.values[corr_idx],
+        "Холестерин non-HDL (ммоль/л)": _decimal(rng.uniform(2, 9, n)).where(rng.random(n) < 0.8, "").values,
+        "Систолічний тиск": pd.Series(rng.integers(100, 200, n).astype(str)).where(rng.random(n) < 0.2, "").values,
+        "Окружність талії (см)": _decimal(rng.uniform(60, 135, n)).where(rng.random(n) < 0.1, "").values,
+    })
+    return doctor, patient, corrections
+
+
+def write(out_dir, rows, seed=0):
+    """Пише doctor.csv, patient.csv і corrections.csv у out_dir. Повертає шляхи."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for name, df in zip(("doctor", "patient", "corrections"), generate(rows, seed)):
+        paths[name] = os.path.join(out_dir, f"{name}.csv")
+        df.to_csv(paths[name], index=False)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Синтетичні CSV для замірів швидкодії")
+    parser.add_argument("--rows", type=int, default=10_000, help="Скільки пацієнтів (1k-1M)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_data", help="Папка для CSV")
+    args = parser.parse_args(argv)
+    for name, path in write(args.out, args.rows, args.seed).items():
+        print(f"{name}: {path} ({os.path.getsize(path) / 2**20:.1f} МБ)")
+
+
+if __name__ == "__main__":
+    main()
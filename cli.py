@@ -0,0 +1,102 @@
+"""
+Запуск без веб-інтерфейсу.
+
+    python cli.py process --doctor doctor.csv --patient patient.csv --corrections corr.csv --out cohort.parquet
+    python cli.py export-pdf --filter red --out reports.zip
+    python cli.py export-pdf --doctor doctor.csv --patient patient.csv --corrections corr.csv
+
+Адреси таблиць беруться з .streamlit/secrets.toml (як у застосунку),
+або їх можна підмінити шляхами до локальних CSV. Виправлення, внесені лікарями
+в дашборді (локальний журнал), накладаються лише з --journal.
+"""
+import argparse
+import sys
+import time
+from modules import batch_export, compact, data_manager, snapshot, timings
+
+
+def _add_source_args(parser):
+    parser.add_argument("--doctor", help="CSV анкети лікаря (шлях або URL)")
+    parser.add_argument("--patient", help="CSV анкети пацієнта (шлях або URL)")
+    parser.add_argument("--corrections", help="CSV виправлень (шлях або URL)")
+    parser.add_argument("--journal", action="store_true",
+                        help="Накласти ще й локальний журнал виправлень з дашборду (corrections_journal.db)")
+
+
+def _source_urls(args):
+    """Адреси з аргументів; не вказані - з налаштувань застосунку (secrets.toml)."""
+    configured = {conf["id"]: conf["url"] for conf in data_manager.FORMS_CONFIG}
+    return (args.doctor or configured.get("doctor_form"), args.patient or configured.get("patient_form"),
+            args.corrections or data_manager.url_corrections)
+
+
+def _load_cohort(args):
+    # Без спільного стану застосунку: знімок на диску і кеші джерел не читаються й не перезаписуються.
+    # Групу пацієнтів (--filter) відбирає вже batch_export з готової когорти
+    return data_manager.process_sources(*_source_urls(args), journal=args.journal)
+
+
+def cmd_process(args):
+    if not (args.doctor or args.patient):
+        print("❌ Потрібна хоча б одна форма: --doctor або --patient", file=sys.stderr)
+        return 2
+    started = time.perf_counter()
+    df = data_manager.process_sources(args.doctor, args.patient, args.corrections, chunksize=args.chunksize,
+                                      journal=args.journal)
+    print(f"⏱ {timings.format_run(timings.last_run())}")
+    if args.compact:
+        df, memory = data_manager.compact_cohort(df)
+        print(f"🗜 {compact.format_report(memory)}, прибрано колонок: {len(memory['dropped'])}")
+    if args.out.lower().endswith(".parquet"):
+        snapshot.storable(df).to_parquet(args.out, index=False)
+    else:
+        # utf-8-sig - щоб Excel правильно показав кирилицю
+        df.to_csv(args.out, index=False, encoding="utf-8-sig")
+    print(f"✅ {len(df)} пацієнтів -> {args.out} ({time.perf_counter() - started:.1f} с)")
+    return 0
+
+
+def cmd_export_pdf(args):
+    df = _load_cohort(args)
+    print(f"⏱ {timings.format_run(timings.last_run())}")
+    started = time.perf_counter()
+
+    def progress(done, total):
+        print(f"\r📄 {done}/{total}", end="", file=sys.stderr, flush=True)
+
+    result = batch_export.export_reports(df, args.out, args.filter, workers=args.workers, progress=progress)
+    print(file=sys.stderr)
+    print(f"✅ {result['written']} з {result['total']} звітів -> {args.out} "
+          f"({time.perf_counter() - started:.1f} с)")
+    for name, error in result["errors"]:
+        print(f"❌ {name}: {error}")
+    return 1 if result["errors"] else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Скринінг 40+: обробка без веб-інтерфейсу")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    process = commands.add_parser("process", help="Обробити CSV і записати когорту у CSV/Parquet")
+    _add_source_args(process)
+    process.add_argument("--out", default="cohort.csv", help="Файл результату (.csv або .parquet)")
+    process.add_argument("--chunksize", type=int, default=data_manager.CHUNK_ROWS,
+                         help="Скільки рядків CSV читати за раз")
+    process.add_argument("--compact", action="store_true",
+                         help="Компактні типи і без технічних колонок (як у пам'яті застосунку)")
+    process.set_defaults(func=cmd_process)
+
+    export = commands.add_parser("export-pdf", help="ZIP з PDF-звітами для групи пацієнтів")
+    _add_source_args(export)
+    export.add_argument("--filter", default="all", choices=[f["id"] for f in batch_export.EXPORT_FILTERS],
+                        help="; ".join(f"{f['id']} - {f['label']}" for f in batch_export.EXPORT_FILTERS))
+    export.add_argument("--out", default="reports.zip", help="Куди записати архів")
+    export.add_argument("--workers", type=int, default=None, help="Кількість процесів (типово - усі ядра)")
+    export.set_defaults(func=cmd_export_pdf)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,113 @@
 import streamlit as st
 import pandas as pd
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # 1. Посилання на CSV файл з логінами (Вкладка Users)
-USERS_URL = st.secrets["links"]["autorize_likar"]
+# Без секретів (офлайн-тести) - локальний файл з тими ж колонками
+try:
+    USERS_URL = st.secrets["links"]["autorize_likar"]
+except Exception:
+    USERS_URL = os.environ.get("SCREENING_USERS_FILE", "users.csv")
+
+# ==========================================
+# КЕШОВАНИЙ ДОВІДНИК КОРИСТУВАЧІВ
+# ==========================================
+# Таблицю користувачів качаємо раз на USERS_TTL, а не на кожну спробу входу.
+# У пам'яті тримаємо словник Username -> записи з солоними хешами паролів
+# (самі паролі після завантаження не зберігаються). Хеші рахуються під час
+# завантаження, але не під замком: входи в цей час перевіряються по старій таблиці.
+USERS_TTL = 300             # секунд
+USERS_MISS_REFRESH = 30     # невідомий логін: перекачати таблицю не частіше, ніж раз на стільки секунд
+HASH_ITERATIONS = 20_000
+HASH_WORKERS = 4            # pbkdf2_hmac відпускає GIL, тож хеші рахуються паралельно
+
+# Ролі (колонка Role, без урахування регістру), яким доступні адміністративні
+# функції: пакетний друк звітів тощо
+PRIVILEGED_ROLES = {"admin", "адміністратор", "головний лікар"}
+
+# loading - threading.Event завантаження, що йде зараз (одне на процес), або None
+_DIRECTORY = {"users": None, "loaded_at": float("-inf"), "loading": None}
+_LOAD_LOCK = threading.Lock()  # лише для читання/підміни _DIRECTORY, не на час завантаження
+
+
+def _hash_password(password, salt):
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, HASH_ITERATIONS)
+
+
+def _load_users():
+    """Скачує таблицю і будує словник Username -> [(salt, hash, name, role), ...]."""
+    # dtype=str важливий, щоб пароль "0000" не став числом 0
+    users_df = pd.read_csv(USERS_URL, dtype=str)
+    rows = [row for row in users_df[['Username', 'Password', 'Name', 'Role']].itertuples(index=False)
+            if not (pd.isna(row[0]) or pd.isna(row[1]))]
+    salts = [os.urandom(16) for _ in rows]
+    with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+        hashes = list(pool.map(_hash_password, [row[1] for row in rows], salts))
+    users = {}
+    for (username, _, name, role), salt, password_hash in zip(rows, salts, hashes):
+        users.setdefault(username, []).append((salt, password_hash, name, role))
+    return users
+
+
+def _reload(max_age):
+    """Перечитує таблицю, якщо вона старша за max_age секунд. Повертає (users, loaded_at)."""
+    with _LOAD_LOCK:
+        users, loaded_at, loading = _DIRECTORY["users"], _DIRECTORY["loaded_at"], _DIRECTORY["loading"]
+        if users is not None and time.monotonic() - loaded_at < max_age:
+            return users, loaded_at  # таблицю вже оновив інший вхід
+        owner = loading is None
+        if owner: loading = _DIRECTORY["loading"] = threading.Event()
+
+    if not owner:
+        # Таблицю вже качає інший вхід: є стара - перевіряємо по ній, немає - чекаємо
+        if users is not None: return users, loaded_at
+        loading.wait()
+        if _DIRECTORY["users"] is None: raise RuntimeError("Таблицю користувачів не вдалося завантажити")
+        return _DIRECTORY["users"], _DIRECTORY["loaded_at"]
+
+    try:
+        users = _load_users()
+        with _LOAD_LOCK:
+            loaded_at = time.monotonic()
+            _DIRECTORY.update(users=users, loaded_at=loaded_at)
+        return users, loaded_at
+    finally:
+        with _LOAD_LOCK: _DIRECTORY["loading"] = None
+        loading.set()
+
+
+def refresh_users():
+    """Примусово перечитує таблицю користувачів (кнопка адміністратора). Повертає кількість логінів."""
+    return len(_reload(0)[0])
+
+
+def _get_users():
+    users, loaded_at = _DIRECTORY["users"], _DIRECTORY["loaded_at"]
+    if users is None or time.monotonic() - loaded_at >= USERS_TTL:
+        users, loaded_at = _reload(USERS_TTL)
+    return users, loaded_at
+
+
+def find_user(username, password):
+    """Повертає (Name, Role) користувача або None, якщо логін/пароль невірні."""
+    users, loaded_at = _get_users()
+    # Новий лікар міг з'явитись у таблиці після завантаження - перечитуємо, але не частіше за ліміт
+    if username not in users and time.monotonic() - loaded_at >= USERS_MISS_REFRESH:
+        users, _ = _reload(USERS_MISS_REFRESH)
+    for salt, password_hash, name, role in users.get(username, []):
+        if hmac.compare_digest(_hash_password(password, salt), password_hash):
+            return name, role
+    return None
+
+
+def is_privileged():
+    """Чи має поточний користувач адміністративну роль."""
+    return str(st.session_state.get('role') or '').strip().lower() in PRIVILEGED_ROLES
 
 
 def login_system():
@@ -12,7 +117,7 @@ def login_system():
 
     # --- КРОК 2: Малюємо форму входу ---
     st.header("🔐 Вхід у Скринінг 40+ результати")
-    
+
     with st.form("login_form"):
         username_input = st.text_input("Логін")
         password_input = st.text_input("Пароль", type="password")
@@ -21,34 +126,23 @@ def login_system():
     # --- КРОК 3: Обробка натискання кнопки ---
     if submit_button:
         try:
-            # А. Скачуємо актуальний список лікарів прямо зараз
-            # dtype=str важливий, щоб пароль "0000" не став числом 0
-            users_df = pd.read_csv(USERS_URL, dtype=str)
-            
-            # Б. Шукаємо збіг
-            user_match = users_df[
-                (users_df['Username'] == username_input) & 
-                (users_df['Password'] == password_input)
-            ]
-
-            # В. Перевіряємо результат
-            if not user_match.empty:
+            # А. Шукаємо збіг у кешованому довіднику (таблиця качається раз на USERS_TTL)
+            user_info = find_user(username_input, password_input)
+
+            # Б. Перевіряємо результат
+            if user_info is not None:
                 # Ура! Знайшли.
-                user_info = user_match.iloc[0] # Беремо перший знайдений рядок
-                
                 # Записуємо в "кишеню" (Session State)
                 st.session_state['logged_in'] = True
-                st.session_state['user_name'] = user_info['Name'] # Запам'ятовуємо ім'я
-                st.session_state['role'] = user_info['Role']      # Запам'ятовуємо роль
-                
+                st.session_state['user_name'] = user_info[0] # Запам'ятовуємо ім'я
+                st.session_state['role'] = user_info[1]      # Запам'ятовуємо роль
+
                 st.success("Вхід успішний!")
                 st.rerun() # Перезавантажуємо сторінку, щоб прибрати форму входу
             else:
                 st.error("❌ Невірний логін або пароль")
-                
+
         except Exception as e:
             st.error(f"Помилка з'єднання з базою користувачів: {e}")
 
     return False # Якщо ми тут - значить вхід ще не виконано
-
-
@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import pandas as pd
+from modules import pdf_gen, report
+
+# ==========================================
+# ПАКЕТНИЙ ДРУК ЗВІТІВ (ZIP)
+# ==========================================
+# Звіти для групи пацієнтів генеруються паралельно в кількох процесах
+# (fpdf - чистий Python, тож потоки тут не допоможуть) і одразу дописуються
+# в ZIP-архів. У пам'яті одночасно лише кілька PDF, а не вся когорта.
+
+# id      - ключ фільтра (для CLI: --filter)
+# status  - точне значення "Загальний статус"
+# mark    - позначка, що є хоча б в одному Verdict_*
+EXPORT_FILTERS = [
+    {"id": "all",      "label": "Усі пацієнти"},
+    {"id": "complete", "label": "✅ Повний комплект", "status": "✅ Повний комплект"},
+    {"id": "red",      "label": "🔴 Є хоча б один червоний висновок", "mark": "🔴"},
+]
+
+_FILTERS_BY_ID = {f["id"]: f for f in EXPORT_FILTERS}
+
+# Скільки звітів на кожен процес може чекати в черзі (обмежує пам'ять)
+QUEUE_PER_WORKER = 2
+
+
+def select_patients(df, filter_id="all"):
+    """Рядки когорти, що підходять під фільтр."""
+    flt = _FILTERS_BY_ID[filter_id]
+    mask = pd.Series(True, index=df.index)
+    if "status" in flt:
+        mask &= df.get('Загальний статус', pd.Series("", index=df.index)) == flt["status"]
+    if "mark" in flt:
+        verdict_cols = [c for c in df.columns if str(c).startswith("Verdict_")]
+        marked = pd.Series(False, index=df.index)
+        for col in verdict_cols:
+            marked |= df[col].astype(str).str.contains(flt["mark"], regex=False)
+        mask &= marked
+    return df[mask]
+
+
+def _file_name(patient_name, dob, used):
+    """Report_<ПІБ>_<дата народження>.pdf без символів, заборонених у файлових системах."""
+    base = f"Report_{patient_name}"
+    if isinstance(dob, pd.Timestamp) and pd.notna(dob): base += f"_{dob.strftime('%d.%m.%Y')}"
+    base = re.sub(r'[\\/:*?"<>|\s]+', "_", base).strip("_")
+    name, n = f"{base}.pdf", 1
+    while name in used:
+        n += 1
+        name = f"{base}_{n}.pdf"
+    used.add(name)
+    return name
+
+
+def _jobs(df, date_str):
+    """(ім'я файлу, ПІБ, дата, зміст звіту) для кожного пацієнта - ліниво, по одному."""
+    used = set()
+    for _, record in df.iterrows():
+        patient_name = str(record.get('ПІБ', ''))
+        yield (_file_name(patient_name, record.get('Дата народження'), used),
+               patient_name, date_str, report.build_print_dict(record))
+
+
+def _render(job):
+    """Виконується в окремому процесі. Повертає (ім'я файлу, PDF або None, помилка)."""
+    file_name, patient_name, date_str, data_dict = job
+    try:
+        pdf_bytes = pdf_gen.create_report(patient_name=patient_name, date_str=date_str,
+                                          verdict=report.SUMMARY_TEXT, score="", data_dict=data_dict)
+    except Exception as e:
+        return file_name, None, str(e)
+    if pdf_bytes.startswith(b"ERROR"): return file_name, None, pdf_bytes.decode("latin-1")
+    return file_name, pdf_bytes, None
+
+
+def _render_all(jobs, workers):
+    """Результати _render у порядку готовності; у черзі не більше workers * QUEUE_PER_WORKER задач."""
+    if workers <= 1:
+        for job in jobs: yield _render(job)
+        return
+    # spawn, а не fork: процес Streamlit багатопотоковий
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = set()
+        for job in jobs:
+            pending.add(pool.submit(_render, job))
+            if len(pending) >= workers * QUEUE_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done: yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done: yield future.result()
+
+
+def export_reports(df, out, filter_id="all", workers=None, date_str=None, progress=None):
+    """
+    Пише звіти відібраних пацієнтів у ZIP (out - шлях або відкритий бінарний файл).
+    progress(done, total) викликається після кожного звіту.
+    Повертає {"total", "written", "errors": [(файл, помилка), ...]}.
+    """
+    selected = select_patients(df, filter_id)
+    total = len(selected)
+    workers = min(workers or os.cpu_count() or 1, max(total, 1))
+    date_str = date_str or pd.Timestamp.now().strftime('%d.%m.%Y')
+
+    written, errors = 0, []
+    # PDF вже стиснуті всередині - повторно не стискаємо
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_STORED) as zf:
+        for file_name, pdf_bytes, error in _render_all(_jobs(selected, date_str), workers):
+            if pdf_bytes is None: errors.append((file_name, error))
+            else:
+                zf.writestr(file_name, pdf_bytes)
+                written += 1
+            if progress: progress(written + len(errors), total)
+        if errors:
+            zf.writestr("errors.txt", "\n".join(f"{name}: {err}" for name, err in errors))
+    return {"total": total, "written": written, "errors": errors}
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# КОМПАКТНІ ТИПИ КОЛОНОК КОГОРТИ
+# ==========================================
+# Готова таблиця живе в пам'яті весь час роботи застосунку і віддається всім
+# сесіям. Відповіді анкет - це кілька довгих українських рядків, що повторюються
+# тисячі разів, тож зберігаємо їх як категорії (код + словник), бали - малими
+# цілими, прапорці - bool. Технічні колонки, які далі ніде не читаються, прибираємо.
+
+# Колонки, що потрібні лише до злиття (дедуплікація, вік кожної форми окремо).
+# Решту непотрібних (питання форм, яких ніхто не читає) відкидає keep у compact_frame
+DROP_PREFIXES = ("Позначка часу",)
+DROP_COLUMNS = ("Вік_doc", "Вік_pat")
+
+# Не робимо категорією, якщо унікальних значень більше за цю частку рядків (ПІБ тощо)
+CATEGORY_MAX_RATIO = 0.5
+
+_INT_TYPES = [(np.int8, "Int8"), (np.int16, "Int16"), (np.int32, "Int32")]
+
+
+def _small_int(series):
+    """Найменший цілий тип для колонки з цілими числами (з пропусками - nullable Int*) або None."""
+    values = series.dropna()
+    if values.empty or not np.array_equal(values, np.round(values)): return None
+    low, high = values.min(), values.max()
+    for np_type, nullable in _INT_TYPES:
+        info = np.iinfo(np_type)
+        if info.min <= low and high <= info.max:
+            return nullable if len(values) < len(series) else np_type
+    return None
+
+
+def compact_frame(df, drop_unused=True, keep=None):
+    """
+    Повертає (компактна копія таблиці, звіт).
+    keep - колонки, які далі хтось читає (None - лишаємо все, крім DROP_*).
+    Звіт: before / after - байти (з рядками), dropped - прибрані колонки,
+    converted - скільки колонок якого типу стало.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    dropped = []
+    if drop_unused:
+        dropped = [c for c in df.columns if str(c) in DROP_COLUMNS or str(c).startswith(DROP_PREFIXES)
+                   or (keep is not None and c not in keep)]
+        df = df.drop(columns=dropped)
+    else:
+        df = df.copy()
+
+    converted = {"category": 0, "int": 0, "bool": 0}
+    rows = len(df)
+    for col in df.columns:
+        s = df[col]
+        if col in ('ПІБ', 'Дата народження') or isinstance(s.dtype, pd.CategoricalDtype): continue
+        if pd.api.types.is_bool_dtype(s): continue
+        if str(col).startswith("Status_"):
+            df[col] = s.fillna(False).astype(bool)
+            converted["bool"] += 1
+        elif pd.api.types.is_numeric_dtype(s):
+            # Лише бали і вік: виміри (тиск, холестерин) лишаємо як є
+            if not (str(col).startswith("Score_") or col == 'Вік'): continue
+            int_type = _small_int(s)
+            if int_type is not None:
+                df[col] = s.astype(int_type)
+                converted["int"] += 1
+        elif rows and s.nunique(dropna=True) <= CATEGORY_MAX_RATIO * rows:
+            df[col] = s.astype("category")
+            converted["category"] += 1
+
+    after = int(df.memory_usage(deep=True).sum())
+    return df, {"before": before, "after": after, "dropped": dropped, "converted": converted}
+
+
+def conform(new, like):
+    """
+    Рядки new (ті самі колонки, ще не стиснуті) у типах компактної таблиці like,
+    щоб дописати їх до неї без повторного стиснення. Повертає (new, like): у like
+    додаються нові категорії; цілі, що не влазять у тип like, лишаються як є
+    (concat розширить колонку сам).
+    """
+    new = new[list(like.columns)].copy()
+    like = like.copy(deep=False)
+    for col in like.columns:
+        dtype, s = like[col].dtype, new[col]
+        if isinstance(dtype, pd.CategoricalDtype):
+            extra = pd.Index(s.dropna().unique()).difference(dtype.categories)
+            if len(extra):
+                like[col] = like[col].cat.add_categories(extra)
+                dtype = like[col].dtype
+            new[col] = s.astype(dtype)
+        elif pd.api.types.is_bool_dtype(dtype):
+            new[col] = s.fillna(False).astype(bool)
+        elif pd.api.types.is_integer_dtype(dtype) and s.dtype != dtype:
+            values = s.dropna()
+            info = np.iinfo(getattr(dtype, "numpy_dtype", dtype))
+            fits = values.empty or (np.array_equal(values, np.round(values))
+                                    and info.min <= values.min() and values.max() <= info.max)
+            nullable = isinstance(dtype, pd.api.extensions.ExtensionDtype)
+            if fits and (nullable or len(values) == len(s)): new[col] = s.astype(dtype)
+    return new, like
+
+
+def format_report(report):
+    """Короткий рядок для журналу: '100.2 МБ -> 21.5 МБ (-79%)'."""
+    mb = lambda n: n / 2**20
+    saved = 1 - report["after"] / report["before"] if report["before"] else 0
+    return f"{mb(report['before']):.1f} МБ -> {mb(report['after']):.1f} МБ (-{saved:.0%})"
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from modules import patient_index, schema, score2
+
+# ==========================================
+# ВИПРАВЛЕННЯ ПОКАЗНИКІВ ПІСЛЯ ОГЛЯДУ
+# ==========================================
+# Виправлення (з таблиці Google і з локального журналу) зберігаються в довгому
+# форматі: один рядок = пацієнт, поле, значення, час. На пацієнта і поле лишається
+# найсвіжіше значення, а накладаються всі поля разом - одним пошуком рядків
+# пацієнтів, хоч би скільки полів можна було виправляти.
+
+KEY = patient_index.KEY_COLUMN
+LONG_COLUMNS = [KEY, "field", "value", "Позначка часу"]
+
+# id      - назва поля (у журналі та схемі таблиці виправлень)
+# column  - колонка когорти (якщо "schema" не знайде іншої)
+# schema  - логічне поле анкети лікаря (modules/schema.py), де лежить показник
+# kind    - number (кома або крапка) або choice (одне з choices)
+# Які бали перераховувати після виправлення, визначає реєстр похідних колонок
+# (data_manager.derived_columns) за колонкою поля.
+FIELDS = [
+    {"id": "chol", "label": "Холестерин non-HDL (ммоль/л)", "column": score2.CHOL_COL, "kind": "number"},
+    {"id": "sbp", "label": "Систолічний тиск (мм рт. ст.)", "column": score2.SBP_COL, "kind": "number"},
+    {"id": "waist", "label": "Окружність талії (см)", "column": "[Findrisc] Окружність талії (см)", "schema": "waist", "kind": "number"},
+    {"id": "bmi", "label": "ІМТ (кг/м2)", "column": "[Findrisc] ІМТ (кг/м2)", "schema": "bmi", "kind": "number"},
+    {"id": "sex", "label": "Стать", "column": score2.SEX_COL, "schema": "sex",
+     "kind": "choice", "choices": ("жінка", "чоловік")},
+]
+
+_BY_ID = {field["id"]: field for field in FIELDS}
+
+
+def field(field_id):
+    return _BY_ID[field_id]
+
+
+def clean(field_id, values):
+    """Значення з форми -> рядки в єдиному вигляді ("5.3", "жінка"); непридатні -> NaN."""
+    spec = _BY_ID[field_id]
+    text = pd.Series(values).astype(str).str.strip()
+    if spec["kind"] == "number":
+        numbers = pd.to_numeric(text.str.replace(',', '.', regex=False), errors='coerce')
+        return numbers.astype(str).where(numbers.notna())
+    text = text.str.lower()
+    return text.where(text.isin(spec["choices"]))
+
+
+def to_long(keys, stamps, values):
+    """
+    Широка таблиця виправлень -> довгий формат (LONG_COLUMNS).
+    values: id поля -> колонка значень (ті самі рядки, що й keys/stamps).
+    """
+    parts = []
+    for field_id, column in values.items():
+        cleaned = clean(field_id, column).to_numpy()
+        ok = pd.notna(cleaned)
+        parts.append(pd.DataFrame({KEY: np.asarray(keys)[ok], "field": field_id, "value": cleaned[ok],
+                                   "Позначка часу": np.asarray(stamps)[ok]}))
+    if not parts: return pd.DataFrame(columns=LONG_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def columns_for(columns):
+    """id поля -> колонка когорти з такими заголовками (пошук за схемою анкети лікаря, з кешу)."""
+    fields = schema.resolve(columns, "doctor_form")["fields"]
+    return {spec["id"]: fields.get(spec.get("schema")) or spec["column"] for spec in FIELDS}
+
+
+def set_cells(column, positions, values):
+    """Копія колонки з новими значеннями в рядках positions (категорії і цілі за потреби розширюються)."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        missing = pd.Index(values).dropna().unique().difference(column.cat.categories)
+        column = column.cat.add_categories(missing) if len(missing) else column.copy()
+    elif pd.api.types.is_integer_dtype(column.dtype):
+        # Дробові значення або пропуски в цілу колонку без пропусків (numpy) - лише як float
+        present = [v for v in values if pd.notna(v)]
+        nullable = isinstance(column.dtype, pd.api.extensions.ExtensionDtype)
+        whole = all(float(v).is_integer() for v in present) and (nullable or len(present) == len(values))
+        column = column.copy() if whole else column.astype(float)
+    else:
+        column = column.copy()
+    column.iloc[positions] = values
+    return column
+
+
+def _typed(column, spec, values):
+    """Значення у вигляді, що пасує до колонки: числа - в числову, рядки - в текстову."""
+    if spec["kind"] == "number" and (column is None or pd.api.types.is_numeric_dtype(column.dtype)):
+        return pd.to_numeric(pd.Series(values), errors='coerce').to_numpy()
+    return np.asarray(values, dtype=object)
+
+
+def overlay(frame, latest):
+    """
+    Накладає виправлення (довгий формат, по одному на пацієнта і поле) на таблицю.
+    Повертає (нова таблиця, позиції змінених рядків, змінені поля). Стара таблиця
+    не змінюється, незмінені колонки спільні з нею.
+    """
+    if latest is None or latest.empty or frame.empty or KEY not in frame.columns:
+        return frame, np.array([], dtype=np.int64), set()
+    # Поля - колонками, пацієнт - рядком: одне з'єднання з когортою на всі поля
+    wide = latest.pivot(index=KEY, columns="field", values="value")
+    keys = frame[KEY]
+    positions = np.flatnonzero(keys.isin(wide.index).to_numpy())
+    if not len(positions): return frame, positions, set()
+    rows = wide.index.get_indexer(keys.iloc[positions])
+
+    new = frame.copy(deep=False)
+    targets = columns_for(tuple(frame.columns))
+    changed = set()
+    for field_id in wide.columns:
+        if field_id not in _BY_ID: continue
+        spec = _BY_ID[field_id]
+        values = wide[field_id].to_numpy()[rows]
+        present = pd.notna(values)
+        if not present.any(): continue
+        col = targets[field_id]
+        old = frame[col] if col in frame.columns else None
+        typed = _typed(old, spec, values[present])
+        if old is None:
+            # Колонки ще немає (поле ніхто не заповнював) - як і раніше з холестерином, 0
+            old = pd.Series(0.0 if spec["kind"] == "number" else None, index=frame.index,
+                            dtype=float if spec["kind"] == "number" else object)
+        new[col] = set_cells(old, positions[present], typed)
+        changed.add(field_id)
+    return new, positions, changed
@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from datetime import datetime
-from functools import reduce
+from datetime import date, datetime
+from functools import partial, reduce
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from modules import compact, corrections, dates, ingest, journal, linkage, patient_index, questionnaires, report, schema, score2, snapshot, timings
 
 # Налаштування Pandas
 pd.set_option('future.no_silent_downcasting', True)
@@ -19,6 +23,7 @@ except Exception:
     url_patient = ""
     url_corrections = ""
 
+# Необов'язковий ключ "timeout" - ліміт очікування відповіді джерела (секунди)
 FORMS_CONFIG = [
     {   "id": "doctor_form",
         "name": "Лікар",
@@ -34,120 +39,20 @@ FORMS_CONFIG = [
     }
 ]
 
-# Словники балів (Ваші словники без змін)
-POINTS_MAP_GAD = {"Ніколи": 0, "Кілька днів": 1, "Понад половину часу": 2, "Майже щодня": 3}
-POINTS_MAP_PHQ = {"Не турбували взагалі": 0, "Протягом декількох днів": 1, "Більше половини цього часу": 2, "Майже кожного дня": 3}
-POINTS_MAP_SMOKE = {"Через 1 год.": 0, "Від 1/2 до 1 години": 1, "Від 6 до 30 хв.": 2, "5 хв або менше": 3, "Ні": 1, "Так": 2, "Будь-якої іншої": 1, "Першої вранці": 3}
-POINTS_MAP_AUDIT = {"Ніколи": 0, "Один раз на місяць або рідше": 1, "2–4 рази на місяць": 2, "2–3 рази на тиждень": 3, "4 рази на тиждень або частіше": 4, "Щомісяця": 2, "Щотижня": 3, "Щодня або майже щодня": 4, "1–2 СП": 0, "3–4 СП": 1, "5–6 СП": 2, "7–9 СП": 3, "10 СП і більше": 4, "Ні": 0, "Так, більше ніж 12 місяців тому": 2, "Так, упродовж останніх 12 місяців": 4}
-FINDRISC_MAPPING = {
-    '[Findrisc] Чи маєте ви щодня принаймні 30 хв фізичної активності на роботі та/ або у вільний час (включно зі звичайною щоденною активністю)': {"Так": 0, "Ні": 1},
-    '[Findrisc] Як часто ви їсте овочі, фрукти або ягоди?': {'Кожного дня': 0, 'Не кожного дня': 1},
-    '[Findrisc] Чи приймали ви коли-небудь регулярно ліки від підвищеного тиску?': {'Ні': 0, 'Так': 2},
-    '[Findrisc] Чи виявляли у вас коли-небудь підвищений рівень глюкози в крові (наприклад, під час медичного огляду, хвороби або вагітності)?': {"Так": 5, "Ні": 0},
-    '[Findrisc] Чи був у когось із ваших близьких родичів або інших родичів діагностований цукровий діабет 1 або 2 типу?': {"Так: у батьків, братів, сестер або дітей": 5, "Так: тільки у дідуся/бабусі, тітки, дядька або двоюрідного брата/сестри": 3, 'Ні': 0},
-}
+# Словники балів, межі вердиктів і колонки тестів - у modules/questionnaires.py
 
 # ==========================================
 # 2. ДОПОМІЖНІ ФУНКЦІЇ (HELPERS)
 # ==========================================
 
-def calculate_age(born):
-    if pd.isnull(born): return 0
-    today = datetime.today()
-    try:
-        return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
-    except: return 0
-
-def calculate_section_score(df, tag, mapping):
-    cols = [c for c in df.columns if tag in c]
-    if not cols: return 0
-    return df[cols].apply(lambda x: x.map(mapping)).fillna(0).sum(axis=1)
-
-# Вердикти (Ваші функції без змін)
-def get_depression_verdict(s):
-    if s >= 20: return "🔴 Тяжка депресія"
-    if s >= 15: return "🟠 Середньої тяжкості депресія"
-    if s >= 10: return "🟡 Помірної тяжкості депресія"
-    if s >= 5:  return "🟢 Легка («субклінічна») депресія"
-    return "⚪ Депресія відсутня"
-
-def get_gad7_verdict(s):
-    if s >= 15: return "🔴 Клінічно значимі симптоми"
-    if s >= 10: return "🟠 Помірні симптоми"
-    if s >= 5:  return "🟡 Легкі симптоми"
-    return "🟢 Без симптомів"
-
-def get_smoke_verdict(s):
-    if s >= 8: return "🔴 Дуже високий рівень нікотинової залежності"
-    if s >= 6: return "🟠 Високий рівень нікотинової залежності"
-    if s >= 1: return "🟡 Низький рівень нікотинової залежності"
-    return "🟢 Без нікотинової залежності"
-
-def get_audit_verdict(s):
-    if s >= 20: return "🔴 Можлива алкогольна залежність"
-    if s >= 8: return "🟠 Споживання з високим ризиком"
-    if s >= 1: return "🟡 Споживання з низьким ризиком" 
-    return "🟢 Ймовірно пацієнт утримується від споживання"
-
-def get_findrisc_verdict(s):
-    if s > 20: return "🔴 Дуже високий ризик: 1 із 2 (50%)"
-    if s >= 15: return "🟠 Високий ризик: 1 із 3 (33%)"
-    if s >= 12: return "🟡 Помірний ризик: 1 із 6 (16%)"
-    if s >= 7: return "🟢 Дещо підвищений ризик: 1 із 25 (4%)"
-    return "✅ Низький ризик: 1 із 100 (1%)"
-
-def get_score2_verdict_row(row):
-    sex = row.get('Вкажіть стать', 'Не вказано')
-    smoke = row.get('[SCORE2] Куріння тютюнових виробів', 'Ні')
-    age = int(row.get('Вік', 0))
-    sbp = float(row.get('[SCORE2] Систолічний артеріальний тиск', 0))
-    chol = float(row.get('[SCORE2] Рівень non-HDL холестерину (ммоль/л)', 0))
-
-    if age == 0: return "⚪ Недостатньо даних (Вік)"
-    if chol <= 0: return "⚪ Введіть холестерин"
-
-    def is_green():
-        if sex == 'жінка' and smoke == 'Ні':
-            if age < 45 and sbp < 120 and chol <= 5: return True
-            if 49 < age < 55 and sbp < 120 and chol <= 3: return True
-        return False
-
-    def is_yellow():
-        if sbp >= 180 or chol >= 8: return False
-        if sex == 'жінка':
-            if smoke == 'Ні':
-                if age < 50: return True 
-                if 50 <= age < 55: return not (sbp >= 160 or (sbp >= 140 and chol >= 6))
-                if 55 <= age < 60: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
-                if 60 <= age < 70: return not (sbp >= 140 or chol >= 6)
-                if 70 <= age < 90: return not (sbp >= 160 or chol >= 7)
-            else: 
-                if age < 50: return not (sbp >= 160 or (sbp >= 140 and chol >= 6))
-                if 50 <= age < 55: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
-                if 55 <= age < 70: return not (sbp >= 140 or (sbp >= 120 and chol >= 5))
-                if 70 <= age < 90: return not (sbp >= 140 or chol >= 6)
-        elif sex == 'чоловік':
-            if smoke == 'Ні':
-                if age < 50: return not (sbp >= 160 or (sbp >= 140 and chol >= 6))
-                if 50 <= age < 55: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
-                if 55 <= age < 70: return not (sbp >= 140 or chol >= 6)
-                if 70 <= age < 90: return not (sbp >= 140 or chol >= 6)
-            else:
-                if age < 50: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
-                if 50 <= age < 55: return not (sbp >= 140 or chol >= 6)
-                if 55 <= age < 70: return not (sbp >= 120 or chol >= 4)
-                if 70 <= age < 90: return not (sbp >= 120 or chol >= 5)
-        return False
-
-    if is_green(): return "🟢 Низький ризик"
-    elif is_yellow(): return "🟡 Помірний ризик"
-    else: return "🔴 Високий ризик"
+# Дати і вік - у modules/dates.py
+
+# Ціле число з нормалізованого ПІБ і дати народження: по ньому дублікати і злиття
+KEY = patient_index.KEY_COLUMN
+IDENTITY = ('ПІБ', 'Дата народження')
 
 # ==========================================
-# 3. ФУНКЦІЇ ОБРОБКИ ДАНИХ (ВАШІ СТАРІ ПРОЦЕСОРИ)
-# ==========================================
-# ==========================================
-# 3. ФУНКЦІЇ ОБРОБКИ ДАНИХ (ВИПРАВЛЕНО КОМИ)
+# 3. ФУНКЦІЇ ОБРОБКИ ДАНИХ (ФОРМИ ЛІКАРЯ І ПАЦІЄНТА)
 # ==========================================
 
 def to_float_safe(series):
@@ -156,37 +61,37 @@ def to_float_safe(series):
 
 def process_patient_data(df):
     df = df.copy()
-    
-    # Текстові мапи працюють нормально, тут коми не важливі
-    df['Score_PHQ'] = calculate_section_score(df, '[PHQ]', POINTS_MAP_PHQ)
-    df['Verdict_PHQ'] = df['Score_PHQ'].apply(get_depression_verdict)
-    df['Score_GAD'] = calculate_section_score(df, '[GAD]', POINTS_MAP_GAD)
-    df['Verdict_GAD'] = df['Score_GAD'].apply(get_gad7_verdict)
+
+    # Гнучкий пошук колонок - один раз на версію заголовків
+    layout = schema.resolve(df.columns, "patient_form")
 
     # А ось тут (цифри в курців) треба обережно
     smoke_qty_col = '[Паління] 4. Скільки сигарет ви викурюєте на день?'
-    # Гнучкий пошук
-    found_col = next((c for c in df.columns if "[Паління] 4." in c), None)
+    found_col = layout["fields"]["smoke_qty"]
     
     if found_col:
         # 🔥 ВИПРАВЛЕННЯ: Використовуємо безпечну конвертацію
         df[found_col] = to_float_safe(df[found_col])
         df[found_col] = pd.cut(df[found_col], bins=[-1, 10, 20, 30, float('inf')], labels=[0, 1, 2, 3]).astype(int)
-        if found_col != smoke_qty_col: df[smoke_qty_col] = df[found_col]
+        if found_col != smoke_qty_col:
+            df[smoke_qty_col] = df[found_col]
+            # Нова колонка змінила заголовки - беремо схему для них (теж з кешу)
+            layout = schema.resolve(df.columns, "patient_form")
 
-    df['Score_Smoke'] = calculate_section_score(df, '[Паління]', POINTS_MAP_SMOKE)
-    df['Verdict_Smoke'] = df['Score_Smoke'].apply(get_smoke_verdict)
-    df['Score_Audit'] = calculate_section_score(df, '[ AUDIT]', POINTS_MAP_AUDIT) 
-    df['Verdict_Audit'] = df['Score_Audit'].apply(get_audit_verdict)
+    # PHQ, GAD, Паління, AUDIT - бали і вердикти за реєстром тестів
+    df = questionnaires.score_form(df, "patient_form", sections=layout["sections"])
     df['Status_Patient_Done'] = True
     return df
 
 def process_doctor_data(df):
     df = df.copy()
     
+    # Гнучкий пошук колонок - один раз на версію заголовків
+    layout = schema.resolve(df.columns, "doctor_form")
+
     # 1. SCORE2 (Тиск і Холестерин) - Гнучкий пошук + Лікування ком
-    col_sbp = next((c for c in df.columns if "Систолічний" in c and "SCORE2" in c), None)
-    col_chol = next((c for c in df.columns if "non-HDL" in c and "SCORE2" in c), None)
+    col_sbp = layout["fields"]["sbp"]
+    col_chol = layout["fields"]["chol"]
 
     standard_sbp = '[SCORE2] Систолічний артеріальний тиск'
     standard_chol = '[SCORE2] Рівень non-HDL холестерину (ммоль/л)'
@@ -199,34 +104,36 @@ def process_doctor_data(df):
         df[standard_chol] = to_float_safe(df[col_chol])
     
     # 2. FINDRISK
-    df['Score_FINDRISK'] = 0
-    
-    # Текстові питання (тут все ок)
-    for col_name, mapping in FINDRISC_MAPPING.items():
-        actual_col = next((c for c in df.columns if col_name.strip() in c), None)
-        if actual_col:
-            df['Score_FINDRISK'] += df[actual_col].map(mapping).fillna(0)
+    # Текстові питання рахує реєстр тестів, тут - тільки числові показники
+    findrisk_extra = findrisk_extra_points(df, layout["fields"])
+
+    df = questionnaires.score_form(df, "doctor_form", extra_points={"FINDRISK": findrisk_extra},
+                                   sections=layout["sections"])
+    df['Status_Doctor_Done'] = True
+    return df
+
+def findrisk_extra_points(df, fields):
+    """FINDRISK: бали за вік, ІМТ і талію. fields - поля схеми анкети лікаря."""
+    findrisk_extra = np.zeros(len(df), dtype=np.int64)
 
     # Бали за Вік
     if 'Вік' in df.columns:
         age_points = pd.cut(df['Вік'], bins=[0, 44, 54, 64, float('inf')], labels=[0, 2, 3, 4], include_lowest=True).fillna(0).astype(int)
-        df['Score_FINDRISK'] += age_points
+        findrisk_extra += age_points.to_numpy()
 
     # ІМТ (Тут теж можуть бути коми!)
-    col_bmi_part = "ІМТ (кг/м2)"
-    col_bmi = next((c for c in df.columns if col_bmi_part in c), None)
+    col_bmi = fields["bmi"]
     if col_bmi:
         # 🔥 ВИПРАВЛЕННЯ
         bmi_numeric = to_float_safe(df[col_bmi])
         bmi_points = pd.cut(bmi_numeric, bins=[0, 25, 30, float('inf')], labels=[0, 1, 3], include_lowest=True, right=False).fillna(0).astype(int)
-        df['Score_FINDRISK'] += bmi_points
+        findrisk_extra += bmi_points.to_numpy()
 
     # Талія (Тут теж коми!)
-    col_waist_part = "Окружність талії"
-    col_waist = next((c for c in df.columns if col_waist_part in c), None)
-    col_sex = 'Вкажіть стать' 
+    col_waist = fields["waist"]
+    col_sex = fields["sex"]
 
-    if col_waist and col_sex in df.columns:
+    if col_waist and col_sex:
         # 🔥 ВИПРАВЛЕННЯ
         waist_numeric = to_float_safe(df[col_waist])
         is_male = df[col_sex].astype(str).str.lower() == 'чоловік' # Страхуємось від регістру
@@ -236,66 +143,570 @@ def process_doctor_data(df):
             (is_male & (waist_numeric > 94)) | (~is_male & (waist_numeric > 80))
         ]
         waist_points = np.select(conditions, [4, 3], default=0)
-        df['Score_FINDRISK'] += waist_points
+        findrisk_extra += waist_points
+    return findrisk_extra
 
-    df['Verdict_FINDRISK'] = df['Score_FINDRISK'].apply(get_findrisc_verdict)
-    df['Status_Doctor_Done'] = True
-    return df
-    # ==========================================
-# 4. ГОЛОВНИЙ МЕРДЖЕР (ОНОВЛЕНИЙ ЧЕРЕЗ PANDAS MERGE) 🚀
 # ==========================================
-@st.cache_data(ttl=60)
+# 4. ІНКРЕМЕНТАЛЬНЕ ЗАВАНТАЖЕННЯ ДЖЕРЕЛ
+# ==========================================
+# Пам'ятаємо вже оброблені дані кожного джерела, щоб при оновленні
+# парсити та рахувати лише нові відповіді, а не всю таблицю заново.
+# source_id -> {"digest", "columns", "day", "frame"}
+_PROCESSED_STATE = {}
+_PIPELINE_LOCK = threading.Lock()
+FETCH_WORKERS = 8  # скільки джерел качаємо одночасно
+
+# ==========================================
+# КЛЮЧІ КЕШУ ПО ДЖЕРЕЛАХ
+# ==========================================
+# Кожне джерело має власний "термін придатності" і може бути скинуте окремо,
+# тож виправлення холестерину оновлює лише шар виправлень, а не все підряд.
+SOURCE_TTL = 60  # секунд
+DATA_SOURCES = ("doctor_form", "patient_form", "corrections")
+_FETCHED_AT = {}    # source_id -> time.monotonic() останнього завантаження
+_STALE = {}        # джерела, які треба перекачати при наступному зверненні -> номер скидання
+_GENERATION = 0     # змінюється при кожному скиданні -> поточна таблиця вважається застарілою
+_INVALIDATE_LOCK = threading.Lock()
+# source_id -> ключі пацієнтів, змінених з часу останньої побудови когорти
+# (None - невідомо які: джерело перечитано повністю). Когорта перебудовує лише їхні рядки.
+_PENDING = {}
+
+def invalidate(*source_ids):
+    """Скидає кеш вказаних джерел (без аргументів - усіх джерел даних)."""
+    global _GENERATION
+    with _INVALIDATE_LOCK:
+        _GENERATION += 1
+        _STALE.update(dict.fromkeys(source_ids or DATA_SOURCES, _GENERATION))
+
+def links_changed():
+    """Лікар підтвердив збіг пацієнтів: перебудувати злиття форм, не перекачуючи джерела."""
+    global _GENERATION
+    with _INVALIDATE_LOCK:
+        _GENERATION += 1
+
+def set_source_url(source_id, url):
+    """Підміняє адресу джерела (CLI, офлайн-запуск з локальних CSV) і скидає його кеш."""
+    global url_corrections
+    if source_id == "corrections": url_corrections = url
+    else: next(conf for conf in FORMS_CONFIG if conf["id"] == source_id)["url"] = url
+    invalidate(source_id)
+
+def _stale_mark(source_id):
+    """Номер скидання джерела, яке ще не виконане (None - не скидали)."""
+    with _INVALIDATE_LOCK:
+        return _STALE.get(source_id)
+
+def _fetched(source_id, mark):
+    """Джерело скачане: знімаємо позначку, але лише якщо його не скинули вдруге, поки воно качалось."""
+    with _INVALIDATE_LOCK:
+        _FETCHED_AT[source_id] = time.monotonic()
+        if _STALE.get(source_id) == mark: _STALE.pop(source_id, None)
+
+def _needs_fetch(source_id):
+    if source_id in _STALE or source_id not in _PROCESSED_STATE: return True
+    return time.monotonic() - _FETCHED_AT.get(source_id, float("-inf")) >= SOURCE_TTL
+
+def _prepare_form(df, conf):
+    """Перейменування, дати, чистка ПІБ, відсів сміття і дублікатів. None - якщо форма не та."""
+    target_pib = conf["identity_map"]["Name"]
+    target_dob = conf["identity_map"]["DOB"]
+    if target_pib not in df.columns: return None
+    with timings.stage("dates", conf["id"]) as span:
+        df = df.rename(columns={target_pib: 'ПІБ', target_dob: 'Дата народження'})
+
+        # === ДАТИ ===
+        # Сміття -> NaT (Not a Time), програма не впаде. 25.01.2000 і 2000-01-25 - обидва формати
+        df['Дата народження'] = dates.birth_dates(df['Дата народження'])
+        # Позначка часу як дата, а не рядок: "10.02" за абеткою йде раніше за "09.03"
+        if 'Позначка часу' in df.columns: df['Позначка часу'] = dates.parse(df['Позначка часу'])
+
+        # Чистка ПІБ
+        df['ПІБ'] = df['ПІБ'].astype(str).str.strip()
+
+        # Видаляємо тих, у кого крива дата або немає імені
+        df = df.dropna(subset=['ПІБ', 'Дата народження'])
+        df[KEY] = patient_index.patient_ids(df['ПІБ'], df['Дата народження'])
+        timings.measure(span, df)
+    return _keep_latest(df, conf["id"])
+
+def _keep_latest(df, source="", by=(KEY,)):
+    """
+    Лишаємо найсвіжішу відповідь кожного пацієнта (за розібраною позначкою часу).
+    Пацієнт - ключ KEY (нормалізоване ПІБ + дата народження), тож "Іван  Петренко"
+    і "іван петренко" - одна людина. Однаковий час (або без позначки) - виграє
+    нижчий рядок таблиці, тобто надісланий пізніше. Порядок рядків зберігається.
+    by - колонки групи (для виправлень - пацієнт і поле).
+    """
+    with timings.stage("dedup", source) as span:
+        if df.empty: return timings.measure(span, df)
+
+        if 'Позначка часу' in df.columns:
+            stamps = df['Позначка часу'].to_numpy(dtype="datetime64[us]").astype(np.int64)
+            # NaT - найстаріша відповідь (у int64 це і так мінімум)
+        else:
+            stamps = np.zeros(len(df), dtype=np.int64)
+        # idxmax бере перший максимум, тому йдемо з кінця - тоді при рівності виграє нижчий рядок
+        rev = np.arange(len(df) - 1, -1, -1)
+        groups = [df[col].to_numpy()[rev] for col in by]
+        latest = pd.Series(stamps[rev], index=rev).groupby(groups, sort=False).idxmax()
+        return timings.measure(span, df.iloc[np.sort(latest.to_numpy())])
+
+def _combine_latest(old, new, source="", by=(KEY,)):
+    """
+    Дописує нові відповіді new до вже очищеної від дублікатів таблиці old. Найсвіжішу
+    відповідь шукаємо лише серед пацієнтів, що є в new: решта рядків old і так по одному.
+    """
+    hit = old[KEY].isin(new[KEY]).to_numpy()
+    if not hit.any(): return pd.concat([old, new])
+    return pd.concat([old[~hit], _keep_latest(pd.concat([old[hit], new]), source, by)])
+
+def _score_form(df, conf):
+    with timings.stage("scoring", conf["id"]) as span:
+        df['Вік'] = dates.ages(df['Дата народження'])
+        if conf["id"] == "doctor_form": df = process_doctor_data(df)
+        elif conf["id"] == "patient_form": df = process_patient_data(df)
+        return timings.measure(span, df)
+
+def _parse(source_id, body, columns=None, fill=0):
+    """Розбір CSV джерела (columns - заголовки, якщо body - лише дописані рядки)."""
+    with timings.stage("parse", source_id) as span:
+        if columns is not None: span["note"] = "дельта"
+        return timings.measure(span, ingest.parse_csv(body, columns).fillna(fill))
+
+def _load_incremental(source_id, url, prepare, combine, fill=0, timeout=ingest.FETCH_TIMEOUT):
+    """
+    Спільна логіка інкрементального завантаження одного джерела.
+    prepare(raw_df) -> оброблений шматок (або None), combine(old, new) -> об'єднаний результат.
+    Повертає (frame, digest).
+    """
+    state = _PROCESSED_STATE.get(source_id)
+    today = datetime.today().date()
+    # Вік рахується від сьогоднішньої дати, тому з новим днем перераховуємо все
+    if state and state["day"] != today: state = None
+
+    # Джерело ще свіже і ніхто його не скидав - навіть не йдемо в мережу
+    if state and not _needs_fetch(source_id):
+        return state["frame"], state["digest"]
+
+    # Скидання, що прийде під час завантаження, має пережити його (кнопка "Перевірити нові відповіді")
+    mark = _stale_mark(source_id)
+    with timings.stage("fetch", source_id) as span:
+        snap = ingest.fetch_csv(source_id, url, timeout=timeout)
+        span["note"] = f"{len(snap['body']) / 1024:.0f} КБ"
+    _fetched(source_id, mark)
+
+    if state and state["digest"] == snap["digest"]:
+        span["note"] += ", без змін"
+        return state["frame"], snap["digest"]
+
+    if state and snap["delta_offset"] and state["digest"] == snap["prev_digest"]:
+        # Дописані нові відповіді: парсимо та рахуємо тільки їх
+        columns = state["columns"]
+        raw = _parse(source_id, snap["body"][snap["delta_offset"]:], columns, fill)
+        fresh = prepare(raw) if not raw.empty else None
+        frame = state["frame"]
+        if fresh is not None and not fresh.empty:
+            frame = combine(frame, fresh)
+            _note_changes(source_id, fresh[KEY])
+    else:
+        raw = _parse(source_id, snap["body"], fill=fill)
+        columns = list(raw.columns)
+        frame = prepare(raw)
+        _note_changes(source_id, None)
+
+    _PROCESSED_STATE[source_id] = {"digest": snap["digest"], "columns": columns, "day": today, "frame": frame}
+    return frame, snap["digest"]
+
+def _note_changes(source_id, keys):
+    """Запам'ятовує змінених пацієнтів джерела до наступної побудови когорти (None - усіх)."""
+    pending = _PENDING.get(source_id, set())
+    _PENDING[source_id] = None if keys is None or pending is None else pending | set(keys.tolist())
+
+def _load_form(conf):
+    def prepare(raw):
+        df = _prepare_form(raw, conf)
+        return None if df is None else _score_form(df, conf)
+    return _load_incremental(conf["id"], conf["url"], prepare,
+                             lambda old, new: _combine_latest(old, new, conf["id"]),
+                             timeout=conf.get("timeout", ingest.FETCH_TIMEOUT))
+
+def _prepare_corrections(corr_df):
+    """Таблиця виправлень -> довгий формат (ключ пацієнта, поле, значення, час), по одному на пацієнта і поле."""
+    # Знаходимо колонки (шукаємо "схожі" назви) - один раз на версію заголовків
+    fields = schema.resolve(corr_df.columns, "corrections")["fields"]
+    c_pib, c_dob, c_stamp = fields["pib"], fields["dob"], fields["stamp"]
+    # Які показники є в таблиці (холестерин, тиск, талія, ...)
+    columns = {spec["id"]: fields[spec["id"]] for spec in corrections.FIELDS if fields.get(spec["id"])}
+    if not (c_pib and c_dob and columns): return None
+
+    with timings.stage("dates", "corrections") as span:
+        names = corr_df[c_pib].astype(str).str.strip()
+        # Ті самі формати дат: 1980-01-25 і 25.01.1980
+        born = dates.birth_dates(corr_df[c_dob])
+        stamps = dates.parse(corr_df[c_stamp]) if c_stamp else pd.Series(pd.NaT, index=corr_df.index, dtype="datetime64[us]")
+
+        # Прибираємо пусті дати; порожні і криві значення відкидає corrections.to_long
+        ok = born.notna().to_numpy()
+        keys = patient_index.patient_ids(names[ok], born[ok])
+        corr_long = corrections.to_long(keys, stamps[ok], {field_id: corr_df.loc[ok, col]
+                                                             for field_id, col in columns.items()})
+        timings.measure(span, corr_long)
+
+    # Лишаємо тільки останнє виправлення кожного поля кожного пацієнта
+    return _keep_latest(corr_long, "corrections", by=(KEY, "field"))
+
+def _load_corrections():
+    combine = lambda old, new: _combine_latest(old, new, "corrections", by=(KEY, "field"))
+    return _load_incremental("corrections", url_corrections, _prepare_corrections, combine, fill="")
+
+# ==========================================
+# 5. ЗНІМОК НА ДИСКУ (ТЕПЛИЙ СТАРТ)
+# ==========================================
+# Після перезапуску не чекаємо мережі: віддаємо останній збережений результат,
+# а свіжі дані підтягуємо у фоні (вже інкрементально - стан джерел теж у знімку).
+_WARM_START_DONE = False
+# Знімок - це всі таблиці і сирі CSV, тож після кожного інкрементального оновлення
+# його не переписуємо: пише один фоновий потік, не частіше ніж раз на SNAPSHOT_INTERVAL,
+# і завжди найсвіжіший стан (старіший запис не може перекрити новіший).
+SNAPSHOT_INTERVAL = 300  # секунд
+_SNAPSHOT_LOCK = threading.Lock()
+_SNAPSHOT_WRITER = None             # потік, що пише знімок (або None)
+_SNAPSHOT_DIRTY = False             # когорта змінилась після останнього запису
+_SNAPSHOT_SAVED_AT = float("-inf")  # time.monotonic() останнього запису
+
+def _schedule_snapshot():
+    """Позначає знімок застарілим і запускає потік запису, якщо він ще не працює."""
+    global _SNAPSHOT_WRITER, _SNAPSHOT_DIRTY
+    with _SNAPSHOT_LOCK:
+        _SNAPSHOT_DIRTY = True
+        if _SNAPSHOT_WRITER is not None: return
+        _SNAPSHOT_WRITER = threading.Thread(target=_snapshot_writer, daemon=True)
+        _SNAPSHOT_WRITER.start()
+
+def _snapshot_writer():
+    global _SNAPSHOT_WRITER, _SNAPSHOT_DIRTY, _SNAPSHOT_SAVED_AT
+    while True:
+        # Зміни, що прийшли під час очікування, потраплять у цей самий запис
+        time.sleep(max(0.0, _SNAPSHOT_SAVED_AT + SNAPSHOT_INTERVAL - time.monotonic()))
+        with _SNAPSHOT_LOCK:
+            if not _SNAPSHOT_DIRTY:
+                _SNAPSHOT_WRITER = None
+                return
+            _SNAPSHOT_DIRTY = False
+        _save_snapshot()
+        _SNAPSHOT_SAVED_AT = time.monotonic()
+
+def _save_snapshot():
+    """Зберігає поточний стан конвеєра на диск (працює у фоновому потоці)."""
+    with _PIPELINE_LOCK:
+        merged = _PROCESSED_STATE.get("__merged__")
+        if merged is None: return
+        frames = {"merged": merged["frame"]}
+        if merged.get("corrections") is not None: frames["merged_corrections"] = merged["corrections"]
+        sources = {}
+        for sid, state in _PROCESSED_STATE.items():
+            if sid.startswith("__") or state["frame"] is None: continue
+            frames[f"source_{sid}"] = state["frame"]
+            sources[sid] = {"digest": state["digest"], "columns": state["columns"], "day": state["day"]}
+        raw = ingest.export_state()
+        meta = {"merged": {"versions": merged["versions"], "day": merged["day"], "journal": merged["journal"],
+                           "forms": merged.get("forms"), "links": merged.get("links")},
+                "sources": sources, "ingest": {sid: info for sid, (info, _) in raw.items()}}
+        blobs = {f"raw_{sid}": body for sid, (_, body) in raw.items()}
+    # Таблиці після побудови не змінюються, тож пишемо їх уже без блокування
+    try:
+        snapshot.save(frames, meta, blobs)
+    except Exception as e:
+        print(f"⚠️ Не вдалося зберегти знімок даних: {e}")
+
+def _restore_snapshot():
+    """Відновлює стан конвеєра зі знімка. Повертає збережену таблицю або None."""
+    with timings.stage("snapshot") as span:
+        loaded = snapshot.load()
+        if loaded is None:
+            span["note"] = "знімка немає"
+            return None
+        frames, blobs, meta = loaded
+        for sid, info in meta["sources"].items():
+            _PROCESSED_STATE[sid] = {"digest": info["digest"], "columns": info["columns"],
+                                     "day": date.fromisoformat(info["day"]), "frame": frames[f"source_{sid}"]}
+        ingest.restore_state({sid: (info, blobs[f"raw_{sid}"]) for sid, info in meta["ingest"].items() if f"raw_{sid}" in blobs})
+        merged = meta["merged"]
+        _PROCESSED_STATE["__merged__"] = {"versions": merged["versions"], "day": date.fromisoformat(merged["day"]),
+                                          "frame": frames["merged"], "journal": merged.get("journal", 0),
+                                          "forms": merged.get("forms"), "links": merged.get("links"),
+                                          "corrections": frames.get("merged_corrections")}
+        span["note"] = f"знімок від {meta['saved_at']}"
+        # Виправлення, внесені після збереження знімка, - одразу, не чекаючи оновлення
+        return timings.measure(span, _overlay_journal(frames["merged"], journal.latest(since=merged.get("journal", 0))))
+
+def _warm_start():
+    """Перший виклик у процесі: якщо є знімок - одразу робимо його поточною таблицею."""
+    global _WARM_START_DONE, _CURRENT
+    with _PIPELINE_LOCK:
+        if _WARM_START_DONE or _PROCESSED_STATE:
+            _WARM_START_DONE = True
+            return
+        _WARM_START_DONE = True
+        with timings.run("Теплий старт"):
+            frame = _restore_snapshot()
+    if frame is not None and _CURRENT is None:
+        # Позначаємо як застарілу, щоб перше ж звернення запустило фонове оновлення
+        _CURRENT = {"frame": frame, "built_at": float("-inf"), "generation": None}
+
+# ==========================================
+# 6. ФОНОВЕ ОНОВЛЕННЯ (STALE-WHILE-REVALIDATE)
+# ==========================================
+# Сесії завжди отримують останню вдалу таблицю одразу. Якщо вона застаріла,
+# запускається одне (на весь процес) фонове перебудування, а нова таблиця
+# підміняє стару цілком, одним присвоєнням. Таблиця спільна для всіх сесій -
+# її не можна змінювати на місці (patient_view працює з копією рядка).
+_CURRENT = None       # {"frame", "built_at", "generation"} - остання вдала таблиця
+_LAST_ERROR = None
+_INFLIGHT = None      # threading.Event поточного перебудування (single-flight)
+_INFLIGHT_LOCK = threading.Lock()
+REFRESH_WAIT_TIMEOUT = 120  # секунд, скільки кнопки чекають на нові дані
+
+def _start_refresh():
+    """Запускає фонове перебудування, якщо воно ще не йде. Повертає Event його завершення."""
+    global _INFLIGHT
+    with _INFLIGHT_LOCK:
+        if _INFLIGHT is not None: return _INFLIGHT
+        done = _INFLIGHT = threading.Event()
+    threading.Thread(target=_refresh_worker, args=(done,), daemon=True).start()
+    return done
+
+def _refresh_worker(done):
+    global _CURRENT, _LAST_ERROR, _INFLIGHT
+    generation = _GENERATION
+    try:
+        with _PIPELINE_LOCK, timings.run("Оновлення даних"):
+            frame = timings.profiled(_build_processed_data)
+        # Порожня таблиця при наявних даних - це збій джерел: лишаємо останню вдалу
+        if frame.empty and _CURRENT is not None: frame = _CURRENT["frame"]
+        with _JOURNAL_LOCK:
+            # Виправлення, внесені з дашборду під час перебудування, не губимо
+            merged = _PROCESSED_STATE.get("__merged__")
+            if merged: frame = _overlay_journal(frame, journal.latest(since=merged["journal"]))
+            _CURRENT = {"frame": frame, "built_at": time.monotonic(), "generation": generation}
+        _LAST_ERROR = None
+    except Exception as e:
+        _LAST_ERROR = e
+        print(f"❌ Помилка фонового оновлення: {e}")
+        # Не повторюємо спробу на кожному rerun - чекаємо наступного інтервалу
+        if _CURRENT is not None: _CURRENT = dict(_CURRENT, built_at=time.monotonic())
+    finally:
+        with _INFLIGHT_LOCK: _INFLIGHT = None
+        done.set()
+
+def refresh(wait=False):
+    """Примусове оновлення (кнопки). wait=True - дочекатися, поки нові дані будуть готові."""
+    done = _start_refresh()
+    if not wait: return
+    done.wait(REFRESH_WAIT_TIMEOUT)
+    # Якщо чекали на перебудування, що почалось ще до invalidate(), - потрібне ще одне
+    if _CURRENT is not None and _CURRENT["generation"] != _GENERATION:
+        _start_refresh().wait(REFRESH_WAIT_TIMEOUT)
+
+# ==========================================
+# 7. ГОЛОВНИЙ МЕРДЖЕР (ОНОВЛЕНИЙ ЧЕРЕЗ PANDAS MERGE) 🚀
+# ==========================================
 def get_processed_data():
+    """
+    Оброблена когорта. Ніколи не чекає мережі, якщо вже є хоч якісь дані:
+    застаріла таблиця віддається одразу, а оновлення йде у фоні.
+    """
+    if _CURRENT is None: _warm_start()
+    current = _CURRENT
+    if current is None:
+        # Зовсім холодний старт: усі сесії чекають одне й те саме завантаження
+        _start_refresh().wait()
+        current = _CURRENT
+        if current is None: raise RuntimeError(f"Дані не завантажено: {_LAST_ERROR}")
+    elif current["generation"] != _GENERATION or time.monotonic() - current["built_at"] >= SOURCE_TTL:
+        _start_refresh()
+    return current["frame"]
+
+_MEMORY_REPORT = {}  # останній звіт compact.compact_frame (before/after/dropped/converted)
+
+def memory_report():
+    """Скільки займає поточна таблиця до і після стиснення типів."""
+    return dict(_MEMORY_REPORT)
+
+def get_fresh_data():
+    """Для скриптів (CLI): чекає оновлення з джерел, а не віддає застарілу таблицю."""
+    if _CURRENT is None: _warm_start()
+    refresh(wait=True)
+    if _CURRENT is None or _LAST_ERROR is not None:
+        raise RuntimeError(f"Дані не завантажено: {_LAST_ERROR}")
+    return _CURRENT["frame"]
+
+def _build_processed_data():
+    # --- ЕТАП 1: ПАРАЛЕЛЬНЕ ЗАВАНТАЖЕННЯ ВСІХ ДЖЕРЕЛ (тільки нові рядки) ---
+    # Кожне джерело качається у своєму потоці і одразу ж парситься та рахується,
+    # тому чекаємо приблизно стільки, скільки найповільніше джерело, а не суму всіх.
+    forms = [conf for conf in FORMS_CONFIG if conf["url"]]
+    results = {}
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        jobs = {pool.submit(timings.profiled, _load_form, conf): conf for conf in forms}
+        if url_corrections: jobs[pool.submit(timings.profiled, _load_corrections)] = None
+        for job in as_completed(jobs):
+            conf = jobs[job]
+            try:
+                results[conf["id"] if conf else "corrections"] = job.result()
+            except Exception as e:
+                if conf: print(f"Error loading {conf['name']}: {e}")
+                else: print(f"❌ Помилка завантаження виправлень: {e}")
+
+    # Порядок форм важливий для суфіксів _doc/_pat при злитті
     dfs_to_merge = []
-
-    # --- ЕТАП 1: ЗАВАНТАЖЕННЯ ОСНОВНИХ ДАНИХ ---
-    for conf in FORMS_CONFIG:
-        try:
-            if not conf["url"]: continue
-            df = pd.read_csv(conf["url"]).fillna(0)
-            # 🔥🔥🔥 ДІАГНОСТИКА: ВСТАВТЕ ЦЕЙ БЛОК 🔥🔥🔥
-            print(f"\n🔍 --- АНАЛІЗ ТАБЛИЦІ: {conf['name']} ---")
-            print(f"Всього колонок: {len(df.columns)}")
-            print("СПИСОК КОЛОНОК (RAW):")
-            # Виводимо кожну колонку в лапках, щоб бачити пробіли!
-            for col in df.columns:
-                print(f"   '{col}'") 
-            print("-------------------------------------------\n")
-            # 🔥🔥🔥 КІНЕЦЬ ДІАГНОСТИКИ 🔥🔥🔥
-            # Перейменування
-            target_pib = conf["identity_map"]["Name"]
-            target_dob = conf["identity_map"]["DOB"]
-            if target_pib not in df.columns: continue
-            df = df.rename(columns={target_pib: 'ПІБ', target_dob: 'Дата народження'})
-            
-            # === PANDAS МАГІЯ ДАТ ===
-            # errors='coerce' перетворить сміття на NaT (Not a Time), програма не впаде
-            # dayfirst=True важливий для наших форматів 25.01.2000
-            df['Дата народження'] = pd.to_datetime(df['Дата народження'], dayfirst=True, errors='coerce')
-            
-            # Чистка ПІБ
-            df['ПІБ'] = df['ПІБ'].astype(str).str.strip()
-            
-            # Видаляємо тих, у кого крива дата або немає імені
-            df = df.dropna(subset=['ПІБ', 'Дата народження'])
-            
-            # Сортуємо і лишаємо свіжі
-            if 'Позначка часу' in df.columns: df = df.sort_values('Позначка часу', ascending=False)
-            df = df.drop_duplicates(subset=['ПІБ', 'Дата народження'], keep='first')
-            
-            df['Вік'] = df['Дата народження'].apply(calculate_age)
-
-            if conf["id"] == "doctor_form": df = process_doctor_data(df)
-            elif conf["id"] == "patient_form": df = process_patient_data(df)
-            
+    form_ids = []
+    versions = []
+    for conf in forms:
+        if conf["id"] not in results: continue
+        df, digest = results[conf["id"]]
+        versions.append(digest)
+        if df is not None:
             dfs_to_merge.append(df)
-        except Exception as e:
-            print(f"Error loading {conf['name']}: {e}")
+            form_ids.append(conf["id"])
 
     if not dfs_to_merge: return pd.DataFrame()
+    # Підтверджені лікарями збіги пацієнтів теж змінюють злиття
+    links = linkage.links_version()
+    versions.append(links)
+    form_versions = list(versions)
+
+    corr_clean = None
+    if "corrections" in results:
+        corr_clean, digest = results["corrections"]
+        versions.append(digest)
+    # Виправлення з дашборду (локальний журнал) накладаються разом з таблицею виправлень
+    journal_version = journal.version()
+    versions.append(journal_version)
+
+    # Якщо жодне джерело не змінилось - віддаємо попередній результат
+    today = datetime.today().date()
+    merged = _PROCESSED_STATE.get("__merged__")
+    if merged and merged["versions"] == versions and merged["day"] == today:
+        return merged["frame"]
+
+    corr_all = _with_journal(corr_clean)
+    if corr_all is None: corr_all = pd.DataFrame(columns=corrections.LONG_COLUMNS)
+    # Кілька нових анкет чи виправлень - перебудовуємо лише рядки цих пацієнтів
+    full_df = None
+    keys = _changed_keys(merged, form_ids, links, corr_all, today)
+    if keys is not None: full_df = _update_rows(merged["frame"], dfs_to_merge, corr_all, keys)
+
+    if full_df is None:
+        # Форми не змінились (наприклад, прийшло лише виправлення) - беремо готове злиття
+        base = _PROCESSED_STATE.get("__base__")
+        if base and base["versions"] == form_versions and base["day"] == today:
+            base_df = base["frame"]
+        else:
+            with timings.stage("merge") as span:
+                base_df = timings.measure(span, _merge_forms(dfs_to_merge))
+            _PROCESSED_STATE["__base__"] = {"versions": form_versions, "day": today, "frame": base_df}
+
+        full_df = _apply_corrections_and_finalize(base_df, corr_all)
+        # Таблиця живе в пам'яті і ділиться між сесіями - зберігаємо її в компактних типах
+        with timings.stage("compact") as span:
+            full_df, memory = compact_cohort(full_df)
+            span["note"] = compact.format_report(memory)
+        _MEMORY_REPORT.update(memory)
+    # Можливі збіги "лише лікар" / "лише пацієнт" - рахуємо тут, щоб лікар не чекав
+    with timings.stage("linkage") as span:
+        span["rows"] = len(linkage.proposals_for(full_df))
+    _PROCESSED_STATE["__merged__"] = {"versions": versions, "day": datetime.today().date(), "frame": full_df,
+                                      "journal": journal_version, "forms": form_ids, "links": links,
+                                      "corrections": corr_all}
+    # Зміни джерел уже в когорті
+    for source_id in results: _PENDING.pop(source_id, None)
+    _schedule_snapshot()
+    return full_df
 
-    # Злиття Лікаря і Пацієнта
-    full_df = reduce(lambda l, r: pd.merge(l, r, on=['ПІБ', 'Дата народження'], how='outer', suffixes=('_doc', '_pat')), dfs_to_merge)
+def _changed_keys(merged, form_ids, links, corr_all, today):
+    """
+    Пацієнти, чиї рядки змінились з часу попередньої когорти merged (нові анкети, інші
+    виправлення), або None - якщо когорту треба зібрати повністю: новий день (вік),
+    інший набір форм чи підтверджених збігів, джерело перечитане цілком.
+    """
+    if not merged or merged["day"] != today or merged.get("forms") != form_ids or merged.get("links") != links:
+        return None
+    if merged.get("corrections") is None: return None
+    keys = set()
+    for source_id in form_ids:
+        pending = _PENDING.get(source_id, set())
+        if pending is None: return None
+        keys |= pending
+    # Виправлення: пацієнти, у яких з'явилось, зникло чи змінилось значення якогось поля
+    cols = [KEY, "field", "value"]
+    both = merged["corrections"][cols].merge(corr_all[cols], on=[KEY, "field"], how="outer", suffixes=("_old", "_new"))
+    differs = both["value_old"].astype(object).ne(both["value_new"].astype(object)).to_numpy()
+    return keys | set(both[KEY].to_numpy()[differs].tolist())
+
+def _update_rows(prev, dfs_to_merge, corr_all, keys):
+    """
+    Когорта prev, у якій заново зібрано лише рядки пацієнтів keys: злиття їхніх анкет,
+    виправлення, SCORE2 і статус (бали анкет уже пораховані для нових відповідей).
+    Решта рядків - як були. None - якщо нові рядки не лягають у таблицю prev
+    (змінились колонки форм) - тоді збираємо все.
+    """
+    if not keys: return prev
+    keys = np.fromiter(linkage.linked_keys(keys), dtype=np.int64)
+    with timings.stage("merge") as span:
+        span["note"] = f"лише змінені пацієнти ({len(keys)})"
+        parts = [df[df[KEY].isin(keys).to_numpy()] for df in dfs_to_merge]
+        fresh = timings.measure(span, _merge_forms(parts))
+    fresh = _apply_corrections_and_finalize(fresh, corr_all[corr_all[KEY].isin(keys).to_numpy()])
+
+    with timings.stage("compact") as span:
+        # Технічні колонки, які compact_frame прибрав з когорти, - прибираємо і тут
+        fresh = fresh.drop(columns=[c for c in fresh.columns if c not in prev.columns])
+        if not fresh.empty and len(fresh.columns) != len(prev.columns): return None
+        span["note"] = f"перебудовано {len(fresh)} з {len(prev)} рядків"
+        hit = prev[KEY].isin(keys).to_numpy()
+        positions = np.flatnonzero(hit)
+        if len(positions) == len(fresh) and np.array_equal(prev[KEY].to_numpy()[positions], fresh[KEY].to_numpy()):
+            # Ті самі пацієнти на тих самих місцях: копіюються лише колонки, де щось змінилось
+            fresh, frame = compact.conform(fresh, prev)
+            changed = [col for col in frame.columns
+                       if not frame[col].iloc[positions].reset_index(drop=True).equals(fresh[col].reset_index(drop=True))]
+            for col in changed: frame[col] = corrections.set_cells(frame[col], positions, fresh[col].to_numpy())
+            if not set(changed) & {KEY, *IDENTITY, *FORM_DONE.values()}:
+                # ПІБ, дати і статуси ті самі - пошуковий індекс і пропозиції збігів теж
+                patient_index.carry_over(prev, frame)
+                linkage.carry_over(prev, frame)
+            return timings.measure(span, frame)
+
+        kept = prev[~hit]
+        if fresh.empty:
+            frame = kept.reset_index(drop=True)
+        else:
+            fresh, kept = compact.conform(fresh, kept)
+            frame = pd.concat([kept, fresh], ignore_index=True)
+            # Порядок - як після повного злиття (за ключем пацієнта)
+            frame = frame.take(np.argsort(frame[KEY].to_numpy(), kind="stable")).reset_index(drop=True)
+        return timings.measure(span, frame)
+
+def _outer_join(left, right):
+    """Злиття двох форм за цілим ключем пацієнта. ПІБ і дата - з лівої форми, якщо пацієнт є в обох."""
+    merged = pd.merge(left, right, on=KEY, how='outer', suffixes=('_doc', '_pat'))
+    for col in IDENTITY:
+        # ПІБ могли написати по-різному (регістр, пробіли) - показуємо написання першої форми
+        position = merged.columns.get_loc(f"{col}_doc")
+        merged.insert(position, col, merged.pop(f"{col}_doc").combine_first(merged.pop(f"{col}_pat")))
+    return merged
+
+def _with_links(df):
+    """Ключі підтверджених пар - як у лікаря. Пацієнт міг надіслати анкету ще раз уже під
+    написанням лікаря - тоді під одним ключем дві анкети, лишаємо найсвіжішу."""
+    linked = linkage.apply_links(df)
+    return df if linked is df else _keep_latest(linked, "links")
+
+def _merge_forms(dfs_to_merge):
+    # Злиття Лікаря і Пацієнта (підтверджені лікарем збіги - під ключем анкети лікаря)
+    dfs_to_merge = dfs_to_merge[:1] + [_with_links(df) for df in dfs_to_merge[1:]]
+    full_df = reduce(_outer_join, dfs_to_merge)
     
     # Об'єднання віку
     if 'Вік_doc' in full_df.columns: full_df['Вік'] = full_df['Вік_doc'].combine_first(full_df.get('Вік_pat'))
@@ -303,75 +714,247 @@ def get_processed_data():
     # Виправляємо проблему з типами після merge (щоб не було NaN у булевих колонках)
     full_df['Status_Doctor_Done'] = full_df['Status_Doctor_Done'].fillna(False).astype(bool)
     full_df['Status_Patient_Done'] = full_df['Status_Patient_Done'].fillna(False).astype(bool)
+    return full_df
 
-    # --- ЕТАП 2: ЗАВАНТАЖЕННЯ ТА ЗЛИТТЯ ВИПРАВЛЕНЬ (MERGE) ---
-    col_chol = '[SCORE2] Рівень non-HDL холестерину (ммоль/л)'
-    
-    if url_corrections:
-        try:
-            # 1. Читаємо виправлення
-            corr_df = pd.read_csv(url_corrections).fillna("")
-            
-            # 2. Знаходимо колонки (шукаємо "схожі" назви)
-            c_pib = next((c for c in corr_df.columns if "піб" in c.lower() or "name" in c.lower()), None)
-            c_dob = next((c for c in corr_df.columns if "дат" in c.lower() or "dob" in c.lower()), None)
-            c_val = next((c for c in corr_df.columns if "chol" in c.lower() or "холест" in c.lower()), None)
-
-            if c_pib and c_dob and c_val:
-                # 3. Готуємо таблицю виправлень до формату основної
-                corr_clean = pd.DataFrame()
-                corr_clean['ПІБ'] = corr_df[c_pib].astype(str).str.strip()
-                
-                # Та сама МАГІЯ ДАТ: Pandas сам розбереться з 1980-01-25 vs 25.01.1980
-                corr_clean['Дата народження'] = pd.to_datetime(corr_df[c_dob], dayfirst=True, errors='coerce')
-                
-                # Чистимо числа (заміна коми на крапку)
-                corr_clean['Chol_New'] = corr_df[c_val].astype(str).str.replace(',', '.', regex=False)
-                corr_clean['Chol_New'] = pd.to_numeric(corr_clean['Chol_New'], errors='coerce')
-                
-                # Прибираємо пусті дати/числа
-                corr_clean = corr_clean.dropna(subset=['ПІБ', 'Дата народження', 'Chol_New'])
-                
-                # Лишаємо тільки останнє виправлення для пацієнта
-                corr_clean = corr_clean.drop_duplicates(subset=['ПІБ', 'Дата народження'], keep='last')
-
-                # 4. РОБИМО MERGE (ЛІВЕ З'ЄДНАННЯ)
-                # Ми приєднуємо виправлення до основної таблиці по ПІБ і Даті
-                full_df = pd.merge(full_df, corr_clean, on=['ПІБ', 'Дата народження'], how='left')
-                
-                # 5. ПІДМІНА ДАНИХ (COMBINE_FIRST)
-                # Якщо є Chol_New -> беремо його. Якщо немає -> залишаємо старе.
-                if col_chol not in full_df.columns: full_df[col_chol] = 0.0
-                
-                # combine_first працює навпаки: заповнює пропуски в першому аргументі другим
-                # Тому ми беремо Chol_New і заповнюємо його пропуски старим значенням
-                full_df[col_chol] = full_df['Chol_New'].combine_first(full_df[col_chol])
-                
-                # Прибираємо технічну колонку
-                full_df = full_df.drop(columns=['Chol_New'])
-                
-                print("✅ Виправлення успішно застосовані через Merge")
-
-        except Exception as e:
-            print(f"❌ Помилка Merge виправлень: {e}")
+def _rescore(df, positions, fields):
+    """
+    Після виправлення полів fields у рядках positions перераховує лише залежні від
+    них похідні колонки (SCORE2, FINDRISK) і лише в цих рядках. Колонки замінюються копіями.
+    """
+    targets = corrections.columns_for(tuple(df.columns))
+    return recompute_derived(df, positions, changed={targets[field_id] for field_id in fields})
+
+def _apply_corrections_and_finalize(full_df, corr_clean):
+    # Готове злиття форм перевикористовується між оновленнями - не змінюємо його
+    full_df = full_df.copy()
+
+    # --- ЕТАП 2: НАКЛАДАННЯ ВИПРАВЛЕНЬ ---
+    col_chol = score2.CHOL_COL
+
+    if corr_clean is not None and not corr_clean.empty:
+        with timings.stage("corrections") as span:
+            try:
+                # Усі поля одним з'єднанням за ключем пацієнта (corr_clean - довгий формат:
+                # пацієнт, поле, значення), далі - лише залежні бали змінених рядків
+                full_df, positions, changed = corrections.overlay(full_df, corr_clean)
+                full_df = _rescore(full_df, positions, changed)
+                span["note"] = (f"{len(corr_clean)} виправлень у {len(positions)} пацієнтів"
+                                f" ({', '.join(sorted(changed)) or 'без змін'})")
+
+            except Exception as e:
+                print(f"❌ Помилка накладання виправлень: {e}")
 
     # --- ЕТАП 3: ФІНАЛІЗАЦІЯ ---
     
-    # Перерахунок SCORE2 вже з новими даними
-    # Важливо: ми запускаємо це ТУТ, а не в process_doctor_data, бо холестерин міг змінитися
-    if col_chol in full_df.columns:
-         try:
-            full_df['Verdict_Score2'] = full_df.apply(get_score2_verdict_row, axis=1)
-         except: pass
-
-    # Статуси
-    def get_row_status(row):
-        if row['Status_Doctor_Done'] and row['Status_Patient_Done']: return "✅ Повний комплект"
-        elif row['Status_Doctor_Done']: return "⚠️ Тільки лікар"
-        elif row['Status_Patient_Done']: return "⏳ Очікує огляду"
-        else: return "❓ Дані відсутні"
-    
-    if not full_df.empty:
-        full_df['Загальний статус'] = full_df.apply(get_row_status, axis=1)
+    with timings.stage("finalize") as span:
+        # Перерахунок SCORE2 вже з новими даними
+        # Важливо: ми запускаємо це ТУТ, а не в process_doctor_data, бо холестерин міг змінитися
+        # Помилка тут - збій усього оновлення (лишається попередня таблиця), а не тихо застарілі вердикти
+        if col_chol in full_df.columns:
+            full_df = recompute_derived(full_df, outputs=('Verdict_Score2',))
+
+        # Статуси - з обох форм, тож теж лише після злиття
+        if not full_df.empty: full_df = recompute_derived(full_df, outputs=('Загальний статус',))
+        timings.measure(span, full_df)
 
     return full_df
+
+# ==========================================
+# 8. ОБРОБКА БЕЗ STREAMLIT (CLI, ЗА РОЗКЛАДОМ)
+# ==========================================
+# Той самий конвеєр (форми -> бали -> злиття -> виправлення -> SCORE2), але
+# без кешів застосунку: великі історичні вивантаження читаються шматками,
+# тож у пам'яті одночасно лише один шматок сирого CSV і вже оброблені пацієнти.
+CHUNK_ROWS = 50_000
+
+def _process_chunked(source_id, url, prepare, combine, chunksize, fill=0):
+    """Читає CSV шматками по chunksize рядків, обробляє кожен і зливає результати."""
+    frame = None
+    chunks = iter(pd.read_csv(url, chunksize=chunksize))
+    while True:
+        # Читання шматка - це і завантаження, і розбір: міряємо як "parse"
+        with timings.stage("parse", source_id) as span:
+            raw = next(chunks, None)
+            if raw is None: break
+            raw = timings.measure(span, raw.fillna(fill))
+        fresh = prepare(raw)
+        if fresh is None or fresh.empty: continue
+        frame = fresh if frame is None else combine(frame, fresh)
+    return frame
+
+def process_sources(doctor_url=None, patient_url=None, corrections_url=None, chunksize=CHUNK_ROWS, journal=False):
+    """
+    Оброблена когорта з вказаних CSV (шляхи або URL). Стан застосунку не чіпає.
+    Локальний журнал виправлень з дашборду (journal.JOURNAL_FILE) накладається
+    лише з journal=True - інакше результат залежить тільки від цих CSV.
+    """
+    with timings.run("Обробка CSV"):
+        return _process_sources(doctor_url, patient_url, corrections_url, chunksize, journal)
+
+def _process_sources(doctor_url, patient_url, corrections_url, chunksize, journal=False):
+    urls = {"doctor_form": doctor_url, "patient_form": patient_url}
+    dfs_to_merge = []
+    # Порядок форм важливий для суфіксів _doc/_pat при злитті
+    for conf in FORMS_CONFIG:
+        if not urls.get(conf["id"]): continue
+        def prepare(raw, conf=conf):
+            df = _prepare_form(raw, conf)
+            return None if df is None else _score_form(df, conf)
+        df = _process_chunked(conf["id"], urls[conf["id"]], prepare,
+                              lambda old, new, conf=conf: _combine_latest(old, new, conf["id"]), chunksize)
+        if df is not None: dfs_to_merge.append(df)
+
+    if not dfs_to_merge: return pd.DataFrame()
+
+    corr_clean = None
+    if corrections_url:
+        combine = lambda old, new: _combine_latest(old, new, "corrections", by=(KEY, "field"))
+        corr_clean = _process_chunked("corrections", corrections_url, _prepare_corrections, combine, chunksize, fill="")
+
+    with timings.stage("merge") as span:
+        merged = timings.measure(span, _merge_forms(dfs_to_merge))
+    return _apply_corrections_and_finalize(merged, _with_journal(corr_clean) if journal else corr_clean)
+
+# ==========================================
+# 9. ВИПРАВЛЕННЯ З ДАШБОРДУ (ЛОКАЛЬНИЙ ЖУРНАЛ)
+# ==========================================
+# Запис з дашборду не чекає перебудування когорти: поточна таблиця підміняється
+# новою, де змінено лише рядок цього пацієнта (поле і залежні від нього бали),
+# а решта колонок спільна зі старою. Наступне повне оновлення бере ті самі
+# записи журналу разом з таблицею виправлень (виграє найсвіжіше).
+_JOURNAL_LOCK = threading.Lock()  # запис у журнал і підміна _CURRENT - атомарно
+
+def _journal_long(entries):
+    """Записи журналу -> довгий формат таблиці виправлень (corrections.LONG_COLUMNS)."""
+    return pd.DataFrame({KEY: entries["patient_key"].to_numpy(dtype=np.int64),
+                         "field": entries["field"].to_numpy(),
+                         "value": entries["value"].astype(str).to_numpy(),
+                         'Позначка часу': pd.to_datetime(entries["entered_at"], format="ISO8601").to_numpy()})
+
+def _with_journal(corr_clean):
+    """Таблиця виправлень + журнал; на пацієнта і поле лишається найсвіжіше значення."""
+    entries = journal.latest()
+    if entries.empty: return corr_clean
+    local = _journal_long(entries)
+    if corr_clean is None or corr_clean.empty: return local
+    return _keep_latest(pd.concat([corr_clean, local], ignore_index=True), "corrections", by=(KEY, "field"))
+
+def _overlay_journal(frame, entries):
+    """Нова таблиця з накладеними записами журналу (змінюються лише рядки цих пацієнтів)."""
+    if entries.empty or frame.empty: return frame
+    new, positions, changed = corrections.overlay(frame, _journal_long(entries))
+    if new is frame: return frame
+    new = _rescore(new, positions, changed)
+    # Пацієнти й рядки ті самі - пошуковий індекс і пропозиції збігів переносимо
+    patient_index.carry_over(frame, new)
+    linkage.carry_over(frame, new)
+    return new
+
+def record_correction(record, field_id, value, author=""):
+    """Виправлення поля field_id (corrections.FIELDS) пацієнта з дашборду: у журнал і одразу в поточну таблицю."""
+    global _CURRENT
+    with _JOURNAL_LOCK:
+        entry = journal.add(record[KEY], field_id, value, patient=str(record['ПІБ']), author=author)
+        if _CURRENT is not None:
+            _CURRENT = dict(_CURRENT, frame=_overlay_journal(_CURRENT["frame"], pd.DataFrame([entry])))
+    return entry
+
+# ==========================================
+# 10. ПОХІДНІ КОЛОНКИ ТА ЇХ ЗАЛЕЖНОСТІ
+# ==========================================
+# Кожна похідна колонка когорти (бали, вердикти, статус) записана разом з
+# колонками, з яких вона рахується. Коли змінились лише деякі рядки чи колонки
+# (виправлення, кілька нових анкет), перераховуються тільки залежні від них
+# клітинки, а не всі бали всієї когорти.
+# outputs - похідні колонки
+# inputs  - колонки, від яких вони залежать (для цих заголовків)
+# rows    - рахуються лише в рядках з цим прапорцем (в інших - порожньо)
+# compute - підтаблиця з колонками inputs -> {колонка outputs: значення}
+FORM_DONE = {"doctor_form": 'Status_Doctor_Done', "patient_form": 'Status_Patient_Done'}
+
+_DERIVED = {}  # заголовки -> реєстр (як кеш схем у modules/schema.py)
+
+def _test_cells(tag, section, fields, df):
+    points = questionnaires.section_points(df, tag, section)
+    if tag == "FINDRISK": points = points + findrisk_extra_points(df, fields)
+    return {f"Score_{tag}": points, f"Verdict_{tag}": questionnaires.verdicts(tag, points)}
+
+def _score2_cells(df):
+    return {'Verdict_Score2': score2.score2_verdicts(df)}
+
+def _status_cells(df):
+    # Одним векторним вибором, а не apply по рядках - той будував Series на кожен рядок
+    doctor_done = df['Status_Doctor_Done'].to_numpy(dtype=bool)
+    patient_done = df['Status_Patient_Done'].to_numpy(dtype=bool)
+    status = np.select([doctor_done & patient_done, doctor_done, patient_done],
+                       ["✅ Повний комплект", "⚠️ Тільки лікар", "⏳ Очікує огляду"], "❓ Дані відсутні")
+    return {'Загальний статус': pd.Series(status, index=df.index, dtype="str")}
+
+def _build_derived(columns):
+    registry = []
+    doctor_fields = schema.resolve(columns, "doctor_form")["fields"]
+    for spec in questionnaires.QUESTIONNAIRES:
+        tag = spec["tag"]
+        if f"Score_{tag}" not in columns: continue
+        section = schema.resolve(columns, spec["form"])["sections"].get(tag, ((), ()))
+        inputs = list(section[0])
+        # FINDRISK: ще вік, ІМТ, талія і стать (findrisk_extra_points)
+        if tag == "FINDRISK": inputs += ['Вік', *filter(None, (doctor_fields[f] for f in ("bmi", "waist", "sex")))]
+        done = FORM_DONE[spec["form"]]
+        registry.append({"outputs": (f"Score_{tag}", f"Verdict_{tag}"), "inputs": inputs,
+                         "rows": done if done in columns else None,
+                         "compute": partial(_test_cells, tag, section, doctor_fields)})
+    registry.append({"outputs": ('Verdict_Score2',), "inputs": list(score2.INPUT_COLS), "rows": None,
+                     "compute": _score2_cells})
+    registry.append({"outputs": ('Загальний статус',), "inputs": list(FORM_DONE.values()), "rows": None,
+                     "compute": _status_cells})
+    return registry
+
+def derived_columns(columns):
+    """Реєстр похідних колонок для таблиці з такими заголовками (будується один раз на версію заголовків)."""
+    key = tuple(columns)
+    registry = _DERIVED.get(key)
+    if registry is None: registry = _DERIVED[key] = _build_derived(key)
+    return registry
+
+def recompute_derived(df, positions=None, changed=None, outputs=None):
+    """
+    Перераховує похідні колонки, що залежать від колонок changed (None - від будь-яких),
+    у рядках positions (None - у всіх); outputs - лише ці колонки.
+    Колонки df замінюються новими - дані, спільні з іншими таблицями, не змінюються.
+    """
+    if positions is not None and not len(positions): return df
+    for spec in derived_columns(df.columns):
+        if outputs is not None and not set(spec["outputs"]) & set(outputs): continue
+        if changed is not None and not set(spec["inputs"]) & set(changed): continue
+        # Колонки ще немає - рахуємо її для всіх рядків
+        whole = positions is None or not all(col in df.columns for col in spec["outputs"])
+        rows = np.arange(len(df)) if whole else np.asarray(positions)
+        if spec["rows"]:
+            rows = rows[df[spec["rows"]].to_numpy(dtype=bool)[rows]]
+            if not len(rows): continue
+        # Лише колонки, з яких рахується ця похідна, і лише потрібні рядки
+        subset = df[[c for c in dict.fromkeys(spec["inputs"]) if c in df.columns]].iloc[rows]
+        for col, values in spec["compute"](subset).items():
+            if whole and not spec["rows"]: df[col] = values
+            elif col in df.columns: df[col] = corrections.set_cells(df[col], rows, np.asarray(values))
+            else: df[col] = corrections.set_cells(pd.Series(np.nan, index=df.index, dtype=object), rows, np.asarray(values))
+    return df
+
+def cohort_columns(columns):
+    """
+    Колонки когорти, які хтось читає: ключ, ПІБ, дата і вік, прапорці форм, похідні
+    колонки та їхні входи (перерахунок після виправлень), поля виправлень і питання,
+    що друкуються у звіті. Решта сирих колонок форм у пам'яті не потрібна.
+    """
+    keep = {KEY, *IDENTITY, 'Вік', *FORM_DONE.values()}
+    for spec in derived_columns(columns):
+        keep.update(spec["outputs"], spec["inputs"])
+    keep.update(corrections.columns_for(tuple(columns)).values())
+    for questions in report.question_columns(columns).values():
+        keep.update(col for _, col in questions)
+    return keep
+
+def compact_cohort(df):
+    """compact.compact_frame без колонок, яких ніхто не читає. Повертає (таблиця, звіт)."""
+    return compact.compact_frame(df, keep=cohort_columns(df.columns))
@@ -0,0 +1,96 @@
+import threading
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# ДАТИ З ФОРМ: ШВИДКИЙ РОЗБІР І ВІК
+# ==========================================
+# У формах трапляється кілька форматів дат (25.01.1980, 1980-01-25, позначка часу
+# Google Sheets). pd.to_datetime(dayfirst=True) на такій суміші вгадує один формат
+# за першим рядком і решту перетворює на NaT, а в кращому разі розбирає кожен рядок
+# окремо. Тут відомі формати пробуються по черзі явним форматом (кожен - одним
+# викликом на всі ще не розібрані рядки), а кожен унікальний рядок - лише один раз.
+
+# Відомі формати - пробуються по черзі на ще не розібраних рядках
+FORMAT_SAMPLE = 200  # скільки рядків дивимось, щоб визначити найчастіший формат
+DATE_FORMATS = [
+    "%d.%m.%Y",
+    "%Y-%m-%d",
+    "%d.%m.%Y %H:%M:%S",  # позначка часу Google Sheets: 25.01.2025 9:05:07
+    "%d.%m.%Y %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+]
+
+# Розібрані дати народження між оновленнями: рядок -> Timestamp/NaT.
+# Переповнений кеш просто очищається (див. parse) - окремого скидання не потрібно
+CACHE_LIMIT = 200_000
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def _parse_strings(values):
+    """Список рядків -> Series дат тієї ж довжини (NaT для сміття)."""
+    text = pd.Series(values, dtype=object).astype(str).str.strip()
+    result = pd.Series(pd.NaT, index=text.index, dtype="datetime64[us]")
+    pending = text
+    # Спершу формат, що найчастіше трапляється у вибірці: він забирає більшість рядків,
+    # а решта форматів пробується вже лише на залишку
+    sample = text.head(FORMAT_SAMPLE)
+    hits = {fmt: pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum() for fmt in DATE_FORMATS}
+    for fmt in sorted(DATE_FORMATS, key=lambda fmt: -hits[fmt]):
+        if pending.empty: break
+        # Явний формат розбирається в C, а рядки іншого формату просто дають NaT
+        parsed = pd.to_datetime(pending, format=fmt, errors="coerce")
+        ok = parsed.notna()
+        result[ok[ok].index] = parsed[ok]
+        pending = pending[~ok]
+    # Невідомий формат: розбір по одному, але лише для рядків, де взагалі є цифри
+    pending = pending[pending.str.contains(r"\d", regex=True)]
+    if not pending.empty:
+        result[pending.index] = pd.to_datetime(pending, format="mixed", dayfirst=True, errors="coerce")
+    return result
+
+
+def parse(values, cache=False):
+    """
+    Колонка дат із форми -> datetime (NaT, якщо не розібрати).
+    Кожен унікальний рядок розбирається один раз; cache=True - ще й пам'ятає
+    результат між викликами (дати народження повторюються з оновлення в оновлення).
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(series): return series
+    codes, uniques = pd.factorize(series)
+    keys = pd.Index(uniques).astype(str).tolist()
+
+    if cache:
+        with _LOCK:
+            known = {k: _CACHE[k] for k in keys if k in _CACHE}
+        missing = [k for k in keys if k not in known]
+        if missing:
+            fresh = dict(zip(missing, _parse_strings(missing)))
+            known.update(fresh)
+            with _LOCK:
+                if len(_CACHE) + len(fresh) > CACHE_LIMIT: _CACHE.clear()
+                _CACHE.update(fresh)
+        parsed = pd.Series([known[k] for k in keys], dtype="datetime64[us]")
+    else:
+        parsed = _parse_strings(keys)
+
+    # Порожні клітинки (код -1) беруть останній елемент - NaT
+    lookup = np.append(parsed.to_numpy(), np.datetime64("NaT", "us"))
+    return pd.Series(lookup[codes], index=series.index, name=series.name)
+
+
+def birth_dates(values):
+    """Дати народження: без часу, з кешем між оновленнями."""
+    return parse(values, cache=True).dt.normalize()
+
+
+def ages(born, today=None):
+    """Повних років на дату today (типово - сьогодні) для всієї колонки; без дати - 0."""
+    today = pd.Timestamp.today() if today is None else pd.Timestamp(today)
+    born = pd.Series(born)
+    month, day = born.dt.month, born.dt.day
+    # День народження цього року ще не настав
+    before_birthday = (month > today.month) | ((month == today.month) & (day > today.day))
+    return (today.year - born.dt.year - before_birthday).fillna(0).astype("int64")
@@ -0,0 +1,115 @@
+import hashlib
+import io
+import os
+import threading
+import urllib.request
+import urllib.error
+import pandas as pd
+
+# ==========================================
+# ЗАВАНТАЖЕННЯ CSV-ДЖЕРЕЛ (GOOGLE SHEETS)
+# ==========================================
+# Google Sheets віддає CSV цілком. Щоб не обробляти все заново кожні 60 с,
+# ми пам'ятаємо, що вже скачали (ETag / Last-Modified / хеш вмісту),
+# і повідомляємо викликачу, чи змінилось джерело і чи це просто дописані рядки.
+
+FETCH_TIMEOUT = 30  # секунд на одне джерело
+
+# source_id -> {"url", "etag", "last_modified", "body", "digest", "rows"}
+_SOURCE_STATE = {}
+_STATE_LOCK = threading.Lock()
+
+
+def _is_remote(url):
+    return url.startswith(("http://", "https://"))
+
+
+def _download(url, prev, timeout):
+    """Повертає (body, etag, last_modified). body=None означає 'не змінилось'."""
+    if not _is_remote(url):
+        # Локальний файл (офлайн-тести / CLI): валідатор - час зміни файлу
+        path = url[len("file://"):] if url.startswith("file://") else url
+        stat = os.stat(path)
+        stamp = f"{stat.st_mtime_ns}-{stat.st_size}"
+        if prev and prev.get("last_modified") == stamp: return None, prev.get("etag"), stamp
+        with open(path, "rb") as fh:
+            return fh.read(), None, stamp
+
+    request = urllib.request.Request(url)
+    if prev:
+        if prev.get("etag"): request.add_header("If-None-Match", prev["etag"])
+        if prev.get("last_modified"): request.add_header("If-Modified-Since", prev["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            return resp.read(), resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+    except urllib.error.HTTPError as e:
+        if e.code == 304 and prev: return None, prev.get("etag"), prev.get("last_modified")
+        raise
+
+
+def fetch_csv(source_id, url, timeout=FETCH_TIMEOUT):
+    """
+    Скачує CSV з умовним запитом і порівнює з попередньою версією.
+    Повертає словник:
+      body         - повний вміст (bytes)
+      digest       - sha256 вмісту
+      prev_digest  - хеш попередньої версії (або None)
+      delta_offset - з якого байта починаються дописані рядки (або None,
+                     якщо файл змінився не лише дописуванням)
+    """
+    with _STATE_LOCK:
+        prev = _SOURCE_STATE.get(source_id)
+    if prev and prev["url"] != url: prev = None
+
+    body, etag, last_modified = _download(url, prev, timeout)
+
+    if body is None:
+        # 304 Not Modified - нічого не змінилось
+        return {"body": prev["body"], "digest": prev["digest"], "prev_digest": prev["digest"],
+                "delta_offset": None, "rows": prev["rows"]}
+
+    digest = hashlib.sha256(body).hexdigest()
+    delta_offset = None
+    if prev and digest != prev["digest"]:
+        old = prev["body"]
+        # Дописування: старий вміст - префікс нового, і нове починається з нового рядка
+        if len(body) > len(old) and body.startswith(old):
+            if old.endswith(b"\n") or body[len(old):len(old) + 1] in (b"\r", b"\n"):
+                delta_offset = len(old)
+
+    rows = body.count(b"\n")
+    with _STATE_LOCK:
+        _SOURCE_STATE[source_id] = {"url": url, "etag": etag, "last_modified": last_modified,
+                                    "body": body, "digest": digest, "rows": rows}
+
+    return {"body": body, "digest": digest, "prev_digest": prev["digest"] if prev else None,
+            "delta_offset": delta_offset, "rows": rows}
+
+
+def parse_csv(body, columns=None):
+    """Парсить CSV. Якщо передано columns - це шматок без заголовка (дописані рядки)."""
+    if columns is None:
+        return pd.read_csv(io.BytesIO(body))
+    if not body.strip():
+        return pd.DataFrame(columns=columns)
+    return pd.read_csv(io.BytesIO(body), header=None, names=columns)
+
+
+def reset_state(source_id=None):
+    """Забуває збережені версії (одного джерела або всіх)."""
+    with _STATE_LOCK:
+        if source_id is None: _SOURCE_STATE.clear()
+        else: _SOURCE_STATE.pop(source_id, None)
+
+
+def export_state():
+    """Копія збережених версій: source_id -> (метадані, сирі байти). Для знімка на диску."""
+    with _STATE_LOCK:
+        return {sid: ({k: v for k, v in st.items() if k != "body"}, st["body"]) for sid, st in _SOURCE_STATE.items()}
+
+
+def restore_state(states):
+    """Відновлює збережені версії, щоб перше ж оновлення після старту було інкрементальним."""
+    with _STATE_LOCK:
+        for sid, (meta, body) in states.items():
+            _SOURCE_STATE[sid] = dict(meta, body=body)
@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+import pandas as pd
+
+# ==========================================
+# ЛОКАЛЬНИЙ ЖУРНАЛ ВИПРАВЛЕНЬ (SQLITE)
+# ==========================================
+# Лікар вносить аналіз прямо з дашборду: запис лягає сюди (лише дописування,
+# нічого не переписується), а не йде колом через Google Форму і повне
+# перекачування таблиць. WAL дозволяє читати журнал (фонове оновлення, CLI),
+# поки в нього пишуть. Google Форма лишається необов'язковою копією.
+
+JOURNAL_FILE = os.environ.get("SCREENING_JOURNAL_FILE", "corrections_journal.db")
+
+# Поле - id з corrections.FIELDS; значення - число або текст (стать), як ввели
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    patient_key INTEGER NOT NULL,
+    field       TEXT NOT NULL,
+    value,
+    entered_at  TEXT NOT NULL,
+    patient     TEXT NOT NULL DEFAULT '',
+    author      TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS entries_patient ON entries (patient_key, field, id);
+"""
+
+ENTRY_COLUMNS = ["id", "patient_key", "field", "value", "entered_at"]
+
+_CONN = None
+_CONN_FILE = None
+_LOCK = threading.Lock()
+
+
+def _connection():
+    """Одне з'єднання на процес (під _LOCK). Файл змінили (тести, CLI) - відкриваємо новий."""
+    global _CONN, _CONN_FILE
+    if _CONN is None or _CONN_FILE != JOURNAL_FILE:
+        if _CONN is not None: _CONN.close()
+        _CONN = sqlite3.connect(JOURNAL_FILE, check_same_thread=False, timeout=10)
+        _CONN.execute("PRAGMA journal_mode=WAL")
+        _CONN.execute("PRAGMA synchronous=NORMAL")
+        _CONN.executescript(_SCHEMA)
+        _CONN_FILE = JOURNAL_FILE
+    return _CONN
+
+
+def add(patient_key, field, value, patient="", author=""):
+    """Дописує виправлення поля field. Повертає запис (dict з ENTRY_COLUMNS)."""
+    entered_at = datetime.now().isoformat(timespec="seconds")
+    if hasattr(value, "item"): value = value.item()  # numpy-числа sqlite3 не приймає
+    with _LOCK:
+        conn = _connection()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO entries (patient_key, field, value, entered_at, patient, author) VALUES (?, ?, ?, ?, ?, ?)",
+                (int(patient_key), field, value, entered_at, patient, author))
+    return {"id": cursor.lastrowid, "patient_key": int(patient_key), "field": field,
+            "value": value, "entered_at": entered_at}
+
+
+def version():
+    """Номер останнього запису (0 - журнал порожній). Росте з кожним виправленням."""
+    if not os.path.exists(JOURNAL_FILE): return 0
+    with _LOCK:
+        return _connection().execute("SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+
+
+def latest(since=0):
+    """
+    Останнє значення кожного поля кожного пацієнта серед записів з id > since:
+    DataFrame з колонками ENTRY_COLUMNS, у порядку внесення (за id).
+    """
+    if not os.path.exists(JOURNAL_FILE): return pd.DataFrame(columns=ENTRY_COLUMNS)
+    # У SQLite колонки поруч з MAX(id) беруться з того самого (найсвіжішого) рядка
+    query = ("SELECT MAX(id) AS id, patient_key, field, value, entered_at FROM entries "
+             "WHERE id > ? GROUP BY patient_key, field ORDER BY id")
+    with _LOCK:
+        rows = _connection().execute(query, (int(since),)).fetchall()
+    return pd.DataFrame(rows, columns=ENTRY_COLUMNS)
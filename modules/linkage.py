@@ -0,0 +1,196 @@
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from modules import patient_index
+
+# ==========================================
+# МОЖЛИВІ ЗБІГИ ПАЦІЄНТІВ МІЖ ФОРМАМИ (RECORD LINKAGE)
+# ==========================================
+# Лікар і пацієнт набирають ПІБ кожен сам, тож одна описка - і людина висить
+# у двох рядках: "⚠️ Тільки лікар" і "⏳ Очікує огляду". Після точного злиття
+# шукаємо для таких рядків пару з тією ж датою народження (блок) і схожим ПІБ
+# (спільні трійки літер). Порівнюємо лише всередині блоку, а не всіх з усіма.
+# Пари лише пропонуються - об'єднуються вони після підтвердження лікарем.
+
+MATCH_THRESHOLD = 0.7         # мінімальна схожість ПІБ (коефіцієнт Дайса по трійках літер)
+MAX_BLOCK_PAIRS = 10_000      # блок більший за це (напр. дата-заглушка 01.01.1900) пропускаємо
+NGRAM = 3
+
+# Рішення лікарів: підтверджені пари (ключ пацієнта -> ключ лікаря) і відхилені
+LINKS_FILE = os.environ.get("SCREENING_LINKS_FILE", "patient_links.json")
+
+_LINKS = None        # {"confirmed": {patient_key: doctor_key}, "rejected": {(doctor_key, patient_key)}}
+_LOCK = threading.Lock()
+
+_PROPOSALS = []      # [(frame, proposals)] - кеш на таблицю, як в patient_index
+_PROPOSAL_SLOTS = 2
+
+PROPOSAL_COLUMNS = ["doctor_key", "patient_key", "doctor_name", "patient_name", "dob", "score"]
+
+
+def _ngrams(name):
+    padded = f" {name} "
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+def _dice(grams_a, grams_b):
+    """Схожість двох наборів трійок від 0 до 1 (коефіцієнт Дайса)."""
+    if not grams_a or not grams_b: return 0.0
+    return 2 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+
+
+def similarity(a, b):
+    """Схожість двох нормалізованих ПІБ від 0 до 1."""
+    return _dice(_ngrams(a), _ngrams(b))
+
+
+def _unmatched(df, own, other):
+    side = df[df[own].to_numpy(dtype=bool) & ~df[other].to_numpy(dtype=bool)]
+    return pd.DataFrame({"key": side[patient_index.KEY_COLUMN].to_numpy(),
+                         "name": side['ПІБ'].astype(str).to_numpy(),
+                         "norm": patient_index.normalize_names(side['ПІБ']),
+                         "dob": side['Дата народження'].to_numpy()})
+
+
+def propose(df):
+    """
+    Пропозиції злиття для рядків "лише лікар" / "лише пацієнт": DataFrame з колонками
+    PROPOSAL_COLUMNS, від найсхожіших. Кожен рядок потрапляє щонайбільше в одну пару.
+    """
+    needed = {patient_index.KEY_COLUMN, 'ПІБ', 'Дата народження', 'Status_Doctor_Done', 'Status_Patient_Done'}
+    if df.empty or not needed.issubset(df.columns): return pd.DataFrame(columns=PROPOSAL_COLUMNS)
+    doctors = _unmatched(df, 'Status_Doctor_Done', 'Status_Patient_Done')
+    patients = _unmatched(df, 'Status_Patient_Done', 'Status_Doctor_Done')
+
+    # Блоки - однакова дата народження; завеликі блоки не порівнюємо
+    sizes = doctors["dob"].value_counts().mul(patients["dob"].value_counts(), fill_value=0)
+    too_big = sizes[sizes > MAX_BLOCK_PAIRS]
+    if len(too_big):
+        print(f"⚠️ Пошук збігів: пропущено {len(too_big)} завеликих блоків дат ({too_big.index[0]:%d.%m.%Y} ...)")
+        doctors = doctors[~doctors["dob"].isin(too_big.index)]
+    pairs = doctors.merge(patients, on="dob", suffixes=("_doc", "_pat"))
+    if pairs.empty: return pd.DataFrame(columns=PROPOSAL_COLUMNS)
+
+    # Трійки кожного ПІБ рахуємо один раз, навіть якщо воно в кількох парах
+    grams = {name: _ngrams(name) for name in set(pairs["norm_doc"]) | set(pairs["norm_pat"])}
+    pairs["score"] = [_dice(grams[a], grams[b]) for a, b in zip(pairs["norm_doc"], pairs["norm_pat"])]
+    pairs = pairs[pairs["score"] >= MATCH_THRESHOLD].sort_values("score", ascending=False, kind="stable")
+
+    rejected = load_links()["rejected"]
+    used_doc, used_pat, keep = set(), set(), []
+    for i, doc_key, pat_key in zip(range(len(pairs)), pairs["key_doc"], pairs["key_pat"]):
+        if doc_key in used_doc or pat_key in used_pat or (doc_key, pat_key) in rejected: continue
+        used_doc.add(doc_key)
+        used_pat.add(pat_key)
+        keep.append(i)
+    pairs = pairs.iloc[keep]
+    return pd.DataFrame({"doctor_key": pairs["key_doc"].to_numpy(), "patient_key": pairs["key_pat"].to_numpy(),
+                         "doctor_name": pairs["name_doc"].to_numpy(), "patient_name": pairs["name_pat"].to_numpy(),
+                         "dob": pairs["dob"].to_numpy(), "score": pairs["score"].to_numpy()})
+
+
+def proposals_for(df):
+    """Пропозиції для цієї таблиці (рахуються один раз на таблицю, далі - з кешу)."""
+    with _LOCK:
+        for frame, result in _PROPOSALS:
+            if frame is df: return result
+    result = propose(df)
+    with _LOCK:
+        _PROPOSALS.append((df, result))
+        del _PROPOSALS[:-_PROPOSAL_SLOTS]
+    return result
+
+
+def carry_over(old, new):
+    """Таблиця new - це old з іншими аналізами (ті самі ПІБ і статуси): пропозиції ті самі."""
+    with _LOCK:
+        result = next((result for frame, result in _PROPOSALS if frame is old), None)
+        if result is None: return
+        _PROPOSALS.append((new, result))
+        del _PROPOSALS[:-_PROPOSAL_SLOTS]
+
+
+# ==========================================
+# РІШЕННЯ ЛІКАРІВ (ФАЙЛ НА ДИСКУ)
+# ==========================================
+
+def load_links():
+    """Підтверджені і відхилені пари (читаються з файлу один раз)."""
+    global _LINKS
+    with _LOCK:
+        if _LINKS is None:
+            _LINKS = {"confirmed": {}, "rejected": set()}
+            try:
+                with open(LINKS_FILE, encoding="utf-8") as fh:
+                    raw = json.load(fh)
+                _LINKS["confirmed"] = {int(p): int(d) for p, d in raw.get("confirmed", {}).items()}
+                _LINKS["rejected"] = {(int(d), int(p)) for d, p in raw.get("rejected", [])}
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"⚠️ Не вдалося прочитати {LINKS_FILE}: {e}")
+        return _LINKS
+
+
+def _save():
+    data = {"confirmed": {str(p): d for p, d in _LINKS["confirmed"].items()},
+            "rejected": sorted([d, p] for d, p in _LINKS["rejected"])}
+    tmp = f"{LINKS_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, ensure_ascii=False)
+    os.replace(tmp, LINKS_FILE)
+
+
+def _decide(doctor_key, patient_key, confirmed):
+    load_links()
+    doctor_key, patient_key = int(doctor_key), int(patient_key)
+    with _LOCK:
+        if confirmed: _LINKS["confirmed"][patient_key] = doctor_key
+        else: _LINKS["rejected"].add((doctor_key, patient_key))
+        _PROPOSALS.clear()
+        _save()
+
+
+def confirm(doctor_key, patient_key):
+    """Лікар підтвердив: це одна людина. Анкета пацієнта зливатиметься з анкетою лікаря."""
+    _decide(doctor_key, patient_key, True)
+
+
+def reject(doctor_key, patient_key):
+    """Лікар відхилив пару - більше її не пропонуємо."""
+    _decide(doctor_key, patient_key, False)
+
+
+def links_version():
+    """Відбиток підтверджених пар: змінився - злиття форм треба перебудувати."""
+    confirmed = load_links()["confirmed"]
+    with _LOCK:
+        return f"links:{len(confirmed)}:{hash(frozenset(confirmed.items())) & 0xFFFFFFFF:08x}"
+
+
+def linked_keys(keys):
+    """Ключі разом з їхніми парами: рядок когорти підтвердженої пари складається з обох анкет."""
+    confirmed = load_links()["confirmed"]
+    keys = set(keys)
+    if not confirmed: return keys
+    with _LOCK:
+        pairs = list(confirmed.items())
+    return keys | {d for p, d in pairs if p in keys} | {p for p, d in pairs if d in keys}
+
+
+def apply_links(df):
+    """Підміняє ключі підтверджених пацієнтів на ключі лікаря (для злиття форм). Оригінал не змінює."""
+    confirmed = load_links()["confirmed"]
+    key = patient_index.KEY_COLUMN
+    if not confirmed or df.empty: return df
+    keys = df[key].to_numpy(dtype=np.int64)
+    linked = np.isin(keys, np.fromiter(confirmed, dtype=np.int64, count=len(confirmed)))
+    if not linked.any(): return df
+    # Без map(): NaN перетворив би ключі на float і зіпсував би 64-бітні значення
+    keys = keys.copy()
+    keys[linked] = [confirmed[k] for k in keys[linked].tolist()]
+    df = df.copy()
+    df[key] = keys
+    return df
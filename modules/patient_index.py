@@ -0,0 +1,153 @@
+import bisect
+import threading
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# ІНДЕКС ПАЦІЄНТІВ (ПОШУК БЕЗ ПЕРЕГЛЯДУ ВСІЄЇ ТАБЛИЦІ)
+# ==========================================
+# Таблиця когорти не змінюється на місці (нові дані - новий DataFrame),
+# тож індекс будуємо один раз на кожну таблицю і ділимо між усіма сесіями.
+# Ключ пацієнта - нормалізоване ПІБ + дата народження, тому тезки з різною
+# датою народження більше не зливаються в один запис.
+
+# Цілий ключ пацієнта (хеш нормалізованого ПІБ + дати народження) - по ньому
+# зливаються форми лікаря, пацієнта і виправлення
+KEY_COLUMN = "Ключ пацієнта"
+
+INDEX_SLOTS = 2  # поточна і попередня таблиця (поки сесії переходять на нову)
+
+_INDEXES = []    # [(frame, index)], найсвіжіший - останній
+_LOCK = threading.Lock()
+
+# Різні апострофи з клавіатур/телефонів -> один
+_APOSTROPHES = str.maketrans({"’": "'", "ʼ": "'", "‘": "'", "`": "'"})
+_APOSTROPHES_RE = "[’ʼ‘`]"
+# Латинські літери, що виглядають як кириличні (після casefold): "Петренкo" з латинською "o"
+_HOMOGLYPHS = str.maketrans("abcehikmoptxy", "авсенікмортху")
+_LATIN_RE = "[abcehikmoptxy]"
+# Для ASCII і кирилиці lower() == casefold(), а пробіли - лише ASCII, тож такі ПІБ
+# можна нормалізувати рядковими операціями pandas (без Python-циклу)
+_NOT_SIMPLE = "[^\x00-\x7f\u0400-\u052f’ʼ‘]"
+_SIMPLE_SPACES = "[\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f ]+"
+
+
+def normalize_name(name):
+    """ПІБ для порівняння: без зайвих пробілів, регістру, різних апострофів і латиниці-двійників."""
+    return " ".join(str(name).translate(_APOSTROPHES).split()).casefold().translate(_HOMOGLYPHS)
+
+
+def normalize_names(values):
+    """
+    normalize_name для цілої колонки. ПІБ лише з латиниці/кирилиці (майже всі)
+    нормалізуються векторно, решта (інші алфавіти, рідкісні пробіли) - по одному.
+    """
+    names = pd.Series(values, dtype=object).fillna("").astype(str)
+    simple = ~names.str.contains(_NOT_SIMPLE, regex=True)
+    normalized = (names.str.replace(_APOSTROPHES_RE, "'", regex=True)
+                  .str.replace(_SIMPLE_SPACES, " ", regex=True).str.strip(" \t\n\x0b\x0c\r\x1c\x1d\x1e\x1f")
+                  .str.lower())
+    result = normalized.to_numpy(dtype=object)
+    # Латинські двійники трапляються рідко - translate лише для таких рядків
+    latin = normalized.str.contains(_LATIN_RE, regex=True).to_numpy()
+    if latin.any():
+        result[latin] = [name.translate(_HOMOGLYPHS) for name in result[latin]]
+    if not simple.all():
+        rest = ~simple.to_numpy()
+        result[rest] = [normalize_name(name) for name in names[rest]]
+    return result
+
+
+def patient_ids(names, dobs):
+    """
+    Цілі ключі пацієнтів (int64) для колонок ПІБ і дати народження.
+    Хеш, а не порядковий номер - тож той самий пацієнт має той самий ключ
+    у кожному джерелі, в кожному оновленні і після перезапуску (знімок).
+    """
+    days = pd.Series(dobs).to_numpy(dtype="datetime64[D]").astype(np.int64)
+    frame = pd.DataFrame({"name": normalize_names(names), "dob": days})
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy().view(np.int64)
+
+
+def _build(df):
+    names = df['ПІБ'].astype(str).tolist() if 'ПІБ' in df.columns else [""] * len(df)
+    if 'Дата народження' in df.columns:
+        # Форматуємо лише унікальні дати (strftime повільний, а дат народження набагато менше, ніж рядків)
+        codes, uniques = pd.factorize(pd.to_datetime(df['Дата народження'], errors='coerce'))
+        formatted = pd.Series(uniques).dt.strftime('%d.%m.%Y').tolist() + [""]
+        dobs = [formatted[c] for c in codes]  # код -1 (порожня дата) -> ""
+    else:
+        dobs = [""] * len(df)
+
+    positions = {}   # ключ -> номер рядка (iloc): 'нормалізоване піб|дд.мм.рррр'
+    labels = {}      # ключ -> що показувати у списку
+    for pos, (name, norm, dob) in enumerate(zip(names, normalize_names(names), dobs)):
+        key = f"{norm}|{dob}"
+        if key in positions: continue  # той самий пацієнт, записаний трохи інакше - беремо перший рядок
+        positions[key] = pos
+        labels[key] = f"{name} ({dob})" if dob else name
+
+    # Список для вибору - за алфавітом, як і раніше
+    ordered = sorted(positions, key=lambda k: (labels[k], k))
+    # Для пошуку за початком - ключі в порядку сортування самих ключів (bisect)
+    by_key = sorted(positions)
+    # Для пошуку за частиною - усі ключі одним рядком (пошук іде в C, а не по таблиці)
+    blob = "\n".join(ordered)
+    offsets, start = [], 0
+    for key in ordered:
+        offsets.append(start)
+        start += len(key) + 1
+
+    return {"positions": positions, "labels": labels, "ordered": ordered,
+            "by_key": by_key, "blob": blob, "offsets": offsets}
+
+
+def get_index(df):
+    """Індекс для цієї таблиці (будується один раз, далі - з кешу)."""
+    with _LOCK:
+        for frame, index in _INDEXES:
+            if frame is df: return index
+        index = _build(df)
+        # Тримаємо посилання на таблицю: поки вона в кеші, її id не може дістатись іншій
+        _INDEXES.append((df, index))
+        del _INDEXES[:-INDEX_SLOTS]
+        return index
+
+
+def carry_over(old, new):
+    """Таблиця new - це old з іншими значеннями (ті самі пацієнти й рядки): індекс не перебудовуємо."""
+    with _LOCK:
+        index = next((index for frame, index in _INDEXES if frame is old), None)
+        if index is None: return
+        _INDEXES.append((new, index))
+        del _INDEXES[:-INDEX_SLOTS]
+
+
+def search(index, query, limit=200):
+    """
+    Ключі пацієнтів, що відповідають запиту: спершу ті, що починаються з нього,
+    потім ті, що просто містять його (ПІБ або дату народження). Не більше limit.
+    """
+    query = normalize_name(query)
+    if not query: return index["ordered"][:limit]
+
+    found, seen = [], set()
+    by_key = index["by_key"]
+    i = bisect.bisect_left(by_key, query)
+    while i < len(by_key) and by_key[i].startswith(query) and len(found) < limit:
+        found.append(by_key[i])
+        seen.add(by_key[i])
+        i += 1
+
+    blob, offsets, ordered = index["blob"], index["offsets"], index["ordered"]
+    at = blob.find(query)
+    while at != -1 and len(found) < limit:
+        n = bisect.bisect_right(offsets, at) - 1
+        key = ordered[n]
+        if key not in seen:
+            found.append(key)
+            seen.add(key)
+        # Наступний пошук - з початку наступного ключа
+        if n + 1 >= len(offsets): break
+        at = blob.find(query, offsets[n + 1])
+    return found
@@ -1,8 +1,10 @@
 import streamlit as st
 import pandas as pd
 import base64
+import os
+import tempfile
 import urllib.parse
-from modules import pdf_gen 
+from modules import batch_export, compact, corrections, data_manager, linkage, patient_index, report, schema, score2, timings
 from streamlit_pdf_viewer import pdf_viewer
 
 # ==========================================
@@ -19,63 +21,13 @@ ENTRY_CHOL = "entry.145333753"      # Код для поля Холестери
 # ==========================================
 
 
-TESTS_CONFIG = [
-    {"tag": "Score2",   "name": "SCORE-2 (Серцевий ризик)", "search_key": "SCORE2", "has_score": False},
-    {"tag": "FINDRISK", "name": "FINDRISK (Діабет)",       "search_key": "Findrisc", "has_score": True},
-    {"tag": "PHQ",      "name": "PHQ-9 (Депресія)",        "search_key": "PHQ",      "has_score": True},
-    {"tag": "GAD",      "name": "GAD-7 (Тривожність)",     "search_key": "GAD",      "has_score": True},
-    {"tag": "Audit",    "name": "AUDIT (Алкоголь)",        "search_key": "AUDIT",    "has_score": True},
-    {"tag": "Smoke",    "name": "Нікотинова залежність",   "search_key": "Паління",  "has_score": True}
-]
-
-def recalculate_score2_local(record, new_cholesterol):
-    """Локальний перерахунок SCORE-2."""
-    sex = record.get('Вкажіть стать', 'Не вказано')
-    smoke = record.get('[SCORE2] Куріння тютюнових виробів', 'Ні')
-    age = int(record.get('Вік', 0))
-    sbp = float(record.get('[SCORE2] Систолічний артеріальний тиск', 0))
-    chol = float(new_cholesterol)
-
-    if age == 0: return "⚪ Недостатньо даних (Вік)"
-    if chol <= 0: return "⚪ Введіть холестерин"
-
-    def is_green():
-        if sex == 'жінка' and smoke == 'Ні':
-            if age < 45 and sbp < 120 and chol <= 5: return True
-            if 49 < age < 55 and sbp < 120 and chol <= 3: return True
-        return False
-
-    def is_yellow():
-        if sbp >= 180 or chol >= 8: return False
-        if sex == 'жінка':
-            if smoke == 'Ні':
-                if age < 50: return True 
-                if 50 <= age < 55: return not (sbp >= 160 or (sbp >= 140 and chol >= 6))
-                if 55 <= age < 60: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
-                if 60 <= age < 70: return not (sbp >= 140 or chol >= 6)
-                if 70 <= age < 90: return not (sbp >= 160 or chol >= 7)
-            else: 
-                if age < 50: return not (sbp >= 160 or (sbp >= 140 and chol >= 6))
-                if 50 <= age < 55: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
-                if 55 <= age < 70: return not (sbp >= 140 or (sbp >= 120 and chol >= 5))
-                if 70 <= age < 90: return not (sbp >= 140 or chol >= 6)
-        elif sex == 'чоловік':
-            if smoke == 'Ні':
-                if age < 50: return not (sbp >= 160 or (sbp >= 140 and chol >= 6))
-                if 50 <= age < 55: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
-                if 55 <= age < 70: return not (sbp >= 140 or chol >= 6)
-                if 70 <= age < 90: return not (sbp >= 140 or chol >= 6)
-            else:
-                if age < 50: return not (sbp >= 160 or (sbp >= 140 and chol >= 5))
-                if 50 <= age < 55: return not (sbp >= 140 or chol >= 6)
-                if 55 <= age < 70: return not (sbp >= 120 or chol >= 4)
-                if 70 <= age < 90: return not (sbp >= 120 or chol >= 5)
-        return False
-
-    if is_green(): return "🟢 Низький ризик"
-    elif is_yellow(): return "🟡 Помірний ризик"
-    else: return "🔴 Високий ризик"
+# Перелік тестів і побудова звіту для друку - у modules/report.py
+TESTS_CONFIG = report.TESTS_CONFIG
 
+# Скільки пацієнтів максимум показувати у списку вибору
+PATIENT_LIST_LIMIT = 1000
+# Скільки можливих збігів пацієнтів показувати за раз
+LINK_PROPOSALS_LIMIT = 50
 
 def show_dashboard(df):
     """Головний екран."""
@@ -86,9 +38,18 @@ def show_dashboard(df):
         st.error(f"Помилка: Відсутня колонка '{search_col}'.")
         return
 
-    patient_list = sorted(df[search_col].unique().astype(str))
-    selected_patient = st.selectbox("🔍 Пошук пацієнта:", patient_list)
-    record = df[df[search_col] == selected_patient].iloc[0].copy()
+    # Індекс (ПІБ + дата народження -> рядок) будується раз на версію даних і спільний для всіх сесій
+    index = patient_index.get_index(df)
+    query = st.text_input("🔍 Пошук пацієнта:", placeholder="Почніть вводити ПІБ або дату народження")
+    options = patient_index.search(index, query, limit=PATIENT_LIST_LIMIT)
+    if not options:
+        st.info("Пацієнтів не знайдено.")
+        return
+    if len(options) == PATIENT_LIST_LIMIT:
+        st.caption(f"Показано перших {PATIENT_LIST_LIMIT} пацієнтів - уточніть пошук.")
+    selected_key = st.selectbox("Пацієнт:", options, format_func=index["labels"].get, key="selected_patient")
+    record = df.iloc[index["positions"][selected_key]].copy()
+    selected_patient = str(record['ПІБ'])
 
     st.divider()
     col1, col2, col3, col4 = st.columns(4)
@@ -118,62 +79,83 @@ def show_dashboard(df):
 
     # === БЛОК ВВОДУ ===
     st.markdown("### 🧪 Введення аналізів")
-    
-    col_chol = '[SCORE2] Рівень non-HDL холестерину (ммоль/л)'
-    current_val = float(record.get(col_chol, 0))
+
+    # Який показник виправляємо (холестерин, тиск, талія, ІМТ, стать)
+    spec = st.selectbox("Показник:", corrections.FIELDS, format_func=lambda f: f["label"], key="correction_field")
+    target_col = corrections.columns_for(tuple(record.index))[spec["id"]]
+    current_val = record.get(target_col)
 
     col_in, col_action = st.columns([1, 2])
     
     with col_in:
-        st.metric("Поточне значення в базі:", value=current_val)
-        new_val_local = st.number_input("Нове значення:", min_value=0.0, step=0.1, key="input_chol")
+        if spec["kind"] == "number":
+            current_num = pd.to_numeric(str(current_val).replace(',', '.'), errors='coerce')
+            st.metric("Поточне значення в базі:", value=0.0 if pd.isna(current_num) else float(current_num))
+            new_val_local = st.number_input("Нове значення:", min_value=0.0, step=0.1, key=f"input_{spec['id']}")
+            has_value = new_val_local > 0
+        else:
+            st.metric("Поточне значення в базі:", value=str(current_val) if pd.notna(current_val) else "—")
+            new_val_local = st.selectbox("Нове значення:", [None, *spec["choices"]],
+                                         format_func=lambda v: v or "—", key=f"input_{spec['id']}")
+            has_value = new_val_local is not None
 
     with col_action:
         st.write("")
-        
-        # === ПІДГОТОВКА ДАНИХ ДЛЯ URL (ВИПРАВЛЕННЯ ПОМИЛОК) ===
-        
-        # 1. ВИПРАВЛЕННЯ ДАТИ: Google вимагає YYYY-MM-DD
-        raw_dob = record.get('Дата народження')
-        try:
-            # Якщо це вже Timestamp, конвертуємо в ISO
-            if isinstance(raw_dob, pd.Timestamp):
-                dob_for_google = raw_dob.strftime('%Y-%m-%d')
-            else:
-                # Якщо це рядок, пробуємо розпізнати і перевернути
-                dob_for_google = pd.to_datetime(str(raw_dob), dayfirst=True).strftime('%Y-%m-%d')
-        except:
-            dob_for_google = str(raw_dob) # Якщо не вийшло, віддаємо як є
-
-        # 2. ВИПРАВЛЕННЯ ХОЛЕСТЕРИНУ: Замінюємо крапку на кому
-        if new_val_local > 0:
-            chol_for_google = str(new_val_local).replace('.', ',')
-        else:
-            chol_for_google = ""
-
-        # Формуємо параметри
-        params = {
-            ENTRY_PIB: record['ПІБ'],
-            ENTRY_DOB: dob_for_google,
-            ENTRY_CHOL: chol_for_google
-        }
-        
-        query_string = urllib.parse.urlencode(params)
-        final_link = f"{FORM_BASE_URL}?{query_string}"
-        
-        st.info("Натисніть кнопку, щоб відкрити Форму. Потім натисніть 'Оновити'.")
-        
-        col_btn1, col_btn2 = st.columns(2)
-        with col_btn1:
-            st.link_button("📝 1. Відкрити Форму", final_link, type="primary")
-        with col_btn2:
-            if st.button("🔄 2. Оновити дані"):
-                st.cache_data.clear()
-                st.rerun()
 
-    if new_val_local > 0:
-        record[col_chol] = new_val_local
-        record['Verdict_Score2'] = recalculate_score2_local(record, new_val_local)
+        # Зберігаємо одразу в локальний журнал: змінюється лише рядок цього пацієнта
+        if st.button("💾 Зберегти", type="primary", disabled=not has_value):
+            data_manager.record_correction(record, spec["id"], new_val_local,
+                                           author=st.session_state.get('user_name') or "")
+            st.rerun()
+
+        # Google Форма (лише для холестерину) - необов'язкова копія для спільної таблиці виправлень
+        if spec["id"] == "chol":
+            # === ПІДГОТОВКА ДАНИХ ДЛЯ URL (ВИПРАВЛЕННЯ ПОМИЛОК) ===
+
+            # 1. ВИПРАВЛЕННЯ ДАТИ: Google вимагає YYYY-MM-DD
+            raw_dob = record.get('Дата народження')
+            try:
+                # Якщо це вже Timestamp, конвертуємо в ISO
+                if isinstance(raw_dob, pd.Timestamp):
+                    dob_for_google = raw_dob.strftime('%Y-%m-%d')
+                else:
+                    # Якщо це рядок, пробуємо розпізнати і перевернути
+                    dob_for_google = pd.to_datetime(str(raw_dob), dayfirst=True).strftime('%Y-%m-%d')
+            except:
+                dob_for_google = str(raw_dob) # Якщо не вийшло, віддаємо як є
+
+            # 2. ВИПРАВЛЕННЯ ХОЛЕСТЕРИНУ: Замінюємо крапку на кому
+            if has_value:
+                chol_for_google = str(new_val_local).replace('.', ',')
+            else:
+                chol_for_google = ""
+
+            # Формуємо параметри
+            params = {
+                ENTRY_PIB: record['ПІБ'],
+                ENTRY_DOB: dob_for_google,
+                ENTRY_CHOL: chol_for_google
+            }
+
+            query_string = urllib.parse.urlencode(params)
+            final_link = f"{FORM_BASE_URL}?{query_string}"
+
+            st.caption("Необов'язково: продублювати в Google Форму, а потім підтягнути таблицю виправлень.")
+            col_btn1, col_btn2 = st.columns(2)
+            with col_btn1:
+                st.link_button("📝 Відкрити Форму", final_link)
+            with col_btn2:
+                if st.button("🔄 Оновити виправлення"):
+                    # Перекачуємо лише таблицю виправлень і накладаємо її на готові дані
+                    data_manager.invalidate("corrections")
+                    with st.spinner("Оновлення виправлень..."):
+                        data_manager.refresh(wait=True)
+                    st.rerun()
+
+    # Попередній перегляд: SCORE2 одразу з новим значенням (FINDRISK - після збереження)
+    if has_value:
+        record[target_col] = new_val_local
+        if target_col in score2.INPUT_COLS: record['Verdict_Score2'] = score2.score2_verdict(record)
 
     st.divider()
 
@@ -212,44 +194,14 @@ def _draw_test_card(record, test_conf):
 
 def _render_pdf_section(record, patient_name):
     st.subheader("📄 Друк результатів")
-    final_print_dict = {}
-    for test in TESTS_CONFIG:
-        tag = test['tag']       
-        search_key = test['search_key'] 
-        verdict = record.get(f"Verdict_{tag}")
-        score = record.get(f"Score_{tag}")
-        if pd.isna(verdict) or verdict == "" or verdict == 0 or verdict == "0": continue
-        v_str = str(verdict)
-        clean_verdict = v_str.replace("🔴", "").replace("🟠", "").replace("🟡", "").replace("🟢", "").replace("✅", "").strip()
-        if not clean_verdict:
-            if "🔴" in v_str: clean_verdict = "Високий ризик / Патологія"
-            elif "🟠" in v_str: clean_verdict = "Середній / Високий ризик"
-            elif "🟡" in v_str: clean_verdict = "Помірний ризик / Увага"
-            elif "🟢" in v_str or "✅" in v_str: clean_verdict = "Низький ризик / Норма"
-            else: clean_verdict = v_str
-        result_header = f"ВИСНОВОК: {clean_verdict}"
-        if test['has_score']:
-            try:
-                score_val = int(score) if pd.notna(score) else 0
-                result_header += f" ({score_val} балів)"
-            except: pass
-        final_print_dict[f"=== {test['name']} ==="] = result_header
-        test_questions = {}
-        for col_name, val in record.items():
-            if search_key in col_name and not any(x in col_name for x in ['Verdict_', 'Score_', 'Status_', 'Timestamp']):
-                if pd.notna(val) and str(val) != "" and str(val) != "0":
-                    test_questions[col_name] = str(val)
-        final_print_dict.update(test_questions)
-        final_print_dict[f"   "] = "   "
+    # Той самий вміст -> той самий PDF з кешу (без повторної генерації на кожен rerun)
+    final_print_dict = report.build_print_dict(record)
 
     try:
-        summary_text = "Деталізований звіт з результатами тестів та відповідями пацієнта."
         # Генеруємо байт-код PDF
-        pdf_bytes = pdf_gen.create_report(
+        pdf_bytes = report.get_report_pdf(
             patient_name=patient_name,
             date_str=str(pd.Timestamp.now().strftime('%d.%m.%Y')),
-            verdict=summary_text, 
-            score="", 
             data_dict=final_print_dict
         )
         
@@ -272,3 +224,115 @@ def _render_pdf_section(record, patient_name):
 
     except Exception as e:
         st.error(f"⚠️ Помилка генерації PDF: {e}")
+
+
+def show_batch_export(df):
+    """Пакетний друк: ZIP зі звітами для групи пацієнтів (лише для адміністративних ролей)."""
+    with st.expander("🗂 Пакетний друк звітів"):
+        filters = batch_export.EXPORT_FILTERS
+        choice = st.selectbox("Кого друкуємо:", filters, format_func=lambda f: f["label"])
+        count = len(batch_export.select_patients(df, choice["id"]))
+        st.caption(f"Пацієнтів у вибірці: {count}")
+
+        if st.button("📦 Сформувати архів", disabled=count == 0):
+            # Архів пишемо у тимчасовий файл, а не в пам'ять
+            old_path = st.session_state.pop('batch_zip', None)
+            if old_path and os.path.exists(old_path): os.remove(old_path)
+            with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as tmp:
+                zip_path = tmp.name
+            bar = st.progress(0.0, text="Генеруємо звіти...")
+            result = batch_export.export_reports(
+                df, zip_path, choice["id"],
+                progress=lambda done, total: bar.progress(done / total, text=f"Звітів: {done} з {total}"))
+            st.session_state['batch_zip'] = zip_path
+            st.session_state['batch_zip_label'] = choice["label"]
+            if result["errors"]:
+                st.warning(f"Не вдалося сформувати {len(result['errors'])} звітів (див. errors.txt в архіві)")
+
+        zip_path = st.session_state.get('batch_zip')
+        if zip_path and os.path.exists(zip_path):
+            with open(zip_path, "rb") as fh:
+                st.download_button(
+                    label=f"📥 Завантажити архів ({st.session_state.get('batch_zip_label', '')})",
+                    data=fh,
+                    file_name=f"Reports_{pd.Timestamp.now().strftime('%Y-%m-%d')}.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
+
+def show_link_proposals(df):
+    """Можливі збіги: той самий пацієнт у формах лікаря і пацієнта з різним написанням ПІБ."""
+    proposals = linkage.proposals_for(df)
+    if proposals.empty: return
+    with st.expander(f"🔗 Можливі збіги пацієнтів ({len(proposals)})"):
+        st.caption("Дата народження однакова, а ПІБ у двох формах написане трохи по-різному. "
+                   "Підтвердіть, якщо це одна людина - анкети буде об'єднано.")
+        for row in proposals.head(LINK_PROPOSALS_LIMIT).itertuples(index=False):
+            col_text, col_yes, col_no = st.columns([6, 1, 1])
+            col_text.write(f"**{row.doctor_name}** (лікар) ↔ **{row.patient_name}** (пацієнт), "
+                           f"{row.dob:%d.%m.%Y} - схожість {row.score:.0%}")
+            pair = f"{row.doctor_key}_{row.patient_key}"
+            if col_yes.button("✅", key=f"link_yes_{pair}", help="Одна людина"):
+                linkage.confirm(row.doctor_key, row.patient_key)
+                data_manager.links_changed()
+                with st.spinner("Об'єднуємо анкети..."):
+                    data_manager.refresh(wait=True)
+                st.rerun()
+            if col_no.button("❌", key=f"link_no_{pair}", help="Різні люди"):
+                linkage.reject(row.doctor_key, row.patient_key)
+                st.rerun()
+
+
+def show_schema_warnings():
+    """Бокова панель адміністратора: колонки форм, які не знайшлись або знайшлись кілька разів."""
+    # Лише остання версія заголовків кожного джерела - старі вже не актуальні
+    latest = {item["kind"]: item for item in schema.schema_report()}
+    for item in latest.values():
+        if not (item["unresolved"] or item["ambiguous"]): continue
+        lines = [f"**Схема '{item['kind']}'** ({item['fingerprint']})"]
+        if item["unresolved"]: lines.append(f"Не знайдено: {', '.join(item['unresolved'])}")
+        for field, found in item["ambiguous"].items():
+            lines.append(f"Неоднозначно '{field}': {', '.join(map(str, found))} (береться перша)")
+        st.warning("  \n".join(lines))
+
+def show_timings():
+    """Бокова панель адміністратора: скільки тривав кожен етап останніх оновлень даних."""
+    with st.expander("⏱ Швидкодія оновлень"):
+        last = timings.last_run()
+        if last is None:
+            st.caption("Ще не було жодного оновлення в цьому процесі.")
+        else:
+            st.caption(f"Останнє: {last['started_at'].strftime('%H:%M:%S')}, {last['label']} - {last['seconds']:.2f} с")
+            if last["error"]: st.error(last["error"])
+            st.dataframe(pd.DataFrame([{
+                "Етап": timings.STAGES.get(span["stage"], span["stage"]),
+                "Джерело": span["source"],
+                "с": round(span["seconds"], 3),
+                "Рядків": span["rows"],
+                "Колонок": span["cols"],
+                "": span["note"],
+            } for span in last["spans"]]), hide_index=True, use_container_width=True)
+
+            # Динаміка по етапах - видно, який саме почав гальмувати
+            runs = timings.history()
+            trend = pd.DataFrame([{timings.STAGES.get(name, name): seconds
+                                   for name, seconds in timings.stage_totals(run).items()} for run in runs])
+            if len(trend) > 1: st.line_chart(trend.fillna(0))
+            if st.button("Очистити історію замірів"):
+                timings.clear()
+                st.rerun()
+
+        memory = data_manager.memory_report()
+        if memory: st.caption(f"Когорта в пам'яті: {compact.format_report(memory)}")
+        cache = report.report_cache_info()
+        st.caption(f"Кеш PDF: {cache['size']} звітів ({cache['bytes'] / 2**20:.1f} МБ), "
+                   f"влучань {cache['hits']}, промахів {cache['misses']}")
+        if cache['size'] and st.button("Очистити кеш PDF"):
+            report.clear_report_cache()
+            st.rerun()
+
+        profiling = st.toggle("Профілювання (cProfile)", value=timings.profiling_enabled(),
+                              help="Повільніше, тож вмикайте лише на час розслідування")
+        if profiling != timings.profiling_enabled(): timings.set_profiling(profiling)
+        if last is not None and last["profile"]:
+            st.code(last["profile"], language=None)
@@ -1,7 +1,74 @@
 from fpdf import FPDF
 import os
+import threading
+
+# ==========================================
+# ШРИФТ (ГОТУЄТЬСЯ ОДИН РАЗ НА ПРОЦЕС)
+# ==========================================
+FONT_FAMILY = 'CustomFont'
+FONT_FILES = ['Arial.ttf', 'DejaVuSans.ttf'] # Arial або запасний варіант
+# Спершу шукаємо в поточній папці (як раніше), потім у корені проєкту - для запуску з CLI з іншої папки
+FONT_DIRS = ['', os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+
+# Розібрані метрики гліфів (~1 МБ TTF) тримаємо в пам'яті і лише копіюємо в кожен новий PDF
+_FONT_TEMPLATE = {}
+_FONT_LOCK = threading.Lock()
+
+
+def _font_template():
+    """(ключ шрифту, метрики, опис файлу, шлях) або None, якщо файлу шрифту немає."""
+    with _FONT_LOCK:
+        if "font" not in _FONT_TEMPLATE:
+            candidates = (os.path.join(d, f) for f in FONT_FILES for d in FONT_DIRS)
+            font_path = next((p for p in candidates if os.path.exists(p)), None)
+            if font_path is None: return None  # не кешуємо: шрифт могли докласти пізніше
+            probe = FPDF()
+            probe.add_font(FONT_FAMILY, '', font_path, uni=True)
+            key = FONT_FAMILY.lower()
+            _FONT_TEMPLATE["font"] = (key, probe.fonts[key], probe.font_files[key], font_path)
+        return _FONT_TEMPLATE["font"]
+
+
+class _GlyphSubset(list):
+    """
+    Символи, які потраплять у підмножину шрифту.
+    fpdf дописує сюди кожен надрукований символ (з повторами), а при збереженні
+    шукає в цьому списку лінійно для кожного коду шрифту. Тримаємо лише унікальні
+    коди і множину для швидкої перевірки - вміст PDF від цього не змінюється.
+    """
+    def __init__(self, codes=()):
+        list.__init__(self)
+        self._seen = set()
+        for code in codes: self.append(code)
+
+    def append(self, code):
+        if code not in self._seen:
+            self._seen.add(code)
+            list.append(self, code)
+
+    def __contains__(self, code):
+        return code in self._seen
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self._seen = set(self)
+
 
 class PDF(FPDF):
+    def use_font_template(self, template):
+        """Реєструє готовий шрифт без повторного читання TTF з диска."""
+        key, font, font_file, font_path = template
+        # subset - список використаних символів, свій для кожного документа
+        self.fonts[key] = dict(font, i=len(self.fonts) + 1, subset=_GlyphSubset(font['subset']))
+        self.font_files[key] = dict(font_file)
+        self.font_files[font_path] = {'type': 'TTF'}
+
+    def set_font(self, family, style='', size=0):
+        # Жирний і курсив - той самий файл Arial.ttf, тож вбудовуємо в PDF один
+        # підмножинний шрифт замість трьох однакових копій
+        if family == FONT_FAMILY: style = style.upper().replace('B', '').replace('I', '')
+        FPDF.set_font(self, family, style, size)
+
     def header(self):
         # Простий заголовок на кожній сторінці
         try:
@@ -25,22 +92,17 @@ def create_report(patient_name, date_str, verdict, score, data_dict):
     """
     Генерує стильний PDF з підтримкою кирилиці.
     """
+    # === 1. НАЛАШТУВАННЯ ШРИФТУ ===
+    font_template = _font_template()
+    if font_template is None:
+        return b"ERROR: Font file (Arial.ttf) not found."
+
     pdf = PDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
 
-    # === 1. НАЛАШТУВАННЯ ШРИФТУ ===
-    font_path = 'Arial.ttf' 
-    if not os.path.exists(font_path):
-        font_path = 'DejaVuSans.ttf' # Запасний варіант
-
-    if not os.path.exists(font_path):
-        return b"ERROR: Font file (Arial.ttf) not found."
-
-    # Реєструємо шрифти
-    pdf.add_font('CustomFont', '', font_path, uni=True)
-    pdf.add_font('CustomFont', 'B', font_path, uni=True)
-    pdf.add_font('CustomFont', 'I', font_path, uni=True)
+    # Реєструємо шрифт (у PDF вбудовуються лише гліфи, що реально використані)
+    pdf.use_font_template(font_template)
     
     # === 2. ШАПКА ЗВІТУ (БЛОК ПАЦІЄНТА) ===
     # Малюємо сіру плашку
@@ -0,0 +1,130 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# РЕЄСТР СКРИНІНГОВИХ ТЕСТІВ
+# ==========================================
+# Кожен тест описаний декларативно: які колонки йому належать, скільки балів
+# дає кожна відповідь і які межі балів відповідають якому вердикту.
+# Щоб додати новий тест - достатньо додати запис у QUESTIONNAIRES.
+
+# Словники балів (Ваші словники без змін)
+POINTS_MAP_GAD = {"Ніколи": 0, "Кілька днів": 1, "Понад половину часу": 2, "Майже щодня": 3}
+POINTS_MAP_PHQ = {"Не турбували взагалі": 0, "Протягом декількох днів": 1, "Більше половини цього часу": 2, "Майже кожного дня": 3}
+POINTS_MAP_SMOKE = {"Через 1 год.": 0, "Від 1/2 до 1 години": 1, "Від 6 до 30 хв.": 2, "5 хв або менше": 3, "Ні": 1, "Так": 2, "Будь-якої іншої": 1, "Першої вранці": 3}
+POINTS_MAP_AUDIT = {"Ніколи": 0, "Один раз на місяць або рідше": 1, "2–4 рази на місяць": 2, "2–3 рази на тиждень": 3, "4 рази на тиждень або частіше": 4, "Щомісяця": 2, "Щотижня": 3, "Щодня або майже щодня": 4, "1–2 СП": 0, "3–4 СП": 1, "5–6 СП": 2, "7–9 СП": 3, "10 СП і більше": 4, "Ні": 0, "Так, більше ніж 12 місяців тому": 2, "Так, упродовж останніх 12 місяців": 4}
+FINDRISC_MAPPING = {
+    '[Findrisc] Чи маєте ви щодня принаймні 30 хв фізичної активності на роботі та/ або у вільний час (включно зі звичайною щоденною активністю)': {"Так": 0, "Ні": 1},
+    '[Findrisc] Як часто ви їсте овочі, фрукти або ягоди?': {'Кожного дня': 0, 'Не кожного дня': 1},
+    '[Findrisc] Чи приймали ви коли-небудь регулярно ліки від підвищеного тиску?': {'Ні': 0, 'Так': 2},
+    '[Findrisc] Чи виявляли у вас коли-небудь підвищений рівень глюкози в крові (наприклад, під час медичного огляду, хвороби або вагітності)?': {"Так": 5, "Ні": 0},
+    '[Findrisc] Чи був у когось із ваших близьких родичів або інших родичів діагностований цукровий діабет 1 або 2 типу?': {"Так: у батьків, братів, сестер або дітей": 5, "Так: тільки у дідуся/бабусі, тітки, дядька або двоюрідного брата/сестри": 3, 'Ні': 0},
+}
+
+# tag       - суфікс колонок Score_<tag> / Verdict_<tag>
+# form      - з якої форми беремо відповіді (id з FORMS_CONFIG)
+# match     - усі колонки, що містять цей рядок, рахуються за словником points
+# questions - або: окремий словник балів для кожного питання
+# base      - вердикт, якщо бал нижчий за всі межі
+# bands     - (мінімальний бал, вердикт), за зростанням
+QUESTIONNAIRES = [
+    {"tag": "PHQ", "form": "patient_form", "match": "[PHQ]", "points": POINTS_MAP_PHQ,
+     "base": "⚪ Депресія відсутня",
+     "bands": [(5, "🟢 Легка («субклінічна») депресія"), (10, "🟡 Помірної тяжкості депресія"),
+               (15, "🟠 Середньої тяжкості депресія"), (20, "🔴 Тяжка депресія")]},
+    {"tag": "GAD", "form": "patient_form", "match": "[GAD]", "points": POINTS_MAP_GAD,
+     "base": "🟢 Без симптомів",
+     "bands": [(5, "🟡 Легкі симптоми"), (10, "🟠 Помірні симптоми"), (15, "🔴 Клінічно значимі симптоми")]},
+    {"tag": "Smoke", "form": "patient_form", "match": "[Паління]", "points": POINTS_MAP_SMOKE,
+     "base": "🟢 Без нікотинової залежності",
+     "bands": [(1, "🟡 Низький рівень нікотинової залежності"), (6, "🟠 Високий рівень нікотинової залежності"),
+               (8, "🔴 Дуже високий рівень нікотинової залежності")]},
+    {"tag": "Audit", "form": "patient_form", "match": "[ AUDIT]", "points": POINTS_MAP_AUDIT,
+     "base": "🟢 Ймовірно пацієнт утримується від споживання",
+     "bands": [(1, "🟡 Споживання з низьким ризиком"), (8, "🟠 Споживання з високим ризиком"),
+               (20, "🔴 Можлива алкогольна залежність")]},
+    # Бали за вік, ІМТ і талію додає process_doctor_data (extra_points)
+    {"tag": "FINDRISK", "form": "doctor_form", "questions": FINDRISC_MAPPING,
+     "base": "✅ Низький ризик: 1 із 100 (1%)",
+     "bands": [(7, "🟢 Дещо підвищений ризик: 1 із 25 (4%)"), (12, "🟡 Помірний ризик: 1 із 6 (16%)"),
+               (15, "🟠 Високий ризик: 1 із 3 (33%)"), (21, "🔴 Дуже високий ризик: 1 із 2 (50%)")]},  # > 20
+]
+
+_BY_TAG = {spec["tag"]: spec for spec in QUESTIONNAIRES}
+
+# ==========================================
+# КОМПІЛЯЦІЯ В ЯДРА
+# ==========================================
+
+def resolve_columns(spec, columns):
+    """
+    Колонки тесту і словник балів для кожної з них.
+    Викликається один раз на версію заголовків (кеш - у modules/schema.py).
+    """
+    if "match" in spec:
+        cols = [c for c in columns if spec["match"] in c]
+        return tuple(cols), tuple(spec["points"] for _ in cols)
+    cols, maps = [], []
+    for question, mapping in spec["questions"].items():
+        actual_col = next((c for c in columns if question.strip() in c), None)
+        if actual_col:
+            cols.append(actual_col)
+            maps.append(mapping)
+    return tuple(cols), tuple(maps)
+
+
+@lru_cache(maxsize=64)
+def _band_table(tag):
+    spec = _BY_TAG[tag]
+    thresholds = np.array([low for low, _ in spec["bands"]], dtype=float)
+    labels = [spec["base"]] + [label for _, label in spec["bands"]]
+    return thresholds, labels
+
+
+def section_points(df, tag, resolved=None):
+    """
+    Сума балів тесту для кожного рядка. resolved - готовий результат resolve_columns.
+    Відповіді всіх колонок кодуються в цілі числа одним factorize, а бали
+    беруться однією векторною вибіркою з таблиці [колонка, код відповіді].
+    """
+    cols, maps = resolved or resolve_columns(_BY_TAG[tag], df.columns)
+    if not cols or df.empty: return np.zeros(len(df), dtype=np.int64)
+    stacked = pd.concat([df[c] for c in cols], ignore_index=True)
+    codes, uniques = pd.factorize(stacked)
+    # Остання колонка таблиці - для порожніх значень (код -1)
+    lut = np.zeros((len(cols), len(uniques) + 1), dtype=np.int64)
+    for i, mapping in enumerate(maps):
+        lut[i, :-1] = [mapping.get(u, 0) for u in uniques]
+    col_idx = np.repeat(np.arange(len(cols)), len(df))
+    return lut[col_idx, codes].reshape(len(cols), len(df)).sum(axis=0)
+
+
+def verdicts(tag, scores):
+    """Бали -> вердикти (pd.Categorical) через пошук меж (searchsorted)."""
+    thresholds, labels = _band_table(tag)
+    scores = np.nan_to_num(np.asarray(scores, dtype=float), nan=0.0)
+    codes = np.searchsorted(thresholds, scores, side='right')
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
+def verdict(tag, score):
+    """Вердикт для одного значення балів."""
+    return verdicts(tag, [score])[0]
+
+
+def score_form(df, form_id, extra_points=None, sections=None):
+    """
+    Рахує Score_<tag> і Verdict_<tag> для всіх тестів форми.
+    extra_points: tag -> додаткові бали; sections: tag -> колонки зі схеми (schema.resolve).
+    """
+    extra_points = extra_points or {}
+    sections = sections or {}
+    for spec in QUESTIONNAIRES:
+        if spec["form"] != form_id: continue
+        tag = spec["tag"]
+        scores = section_points(df, tag, sections.get(tag))
+        if tag in extra_points: scores = scores + np.asarray(extra_points[tag])
+        df[f"Score_{tag}"] = scores
+        df[f"Verdict_{tag}"] = verdicts(tag, scores)
+    return df
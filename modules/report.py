@@ -0,0 +1,133 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import pandas as pd
+from modules import pdf_gen
+
+# ==========================================
+# ЗВІТ ДЛЯ ДРУКУ (БЕЗ STREAMLIT)
+# ==========================================
+# Що саме потрапляє в PDF для одного пацієнта і кеш готових PDF.
+# Streamlit перезапускає сторінку на кожну дію лікаря, а запис пацієнта
+# між цими перезапусками зазвичай не змінюється - тож однаковий PDF
+# не генеруємо вдруге, а беремо з кешу за хешем вмісту.
+
+TESTS_CONFIG = [
+    {"tag": "Score2",   "name": "SCORE-2 (Серцевий ризик)", "search_key": "SCORE2", "has_score": False},
+    {"tag": "FINDRISK", "name": "FINDRISK (Діабет)",       "search_key": "Findrisc", "has_score": True},
+    {"tag": "PHQ",      "name": "PHQ-9 (Депресія)",        "search_key": "PHQ",      "has_score": True},
+    {"tag": "GAD",      "name": "GAD-7 (Тривожність)",     "search_key": "GAD",      "has_score": True},
+    {"tag": "Audit",    "name": "AUDIT (Алкоголь)",        "search_key": "AUDIT",    "has_score": True},
+    {"tag": "Smoke",    "name": "Нікотинова залежність",   "search_key": "Паління",  "has_score": True}
+]
+
+SUMMARY_TEXT = "Деталізований звіт з результатами тестів та відповідями пацієнта."
+
+REPORT_CACHE_SIZE = 64  # скільки готових PDF тримати в пам'яті (~40-100 КБ кожен)
+
+# Службові колонки, які не є питаннями тесту, навіть якщо містять search_key
+_NOT_QUESTIONS = ['Verdict_', 'Score_', 'Status_', 'Timestamp']
+
+# заголовки таблиці -> {tag: ((позиція, колонка), ...)}
+_QUESTION_MAPS = {}
+
+# хеш вмісту -> bytes PDF (від найстарішого до найсвіжішого)
+_PDF_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def question_columns(columns):
+    """
+    Колонки питань кожного тесту: tag -> ((позиція, назва), ...).
+    Тут же визначається порядок питань у звіті - як у формі.
+    Рахується один раз на версію заголовків, а не на кожен rerun.
+    """
+    key = tuple(columns)
+    mapping = _QUESTION_MAPS.get(key)
+    if mapping is None:
+        mapping = {test['tag']: tuple((pos, col) for pos, col in enumerate(key)
+                                      if test['search_key'] in col and not any(x in col for x in _NOT_QUESTIONS))
+                   for test in TESTS_CONFIG}
+        with _CACHE_LOCK:
+            _QUESTION_MAPS[key] = mapping
+    return mapping
+
+
+def build_print_dict(record):
+    """Висновки, бали і відповіді пацієнта по кожному тесту - у порядку друку."""
+    final_print_dict = {}
+    questions = question_columns(record.index)
+    values = record.to_numpy()
+    for test in TESTS_CONFIG:
+        tag = test['tag']
+        verdict = record.get(f"Verdict_{tag}")
+        score = record.get(f"Score_{tag}")
+        if pd.isna(verdict) or verdict == "" or verdict == 0 or verdict == "0": continue
+        v_str = str(verdict)
+        clean_verdict = v_str.replace("🔴", "").replace("🟠", "").replace("🟡", "").replace("🟢", "").replace("✅", "").strip()
+        if not clean_verdict:
+            if "🔴" in v_str: clean_verdict = "Високий ризик / Патологія"
+            elif "🟠" in v_str: clean_verdict = "Середній / Високий ризик"
+            elif "🟡" in v_str: clean_verdict = "Помірний ризик / Увага"
+            elif "🟢" in v_str or "✅" in v_str: clean_verdict = "Низький ризик / Норма"
+            else: clean_verdict = v_str
+        result_header = f"ВИСНОВОК: {clean_verdict}"
+        if test['has_score']:
+            try:
+                score_val = int(score) if pd.notna(score) else 0
+                result_header += f" ({score_val} балів)"
+            except: pass
+        final_print_dict[f"=== {test['name']} ==="] = result_header
+        test_questions = {}
+        # Лише клітинки цього тесту, без перебору всіх колонок запису
+        for pos, col_name in questions[tag]:
+            val = values[pos]
+            if pd.notna(val) and str(val) != "" and str(val) != "0":
+                test_questions[col_name] = str(val)
+        final_print_dict.update(test_questions)
+        final_print_dict[f"   "] = "   "
+    return final_print_dict
+
+
+def report_key(patient_name, date_str, summary, data_dict):
+    """Хеш усього, що друкується: ім'я, дата, резюме і пари питання-відповідь по порядку."""
+    payload = json.dumps([patient_name, date_str, summary, list(data_dict.items())],
+                         ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_report_pdf(patient_name, date_str, data_dict, summary=SUMMARY_TEXT):
+    """PDF-звіт (bytes). Однаковий вміст генерується лише один раз (LRU на REPORT_CACHE_SIZE)."""
+    key = report_key(patient_name, date_str, summary, data_dict)
+    with _CACHE_LOCK:
+        pdf_bytes = _PDF_CACHE.get(key)
+        if pdf_bytes is not None:
+            _PDF_CACHE.move_to_end(key)
+            _CACHE_STATS["hits"] += 1
+            return pdf_bytes
+        _CACHE_STATS["misses"] += 1
+
+    pdf_bytes = pdf_gen.create_report(patient_name=patient_name, date_str=date_str,
+                                      verdict=summary, score="", data_dict=data_dict)
+    if pdf_bytes.startswith(b"ERROR"): return pdf_bytes  # помилку (немає шрифту) не кешуємо
+
+    with _CACHE_LOCK:
+        _PDF_CACHE[key] = pdf_bytes
+        _PDF_CACHE.move_to_end(key)
+        while len(_PDF_CACHE) > REPORT_CACHE_SIZE:
+            _PDF_CACHE.popitem(last=False)
+    return pdf_bytes
+
+
+def clear_report_cache():
+    """Звільняє пам'ять кешу PDF (кнопка в панелі швидкодії); лічильники лишаються."""
+    with _CACHE_LOCK:
+        _PDF_CACHE.clear()
+
+
+def report_cache_info():
+    """Розмір кешу PDF і кількість влучань/промахів (для діагностики)."""
+    with _CACHE_LOCK:
+        return dict(_CACHE_STATS, size=len(_PDF_CACHE), bytes=sum(len(b) for b in _PDF_CACHE.values()))
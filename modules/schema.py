@@ -0,0 +1,102 @@
+import hashlib
+import threading
+from modules import questionnaires
+
+# ==========================================
+# РОЗПІЗНАВАННЯ КОЛОНОК (SCHEMA RESOLVER)
+# ==========================================
+# Заголовки Google Forms змінюються рідко, тому "гнучкий пошук" колонок
+# (next(c for c in df.columns if ... in c)) робимо один раз на версію
+# заголовків і кешуємо результат за відбитком (fingerprint) рядка заголовків.
+
+# Логічні поля кожного джерела.
+# all   - колонка містить усі ці підрядки
+# any   - колонка містить хоча б один з підрядків
+# exact - точна назва колонки
+# lower - порівнювати в нижньому регістрі
+# optional - відсутність колонки не є проблемою (не потрапляє в unresolved)
+FIELDS = {
+    "doctor_form": {
+        "sbp":   {"all": ["Систолічний", "SCORE2"]},
+        "chol":  {"all": ["non-HDL", "SCORE2"]},
+        "bmi":   {"all": ["ІМТ (кг/м2)"]},
+        "waist": {"all": ["Окружність талії"]},
+        "sex":   {"exact": "Вкажіть стать"},
+    },
+    "patient_form": {
+        "smoke_qty": {"all": ["[Паління] 4."]},
+    },
+    "corrections": {
+        "pib":  {"any": ["піб", "name"], "lower": True},
+        "dob":  {"any": ["дат", "dob"], "lower": True},
+        "stamp": {"any": ["позначка часу", "timestamp"], "lower": True},
+        # Показники (id - як у corrections.FIELDS); у таблиці може бути будь-яка їх частина
+        "chol":  {"any": ["chol", "холест"], "lower": True, "optional": True},
+        "sbp":   {"any": ["систол", "sbp"], "lower": True, "optional": True},
+        "waist": {"any": ["тал", "waist"], "lower": True, "optional": True},
+        "bmi":   {"any": ["імт", "bmi"], "lower": True, "optional": True},
+        "sex":   {"any": ["стать", "sex"], "lower": True, "optional": True},
+    },
+}
+
+# (kind, columns) -> схема
+_SCHEMAS = {}
+_LOCK = threading.Lock()
+
+
+def fingerprint(columns):
+    """Короткий відбиток рядка заголовків."""
+    return hashlib.sha1("\x1f".join(map(str, columns)).encode("utf-8")).hexdigest()[:16]
+
+
+def _matches(rule, column):
+    name = str(column).lower() if rule.get("lower") else str(column)
+    if "exact" in rule: return name == rule["exact"]
+    if "all" in rule: return all(part in name for part in rule["all"])
+    return any(part in name for part in rule["any"])
+
+
+def _build(kind, columns):
+    fields, unresolved, ambiguous = {}, [], {}
+    for field, rule in FIELDS.get(kind, {}).items():
+        found = [c for c in columns if _matches(rule, c)]
+        # Як і раніше, беремо першу колонку, що підійшла
+        fields[field] = found[0] if found else None
+        if not found and not rule.get("optional"): unresolved.append(field)
+        elif len(found) > 1: ambiguous[field] = found
+
+    sections = {}
+    for spec in questionnaires.QUESTIONNAIRES:
+        if spec["form"] != kind: continue
+        sections[spec["tag"]] = questionnaires.resolve_columns(spec, columns)
+        if not sections[spec["tag"]][0]: unresolved.append(spec["tag"])
+
+    schema = {"kind": kind, "fingerprint": fingerprint(columns), "fields": fields,
+              "sections": sections, "unresolved": unresolved, "ambiguous": ambiguous}
+    if unresolved or ambiguous:
+        print(f"⚠️ Схема '{kind}' ({schema['fingerprint']}): не знайдено {unresolved}, неоднозначно {ambiguous}")
+    return schema
+
+
+def resolve(columns, kind):
+    """
+    Схема джерела kind для цих заголовків:
+      fields     - логічне поле -> реальна назва колонки (або None)
+      sections   - tag тесту -> (колонки, словники балів)
+      unresolved - поля/тести без жодної колонки
+      ambiguous  - поля, яким підійшло кілька колонок
+    """
+    key = (kind, tuple(columns))
+    schema = _SCHEMAS.get(key)
+    if schema is None:
+        schema = _build(kind, key[1])
+        with _LOCK:
+            _SCHEMAS[key] = schema
+    return schema
+
+
+def schema_report():
+    """Усі відомі версії схем з проблемними полями (для діагностики)."""
+    with _LOCK:
+        return [{"kind": s["kind"], "fingerprint": s["fingerprint"],
+                 "unresolved": s["unresolved"], "ambiguous": s["ambiguous"]} for s in _SCHEMAS.values()]
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# SCORE2: ТАБЛИЧНИЙ РУШІЙ РИЗИКУ
+# ==========================================
+# Одна таблиця порогів замість дерева if-ів. Рахується для всієї когорти
+# масивами numpy, а для одного пацієнта (дашборд) - тим самим кодом.
+
+SEX_COL = 'Вкажіть стать'
+SMOKE_COL = '[SCORE2] Куріння тютюнових виробів'
+AGE_COL = 'Вік'
+SBP_COL = '[SCORE2] Систолічний артеріальний тиск'
+CHOL_COL = '[SCORE2] Рівень non-HDL холестерину (ммоль/л)'
+# Від цих колонок залежить вердикт (решту таблиці SCORE2 не читає)
+INPUT_COLS = [SEX_COL, SMOKE_COL, AGE_COL, SBP_COL, CHOL_COL]
+
+VERDICT_NO_AGE = "⚪ Недостатньо даних (Вік)"
+VERDICT_NO_CHOL = "⚪ Введіть холестерин"
+VERDICT_LOW = "🟢 Низький ризик"
+VERDICT_MODERATE = "🟡 Помірний ризик"
+VERDICT_HIGH = "🔴 Високий ризик"
+
+INF = np.inf
+
+# Вікові інтервали: <50, 50-54, 55-59, 60-69, 70-89 (від 90 - завжди високий ризик)
+AGE_EDGES = [50, 55, 60, 70, 90]
+
+# "Жовта" зона: (стать, курець) -> пороги для кожного вікового інтервалу.
+# Поріг = (САТ, САТ_м'який, ХС при м'якому САТ, ХС). Пацієнт НЕ в жовтій зоні, якщо
+#   САТ >= САТ  або  ХС >= ХС  або  (САТ >= САТ_м'який і ХС >= ХС при м'якому САТ)
+ANY = (INF, INF, INF, INF)
+YELLOW_TABLE = {
+    ('жінка', False):   [ANY,                  (160, 140, 6, INF), (160, 140, 5, INF), (140, INF, INF, 6), (160, INF, INF, 7)],
+    ('жінка', True):    [(160, 140, 6, INF),   (160, 140, 5, INF), (140, 120, 5, INF), (140, 120, 5, INF), (140, INF, INF, 6)],
+    ('чоловік', False): [(160, 140, 6, INF),   (160, 140, 5, INF), (140, INF, INF, 6), (140, INF, INF, 6), (140, INF, INF, 6)],
+    ('чоловік', True):  [(160, 140, 5, INF),   (140, INF, INF, 6), (120, INF, INF, 4), (120, INF, INF, 4), (120, INF, INF, 5)],
+}
+# Поза таблицею жовтої зони не буває ніколи
+YELLOW_SBP_MAX = 180
+YELLOW_CHOL_MAX = 8
+
+# "Зелена" зона: тільки жінки, що не курять. (вік від, вік до (не включно), САТ <, ХС <=)
+GREEN_RULES = [(-INF, 45, 120, 5), (50, 55, 120, 3)]
+
+VERDICTS = [VERDICT_NO_AGE, VERDICT_NO_CHOL, VERDICT_LOW, VERDICT_MODERATE, VERDICT_HIGH]
+
+# Компіляція таблиці в масиви: група = стать * 2 + курець, рядок = віковий інтервал
+_SEXES = ['жінка', 'чоловік']
+_OTHER_GROUP = len(_SEXES) * 2  # стать не вказана -> жовтої зони немає
+_THRESHOLDS = np.full((_OTHER_GROUP + 1, len(AGE_EDGES) + 1, 4), INF)
+_ALLOWED = np.zeros((_OTHER_GROUP + 1, len(AGE_EDGES) + 1), dtype=bool)
+for (_sex, _smoker), _bands in YELLOW_TABLE.items():
+    _g = _SEXES.index(_sex) * 2 + int(_smoker)
+    _THRESHOLDS[_g, :len(AGE_EDGES)] = _bands
+    _ALLOWED[_g, :len(AGE_EDGES)] = True
+
+
+def _codes(values, labels):
+    """Номер значення в labels (-1 - будь-що інше). Рядки порівнюються лише для унікальних значень."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object) if isinstance(values, list) else values)
+    lut = np.array([labels.index(u) if u in labels else -1 for u in uniques] + [-1])
+    return lut[codes]
+
+
+def evaluate(sex, smoke, age, sbp, chol):
+    """
+    Ядро: колонки однакової довжини -> pd.Categorical з вердиктами.
+    smoke - значення з форми ('Ні' = не курить, усе інше = курить).
+    """
+    sex_code = _codes(sex, _SEXES)
+    smoker = _codes(smoke, ['Ні']) != 0
+    age = np.trunc(np.nan_to_num(np.asarray(age, dtype=float), nan=0.0))
+    sbp = np.asarray(sbp, dtype=float)
+    chol = np.asarray(chol, dtype=float)
+
+    group = np.where(sex_code >= 0, sex_code * 2 + smoker, _OTHER_GROUP)
+    band = np.searchsorted(AGE_EDGES, age, side='right')
+
+    t = _THRESHOLDS[group, band]
+    sbp_hard, sbp_soft, chol_soft, chol_hard = t[:, 0], t[:, 1], t[:, 2], t[:, 3]
+    yellow = (_ALLOWED[group, band]
+              & ~((sbp >= YELLOW_SBP_MAX) | (chol >= YELLOW_CHOL_MAX))
+              & ~((sbp >= sbp_hard) | (chol >= chol_hard) | ((sbp >= sbp_soft) & (chol >= chol_soft))))
+
+    green = np.zeros(len(age), dtype=bool)
+    for age_from, age_to, sbp_max, chol_max in GREEN_RULES:
+        green |= (age >= age_from) & (age < age_to) & (sbp < sbp_max) & (chol <= chol_max)
+    green &= (sex_code == _SEXES.index('жінка')) & ~smoker
+
+    codes = np.select([age == 0, chol <= 0, green, yellow], [0, 1, 2, 3], default=4)
+    return pd.Categorical.from_codes(codes, categories=VERDICTS)
+
+
+def _numeric(values):
+    return pd.to_numeric(values, errors='coerce')
+
+
+def score2_verdicts(df, chol=None):
+    """Вердикт SCORE2 для кожного рядка таблиці (Series з тим самим індексом)."""
+    n = len(df)
+    col = lambda name, default: df[name] if name in df.columns else pd.Series([default] * n, index=df.index, dtype=object)
+    verdicts = evaluate(
+        col(SEX_COL, 'Не вказано'),
+        col(SMOKE_COL, 'Ні'),
+        _numeric(col(AGE_COL, 0)),
+        _numeric(col(SBP_COL, 0)),
+        _numeric(col(CHOL_COL, 0) if chol is None else chol),
+    )
+    return pd.Series(verdicts, index=df.index, name='Verdict_Score2')
+
+
+def score2_verdict(record, chol=None):
+    """Вердикт SCORE2 для одного пацієнта (рядок/словник). chol - нове значення холестерину."""
+    chol_value = record.get(CHOL_COL, 0) if chol is None else chol
+    return evaluate(
+        [record.get(SEX_COL, 'Не вказано')],
+        [record.get(SMOKE_COL, 'Ні')],
+        _numeric([record.get(AGE_COL, 0)]),
+        _numeric([record.get(SBP_COL, 0)]),
+        _numeric([chol_value]),
+    )[0]
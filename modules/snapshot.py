@@ -0,0 +1,154 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# ЗНІМОК ОБРОБЛЕНИХ ДАНИХ НА ДИСКУ
+# ==========================================
+# Кеш Streamlit живе лише в пам'яті процесу. Щоб після перезапуску/деплою
+# лікар одразу бачив пацієнтів, зберігаємо результат get_processed_data
+# (і оброблені таблиці кожного джерела) у колонковому форматі на диск.
+
+SNAPSHOT_DIR = os.environ.get("SCREENING_SNAPSHOT_DIR", ".snapshot")
+# Збільшуйте при зміні логіки обробки - старі знімки тоді ігноруються
+SNAPSHOT_VERSION = 6
+
+try:
+    import pyarrow  # noqa: F401 (потрібен pandas для Parquet)
+    FRAME_FORMAT = "parquet"
+except ImportError:
+    FRAME_FORMAT = "pickle"
+
+_META_FILE = "meta.json"
+# Числа зі змішаних колонок лежать у знімку окремо, в колонці з цим префіксом
+_NUMBERS = "__numbers__:"
+_LOCK = threading.Lock()
+
+
+def _path(name):
+    return os.path.join(SNAPSHOT_DIR, name)
+
+
+def storable(df):
+    """Parquet не вміє колонки зі змішаними типами (0 після fillna + текст) - робимо їх текстом."""
+    df = df.copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            # Категорії теж мають бути одного типу (0 після fillna серед текстових відповідей)
+            if pd.api.types.infer_dtype(df[col].cat.categories) not in ("string", "empty"):
+                values = df[col].astype(object)
+                df[col] = values.where(values.isna(), values.astype(str)).astype("category")
+        elif df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def _split_mixed(df):
+    """
+    Як storable, але без втрат: у змішаній колонці (текст + 0 після fillna) лишається
+    текст, а числа йдуть в окрему колонку _NUMBERS + назва. _join_mixed повертає
+    їх на місце, тож таблиця після знімка та сама, що й до нього (0, а не "0").
+    """
+    df = df.copy()
+    for col in list(df.columns):
+        s = df[col]
+        categorical = isinstance(s.dtype, pd.CategoricalDtype)
+        if not categorical and s.dtype != object: continue
+        if pd.api.types.infer_dtype(s.cat.categories if categorical else s, skipna=True) in ("string", "empty"): continue
+        values = s.astype(object)
+        if categorical:
+            # Перевіряємо лише категорії, а не кожен рядок
+            is_text = np.array([isinstance(v, str) for v in s.cat.categories], dtype=bool)
+            codes = s.cat.codes.to_numpy()
+            text = np.where(codes >= 0, is_text[codes], False)
+        else:
+            text = np.array([isinstance(v, str) for v in values], dtype=bool)
+        other = ~text & values.notna().to_numpy()
+        numbers = pd.to_numeric(values.where(other), errors="coerce")
+        # Не число і не текст (рідкість) - як і раніше, текстом
+        odd = other & numbers.isna().to_numpy()
+        kept = values.where(text | odd)
+        kept[odd] = kept[odd].astype(str)
+        df[col] = kept.astype("category") if categorical else kept
+        df[_NUMBERS + str(col)] = numbers.astype(float)
+    return df
+
+
+def _join_mixed(df):
+    """Зворотне до _split_mixed: числа з колонок _NUMBERS повертаються у свої колонки."""
+    for name in [c for c in df.columns if str(c).startswith(_NUMBERS)]:
+        col = name[len(_NUMBERS):]
+        numbers = df.pop(name)
+        present = numbers.notna().to_numpy()
+        categorical = isinstance(df[col].dtype, pd.CategoricalDtype)
+        values = df[col].to_numpy(dtype=object, na_value=np.nan)
+        # fillna(0) дає цілі - повертаємо цілими
+        values[present] = [int(v) if float(v).is_integer() else v for v in numbers.to_numpy()[present]]
+        df[col] = pd.Series(values, index=df.index, dtype="category" if categorical else object)
+    return df
+
+
+def _write_frame(df, file_name):
+    tmp = _path(file_name + ".tmp")
+    if FRAME_FORMAT == "parquet": _split_mixed(df).to_parquet(tmp, index=False)
+    else: df.to_pickle(tmp)
+    os.replace(tmp, _path(file_name))
+
+
+def _read_frame(file_name):
+    if file_name.endswith(".parquet"): return _join_mixed(pd.read_parquet(_path(file_name)))
+    return pd.read_pickle(_path(file_name))
+
+
+def save(frames, meta, blobs=None):
+    """
+    Записує нове покоління знімка: таблиці (frames), сирі байти (blobs) і meta.
+    meta.json пишеться останнім, тож недописаний знімок ніколи не читається.
+    """
+    blobs = blobs or {}
+    generation = uuid.uuid4().hex[:8]
+    with _LOCK:
+        os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+        files = {}
+        for name, df in frames.items():
+            files[name] = f"{name}-{generation}.{FRAME_FORMAT}"
+            _write_frame(df, files[name])
+        blob_files = {}
+        for name, data in blobs.items():
+            blob_files[name] = f"{name}-{generation}.bin"
+            with open(_path(blob_files[name]), "wb") as fh: fh.write(data)
+
+        stamp = {"version": SNAPSHOT_VERSION, "saved_at": datetime.now().isoformat(timespec="seconds"),
+                 "files": files, "blobs": blob_files, "meta": meta}
+        tmp = _path(_META_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh: json.dump(stamp, fh, ensure_ascii=False, default=str)
+        os.replace(tmp, _path(_META_FILE))
+
+        # Прибираємо попередні покоління
+        keep = set(files.values()) | set(blob_files.values()) | {_META_FILE}
+        for file_name in os.listdir(SNAPSHOT_DIR):
+            if file_name not in keep:
+                try: os.remove(_path(file_name))
+                except OSError: pass
+
+
+def load():
+    """Повертає (frames, blobs, meta) або None, якщо знімка немає чи він іншої версії."""
+    try:
+        with _LOCK:
+            with open(_path(_META_FILE), encoding="utf-8") as fh: stamp = json.load(fh)
+            if stamp.get("version") != SNAPSHOT_VERSION: return None
+            frames = {name: _read_frame(f) for name, f in stamp["files"].items()}
+            blobs = {}
+            for name, f in stamp["blobs"].items():
+                with open(_path(f), "rb") as fh: blobs[name] = fh.read()
+        return frames, blobs, dict(stamp["meta"], saved_at=stamp["saved_at"])
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"⚠️ Не вдалося прочитати знімок даних: {e}")
+        return None
@@ -0,0 +1,147 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+# ==========================================
+# ЗАМІРИ ЕТАПІВ ОНОВЛЕННЯ
+# ==========================================
+# Кожне перебудування когорти - це "запуск" з набором відрізків (етап, джерело,
+# секунди, рядки, колонки). Останні запуски тримаємо в кільцевому буфері, щоб
+# адміністратор бачив у боковій панелі, який саме етап почав гальмувати.
+# Режим профілювання додатково збирає cProfile по всіх потоках запуску.
+
+RUN_HISTORY = 50  # скільки останніх запусків пам'ятати
+PROFILE_LINES = 30  # скільки функцій показувати у звіті профілювання
+
+# Етапи в порядку конвеєра -> підпис для панелі
+STAGES = {
+    "fetch": "Завантаження",
+    "parse": "Розбір CSV",
+    "dates": "Дати і ПІБ",
+    "dedup": "Дублікати",
+    "scoring": "Бали і вердикти",
+    "merge": "Злиття форм",
+    "corrections": "Виправлення",
+    "finalize": "SCORE2 і статуси",
+    "compact": "Стиснення типів",
+    "linkage": "Пошук збігів",
+    "snapshot": "Знімок",
+}
+
+_RUNS = deque(maxlen=RUN_HISTORY)
+_ACTIVE = None   # поточний запуск (перебудування йдуть по одному - під _PIPELINE_LOCK)
+_LOCK = threading.Lock()
+_PROFILING = os.environ.get("SCREENING_PROFILE", "") not in ("", "0")
+
+
+def set_profiling(enabled):
+    """Вмикає/вимикає cProfile для наступних запусків."""
+    global _PROFILING
+    _PROFILING = bool(enabled)
+
+
+def profiling_enabled():
+    return _PROFILING
+
+
+def measure(span, df):
+    """Записує у відрізок розмір таблиці (рядки і колонки). Повертає df без змін."""
+    if df is not None:
+        span["rows"], span["cols"] = df.shape
+    return df
+
+
+@contextmanager
+def stage(name, source=""):
+    """
+    Відрізок одного етапу: with stage("parse", "doctor_form") as span: ...
+    У span можна дописати rows/cols (measure) і note. Поза запуском - нічого не пишеться.
+    """
+    span = {"stage": name, "source": source, "rows": None, "cols": None, "note": ""}
+    started = time.perf_counter()
+    try:
+        yield span
+    finally:
+        span["seconds"] = time.perf_counter() - started
+        with _LOCK:
+            if _ACTIVE is not None: _ACTIVE["spans"].append(span)
+
+
+@contextmanager
+def run(label):
+    """Один запуск конвеєра. Після завершення потрапляє в історію (панель швидкодії, format_run)."""
+    global _ACTIVE
+    record = {"label": label, "started_at": datetime.now(), "spans": [], "profile": None,
+              "_stats": None, "error": None}
+    with _LOCK: _ACTIVE = record
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = str(e)
+        raise
+    finally:
+        record["seconds"] = time.perf_counter() - started
+        with _LOCK:
+            _ACTIVE = None
+            stats = record.pop("_stats")
+            _RUNS.append(record)
+        if stats is not None:
+            out = io.StringIO()
+            stats.stream = out
+            stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+            record["profile"] = out.getvalue()
+
+
+def profiled(func, *args):
+    """Викликає func(*args); у режимі профілювання - під cProfile цього потоку."""
+    if not _PROFILING: return func(*args)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args)
+    finally:
+        with _LOCK:
+            if _ACTIVE is not None:
+                if _ACTIVE["_stats"] is None: _ACTIVE["_stats"] = pstats.Stats(profiler)
+                else: _ACTIVE["_stats"].add(profiler)
+
+
+def stage_totals(record):
+    """Сумарний час кожного етапу запуску (по всіх джерелах), у порядку STAGES."""
+    totals = {}
+    for span in record["spans"]:
+        totals[span["stage"]] = totals.get(span["stage"], 0.0) + span["seconds"]
+    return {name: totals[name] for name in sorted(totals, key=lambda s: list(STAGES).index(s) if s in STAGES else len(STAGES))}
+
+
+def format_run(record):
+    """'1.10 с (Завантаження 0.21, Розбір CSV 0.35, ...)'."""
+    parts = ", ".join(f"{STAGES.get(name, name)} {seconds:.2f}" for name, seconds in stage_totals(record).items())
+    text = f"{record['seconds']:.2f} с"
+    if parts: text += f" ({parts})"
+    if record["error"]: text += f" ❌ {record['error']}"
+    return text
+
+
+def history():
+    """Останні запуски, від найстарішого до найсвіжішого."""
+    with _LOCK:
+        return list(_RUNS)
+
+
+def last_run():
+    """Найсвіжіший запуск або None."""
+    with _LOCK:
+        return _RUNS[-1] if _RUNS else None
+
+
+def clear():
+    """Забуває історію запусків (напр. щоб графік почався після виправлення)."""
+    with _LOCK:
+        _RUNS.clear()
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from modules import auth
+
+# ==========================================
+# ДОВІДНИК КОРИСТУВАЧІВ З ЛОКАЛЬНОГО ФАЙЛУ
+# ==========================================
+# Замість вкладки Users у Google Sheets - CSV з тими ж колонками (як в офлайн-запуску).
+
+HEADER = "Username,Password,Name,Role\n"
+
+
+@pytest.fixture
+def users_file(tmp_path, monkeypatch):
+    path = tmp_path / "users.csv"
+    monkeypatch.setattr(auth, "USERS_URL", str(path))
+    monkeypatch.setattr(auth, "_DIRECTORY", {"users": None, "loaded_at": float("-inf"), "loading": None})
+
+    def write(*rows):
+        path.write_text(HEADER + "".join(row + "\n" for row in rows), encoding="utf-8")
+    return write
+
+
+def _age_directory(seconds):
+    auth._DIRECTORY["loaded_at"] -= seconds
+
+
+def test_password_with_leading_zeros_stays_text(users_file):
+    users_file("ivan,0000,Іван Петренко,лікар")
+    assert auth.find_user("ivan", "0000") == ("Іван Петренко", "лікар")
+    assert auth.find_user("ivan", "0") is None
+
+
+def test_plain_passwords_are_not_kept(users_file):
+    users_file("ivan,0000,Іван Петренко,лікар")
+    auth.find_user("ivan", "0000")
+    salt, password_hash, name, role = auth._DIRECTORY["users"]["ivan"][0]
+    assert password_hash == auth._hash_password("0000", salt) and password_hash != b"0000"
+
+
+def test_duplicate_usernames_keep_every_password(users_file):
+    users_file("olha,first,Ольга Коваль,лікар", "olha,second,Ольга Коваль,admin")
+    assert auth.find_user("olha", "first") == ("Ольга Коваль", "лікар")
+    assert auth.find_user("olha", "second") == ("Ольга Коваль", "admin")
+    assert auth.find_user("olha", "third") is None
+
+
+def test_table_is_reread_only_after_ttl(users_file):
+    users_file("ivan,old,Іван Петренко,лікар")
+    assert auth.find_user("ivan", "old")
+    users_file("ivan,new,Іван Петренко,лікар")
+    # Ще в межах USERS_TTL - діє старий пароль
+    assert auth.find_user("ivan", "new") is None
+    assert auth.find_user("ivan", "old")
+    _age_directory(auth.USERS_TTL)
+    assert auth.find_user("ivan", "new")
+    assert auth.find_user("ivan", "old") is None
+
+
+def test_unknown_login_rereads_table_at_most_once_per_interval(users_file):
+    users_file("ivan,0000,Іван Петренко,лікар")
+    assert auth.find_user("ivan", "0000")
+    users_file("ivan,0000,Іван Петренко,лікар", "nova,1234,Нова Лікарка,лікар")
+    assert auth.find_user("nova", "1234") is None
+    _age_directory(auth.USERS_MISS_REFRESH)
+    assert auth.find_user("nova", "1234") == ("Нова Лікарка", "лікар")
+
+
+def test_refresh_users_rereads_immediately(users_file):
+    users_file("ivan,0000,Іван Петренко,лікар")
+    auth.find_user("ivan", "0000")
+    users_file("ivan,0000,Іван Петренко,лікар", "nova,1234,Нова Лікарка,лікар")
+    assert auth.refresh_users() == 2
+    assert auth.find_user("nova", "1234")
+
+
+def test_login_during_reload_uses_previous_table(users_file, monkeypatch):
+    users_file("ivan,0000,Іван Петренко,лікар")
+    assert auth.find_user("ivan", "0000")
+    started, release = threading.Event(), threading.Event()
+    load = auth._load_users
+
+    def slow_load():
+        started.set()
+        release.wait(5)
+        return load()
+    monkeypatch.setattr(auth, "_load_users", slow_load)
+    reload = threading.Thread(target=auth.refresh_users)
+    reload.start()
+    assert started.wait(5)
+    # Завантаження ще йде - вхід не чекає на нього
+    assert auth.find_user("ivan", "0000") == ("Іван Петренко", "лікар")
+    release.set()
+    reload.join(5)
+    assert auth._DIRECTORY["loading"] is None
@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic
+from modules import data_manager, report
+
+# ==========================================
+# КОМПАКТНА КОГОРТА: ЛИШЕ КОЛОНКИ, ЯКІ ХТОСЬ ЧИТАЄ
+# ==========================================
+
+EXTRA = ["Адреса електронної пошти", "Згода на обробку персональних даних"]
+
+
+@pytest.fixture(scope="module")
+def cohort(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("forms")
+    doctor, patient, corr = synthetic.generate(200)
+    # Службові питання Google Форми, яких застосунок не читає
+    for col in EXTRA: doctor[col] = "так"
+    paths = {}
+    for name, df in (("doctor", doctor), ("patient", patient), ("corrections", corr)):
+        paths[name] = str(folder / f"{name}.csv")
+        df.to_csv(paths[name], index=False)
+    return data_manager.process_sources(paths["doctor"], paths["patient"], paths["corrections"])
+
+
+def test_unread_columns_are_dropped(cohort):
+    compact, memory = data_manager.compact_cohort(cohort)
+    assert set(EXTRA) <= set(memory["dropped"])
+    assert not set(EXTRA) & set(compact.columns)
+    assert not [c for c in compact.columns if str(c).startswith("Позначка часу")]
+    assert memory["after"] < memory["before"]
+
+
+def test_columns_read_downstream_are_kept(cohort):
+    compact, _ = data_manager.compact_cohort(cohort)
+    keep = data_manager.cohort_columns(cohort.columns)
+    assert keep & set(cohort.columns) <= set(compact.columns)
+    # Звіт і перерахунок після виправлень бачать ті самі дані, що й до стиснення
+    for pos in range(0, len(cohort), 37):
+        assert report.build_print_dict(compact.iloc[pos]) == report.build_print_dict(cohort.iloc[pos])
+    rescored = data_manager.recompute_derived(compact.copy())
+    for spec in data_manager.derived_columns(compact.columns):
+        for col in spec["outputs"]:
+            assert rescored[col].astype(object).equals(compact[col].astype(object)), col
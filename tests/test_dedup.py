@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from modules import data_manager
+
+# ==========================================
+# НАЙСВІЖІША ВІДПОВІДЬ ПАЦІЄНТА (_keep_latest)
+# ==========================================
+
+KEY = data_manager.KEY
+
+
+def _forms(keys, stamps, answers=None):
+    return pd.DataFrame({KEY: np.asarray(keys, dtype=np.int64),
+                         "Позначка часу": pd.to_datetime(stamps, format="%d.%m.%Y %H:%M"),
+                         "Відповідь": answers if answers is not None else list(range(len(keys)))})
+
+
+def _reference(df, by=(KEY,)):
+    """Перебором: у кожній групі - найпізніша позначка, при рівності - нижчий рядок."""
+    best = {}
+    for pos in range(len(df)):
+        group = tuple(df[col].iloc[pos] for col in by)
+        stamp = df["Позначка часу"].iloc[pos]
+        stamp = pd.Timestamp.min if pd.isna(stamp) else stamp
+        if group not in best or stamp >= best[group][0]: best[group] = (stamp, pos)
+    return df.iloc[sorted(pos for _, pos in best.values())]
+
+
+def test_latest_submission_wins_and_order_is_kept():
+    df = _forms([1, 2, 1, 3], ["05.03.2025 10:00", "01.03.2025 10:00", "01.03.2025 09:00", "02.03.2025 10:00"])
+    assert data_manager._keep_latest(df)["Відповідь"].tolist() == [0, 1, 3]
+
+
+def test_equal_timestamps_keep_the_lower_row():
+    df = _forms([7, 7, 7], ["01.03.2025 10:00"] * 3, ["перша", "друга", "третя"])
+    assert data_manager._keep_latest(df)["Відповідь"].tolist() == ["третя"]
+
+
+def test_missing_timestamp_is_the_oldest():
+    df = _forms([7, 7, 8, 8], ["01.03.2025 10:00", None, None, None], ["з часом", "без часу", "a", "b"])
+    assert data_manager._keep_latest(df)["Відповідь"].tolist() == ["з часом", "b"]
+
+
+def test_corrections_keep_latest_per_patient_and_field():
+    df = _forms([1, 1, 1, 2], ["01.03.2025 10:00", "01.03.2025 10:00", "02.03.2025 10:00", "01.03.2025 10:00"],
+                [5.0, 6.0, 130.0, 7.0])
+    df["field"] = ["chol", "chol", "waist", "chol"]
+    kept = data_manager._keep_latest(df, "corrections", by=(KEY, "field"))
+    assert kept["Відповідь"].tolist() == [6.0, 130.0, 7.0]
+
+
+def test_matches_brute_force_and_incremental_combine():
+    rng = np.random.default_rng(0)
+    n = 500
+    stamps = pd.Series(pd.to_datetime("2025-03-01") + pd.to_timedelta(rng.integers(0, 5, n), unit="h"))
+    stamps[rng.random(n) < 0.1] = pd.NaT
+    df = pd.DataFrame({KEY: rng.integers(0, 60, n).astype(np.int64), "Позначка часу": stamps,
+                       "Відповідь": np.arange(n)})
+    expected = _reference(df)
+    assert data_manager._keep_latest(df)["Відповідь"].tolist() == expected["Відповідь"].tolist()
+    # Дописані відповіді (дельта) дають ті самі рядки, що й повний перерахунок
+    head = data_manager._keep_latest(df.iloc[:400])
+    combined = data_manager._combine_latest(head, df.iloc[400:])
+    assert sorted(combined["Відповідь"]) == sorted(expected["Відповідь"])
@@ -0,0 +1,69 @@
+from itertools import chain
+
+import numpy as np
+import pytest
+
+from benchmarks import synthetic
+from modules import corrections, data_manager
+
+# ==========================================
+# РЕЄСТР ПОХІДНИХ КОЛОНОК
+# ==========================================
+# Виправлення поля перераховує лише похідні колонки, що від нього залежать,
+# і лише в рядках виправлених пацієнтів - з тим самим результатом, що й повний перерахунок.
+
+SCORE2 = ("Verdict_Score2",)
+FINDRISK = ("Score_FINDRISK", "Verdict_FINDRISK")
+
+
+@pytest.fixture(scope="module")
+def cohort(tmp_path_factory):
+    paths = synthetic.write(str(tmp_path_factory.mktemp("forms")), 200)
+    return data_manager.process_sources(paths["doctor"], paths["patient"], paths["corrections"])
+
+
+def _spy(spec, computed):
+    compute = spec["compute"]
+
+    def wrapper(df):
+        computed.append(spec["outputs"])
+        return compute(df)
+    return wrapper
+
+
+@pytest.mark.parametrize("field_id, value, expected", [
+    ("chol", 9.5, SCORE2),
+    ("sbp", 190.0, SCORE2),
+    ("waist", 130.0, FINDRISK),
+])
+def test_correction_recomputes_only_dependent_columns(cohort, monkeypatch, field_id, value, expected):
+    registry = data_manager.derived_columns(cohort.columns)
+    computed = []
+    for spec in registry:
+        monkeypatch.setitem(spec, "compute", _spy(spec, computed))
+
+    df = cohort.copy()
+    column = corrections.columns_for(tuple(df.columns))[field_id]
+    positions = np.flatnonzero(df["Status_Doctor_Done"].to_numpy(dtype=bool))[:5]
+    df[column] = corrections.set_cells(df[column], positions, np.full(len(positions), value))
+    result = data_manager._rescore(df, positions, {field_id})
+
+    assert computed == [expected]
+    outputs = set(chain.from_iterable(spec["outputs"] for spec in registry))
+    for col in outputs - set(expected):
+        assert result[col].equals(cohort[col]), col
+    # Інші пацієнти - без змін, виправлені - як при перерахунку всієї колонки
+    others = np.setdiff1d(np.arange(len(df)), positions)
+    full = data_manager.recompute_derived(df.copy(), outputs=expected)
+    for col in expected:
+        assert result[col].iloc[others].equals(cohort[col].iloc[others]), col
+        assert result[col].equals(full[col]), col
+
+
+def test_unrelated_field_recomputes_nothing(cohort, monkeypatch):
+    computed = []
+    for spec in data_manager.derived_columns(cohort.columns):
+        monkeypatch.setitem(spec, "compute", _spy(spec, computed))
+    result = data_manager.recompute_derived(cohort.copy(), positions=[0, 1], changed={"ПІБ"})
+    assert computed == []
+    assert result.equals(cohort)
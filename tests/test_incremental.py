@@ -0,0 +1,125 @@
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic
+from modules import data_manager, ingest, journal, linkage, snapshot, timings
+
+# ==========================================
+# ІНКРЕМЕНТАЛЬНЕ ОНОВЛЕННЯ = ПОВНА ПЕРЕБУДОВА
+# ==========================================
+# Після дописаних анкет, повторної відповіді і виправлень з журналу таблиця,
+# зібрана з частин (_build_processed_data), має бути тією ж, що й повна обробка
+# тих самих CSV (process_sources + compact_cohort): ті самі рядки, значення і типи -
+# і в тому самому процесі, і після перезапуску зі знімка.
+
+ROWS = 300
+HEAD = 0.9   # яку частину анкет видно до першої побудови
+KEY = data_manager.KEY
+
+
+@pytest.fixture
+def sheets(tmp_path, monkeypatch):
+    # Свої знімок, журнал і пари - робочі файли застосунку тест не чіпає
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path / "snapshot"))
+    monkeypatch.setattr(journal, "JOURNAL_FILE", str(tmp_path / "journal.db"))
+    monkeypatch.setattr(linkage, "LINKS_FILE", str(tmp_path / "links.json"))
+    monkeypatch.setattr(linkage, "_LINKS", None)
+    # Знімок пишемо явно, без фонового потоку
+    monkeypatch.setattr(data_manager, "_schedule_snapshot", lambda: None)
+    for conf in data_manager.FORMS_CONFIG:
+        monkeypatch.setitem(conf, "url", conf["url"])
+    monkeypatch.setattr(data_manager, "url_corrections", data_manager.url_corrections)
+
+    frames = dict(zip(("doctor", "patient", "corrections"), synthetic.generate(ROWS)))
+    paths = {name: str(tmp_path / f"{name}.csv") for name in frames}
+    for name, df in frames.items():
+        df.head(int(len(df) * HEAD)).to_csv(paths[name], index=False)
+    for source_id, name in (("doctor_form", "doctor"), ("patient_form", "patient"), ("corrections", "corrections")):
+        data_manager.set_source_url(source_id, paths[name])
+    _restart()
+    yield frames, paths
+    _restart()
+
+
+def _restart():
+    """Стан процесу як після перезапуску (файли на диску лишаються)."""
+    data_manager._PROCESSED_STATE.clear()
+    data_manager._PENDING.clear()
+    data_manager._CURRENT = None
+    data_manager._WARM_START_DONE = False
+    ingest.reset_state()
+
+
+def _build():
+    data_manager.invalidate()
+    with timings.run("тест"):
+        return data_manager._build_processed_data()
+
+
+def _append(frames, paths):
+    """Дописує решту анкет і повторну відповідь пацієнта з іншими відповідями."""
+    for name, df in frames.items():
+        df.iloc[int(len(df) * HEAD):].to_csv(paths[name], index=False, header=False, mode="a")
+    patient = frames["patient"]
+    again = patient.iloc[[3]].copy()
+    answers = [c for c in patient.columns if c not in ("Позначка часу", "ПІБ", "Дата народження")]
+    again[answers] = patient.iloc[[4]][answers].to_numpy()
+    again["Позначка часу"] = "01.01.2030 10:00:00"
+    again.to_csv(paths["patient"], index=False, header=False, mode="a")
+
+
+def _assert_matches_full_rebuild(inc, paths):
+    full = data_manager.process_sources(paths["doctor"], paths["patient"], paths["corrections"], journal=True)
+    full, _ = data_manager.compact_cohort(full)
+    assert list(inc.columns) == list(full.columns)
+    assert inc[KEY].tolist() == full[KEY].tolist()
+    for col in full.columns:
+        assert str(inc[col].dtype) == str(full[col].dtype), col
+        a, b = inc[col].astype(object), full[col].astype(object)
+        same = (a == b) | (a.isna() & b.isna())
+        assert same.all(), f"{col}: {int((~same).sum())} рядків відрізняються"
+
+
+def test_incremental_refresh_matches_full_rebuild(sheets):
+    frames, paths = sheets
+    first = _build()
+    _append(frames, paths)
+    inc = _build()
+    assert len(inc) > len(first)
+    journal.add(int(inc[KEY].iloc[5]), "waist", 130.0)
+    journal.add(int(inc[KEY].iloc[7]), "sex", "жінка")
+    _assert_matches_full_rebuild(_build(), paths)
+
+
+def test_incremental_refresh_after_warm_start_matches_full_rebuild(sheets):
+    frames, paths = sheets
+    first = _build()
+    journal.add(int(first[KEY].iloc[5]), "waist", 130.0)
+    _build()
+    data_manager._save_snapshot()
+
+    _restart()
+    data_manager._warm_start()
+    assert data_manager._CURRENT is not None
+    _append(frames, paths)
+    journal.add(int(first[KEY].iloc[7]), "sex", "жінка")
+    _assert_matches_full_rebuild(_build(), paths)
+
+
+def test_invalidate_during_fetch_is_not_lost(sheets, monkeypatch):
+    _build()
+    fetch = ingest.fetch_csv
+
+    def fetch_and_click(source_id, url, **kwargs):
+        snap = fetch(source_id, url, **kwargs)
+        # "Перевірити нові відповіді" натиснули, поки джерело ще качалось
+        if source_id == "doctor_form": data_manager.invalidate("doctor_form")
+        return snap
+    monkeypatch.setattr(ingest, "fetch_csv", fetch_and_click)
+    _build()
+    assert data_manager._needs_fetch("doctor_form")
+    assert not data_manager._needs_fetch("patient_form")
+
+    monkeypatch.setattr(ingest, "fetch_csv", fetch)
+    data_manager._build_processed_data()
+    assert not data_manager._needs_fetch("doctor_form")
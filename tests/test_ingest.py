@@ -0,0 +1,129 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from modules import ingest
+
+# ==========================================
+# ІНКРЕМЕНТАЛЬНЕ ЗАВАНТАЖЕННЯ ЧЕРЕЗ ЛОКАЛЬНИЙ HTTP-СЕРВЕР
+# ==========================================
+# Сервер поводиться як Google Sheets: віддає поточний CSV з ETag і
+# Last-Modified, на умовний запит з тим самим валідатором - 304.
+
+HEADER = "Позначка часу,ПІБ\r\n".encode("utf-8")
+ROWS = ["01.01.2025 10:00:00,Іван Петренко\r\n", "02.01.2025 10:00:00,Олена Коваль\r\n"]
+
+
+class _Sheet:
+    def __init__(self):
+        self.body = b""
+        self.version = 0
+        self.use_etag = True
+        self.requests = []   # (If-None-Match, If-Modified-Since, статус)
+
+    def publish(self, body):
+        self.body = body
+        self.version += 1
+
+
+def _handler(sheet):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            etag = f'"v{sheet.version}"' if sheet.use_etag else None
+            modified = f"Wed, 01 Jan 2025 00:00:{sheet.version:02d} GMT"
+            not_modified = (etag and self.headers.get("If-None-Match") == etag) or \
+                           (not sheet.use_etag and self.headers.get("If-Modified-Since") == modified)
+            status = 304 if not_modified else 200
+            sheet.requests.append((self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since"), status))
+            self.send_response(status)
+            if etag: self.send_header("ETag", etag)
+            self.send_header("Last-Modified", modified)
+            if status == 200:
+                self.send_header("Content-Length", str(len(sheet.body)))
+            self.end_headers()
+            if status == 200: self.wfile.write(sheet.body)
+
+        def log_message(self, *args):
+            pass
+    return Handler
+
+
+@pytest.fixture
+def sheet():
+    sheet = _Sheet()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(sheet))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sheet.url = f"http://127.0.0.1:{server.server_address[1]}/sheet.csv"
+    ingest.reset_state()
+    yield sheet
+    ingest.reset_state()
+    server.shutdown()
+    server.server_close()
+
+
+def _csv(*rows):
+    return HEADER + "".join(rows).encode("utf-8")
+
+
+def test_first_fetch_is_full(sheet):
+    sheet.publish(_csv(ROWS[0]))
+    snap = ingest.fetch_csv("s", sheet.url)
+    assert snap["body"] == sheet.body
+    assert snap["prev_digest"] is None and snap["delta_offset"] is None
+    assert len(ingest.parse_csv(snap["body"])) == 1
+
+
+def test_not_modified_uses_etag(sheet):
+    sheet.publish(_csv(ROWS[0]))
+    first = ingest.fetch_csv("s", sheet.url)
+    again = ingest.fetch_csv("s", sheet.url)
+    assert sheet.requests[-1] == ('"v1"', "Wed, 01 Jan 2025 00:00:01 GMT", 304)
+    assert again["body"] == first["body"] and again["digest"] == first["digest"] == again["prev_digest"]
+    assert again["delta_offset"] is None
+
+
+def test_not_modified_uses_last_modified(sheet):
+    sheet.use_etag = False
+    sheet.publish(_csv(ROWS[0]))
+    ingest.fetch_csv("s", sheet.url)
+    again = ingest.fetch_csv("s", sheet.url)
+    assert sheet.requests[-1] == (None, "Wed, 01 Jan 2025 00:00:01 GMT", 304)
+    assert again["digest"] == again["prev_digest"]
+
+
+def test_appended_rows_are_a_delta(sheet):
+    sheet.publish(_csv(ROWS[0]))
+    first = ingest.fetch_csv("s", sheet.url)
+    sheet.publish(_csv(*ROWS))
+    snap = ingest.fetch_csv("s", sheet.url)
+    assert snap["prev_digest"] == first["digest"]
+    assert snap["delta_offset"] == len(first["body"])
+    delta = ingest.parse_csv(snap["body"][snap["delta_offset"]:], ["Позначка часу", "ПІБ"])
+    assert delta["ПІБ"].tolist() == ["Олена Коваль"]
+
+
+def test_rewritten_rows_fall_back_to_full(sheet):
+    sheet.publish(_csv(*ROWS))
+    ingest.fetch_csv("s", sheet.url)
+    sheet.publish(_csv(ROWS[0].replace("Іван", "Іванна"), ROWS[1]))
+    snap = ingest.fetch_csv("s", sheet.url)
+    assert snap["delta_offset"] is None and snap["digest"] != snap["prev_digest"]
+
+
+def test_truncated_sheet_falls_back_to_full(sheet):
+    sheet.publish(_csv(*ROWS))
+    ingest.fetch_csv("s", sheet.url)
+    sheet.publish(_csv(ROWS[0]))
+    snap = ingest.fetch_csv("s", sheet.url)
+    assert snap["delta_offset"] is None
+    assert len(ingest.parse_csv(snap["body"])) == 1
+
+
+def test_reset_state_forgets_versions(sheet):
+    sheet.publish(_csv(ROWS[0]))
+    ingest.fetch_csv("s", sheet.url)
+    ingest.reset_state("s")
+    snap = ingest.fetch_csv("s", sheet.url)
+    assert sheet.requests[-1] == (None, None, 200)
+    assert snap["prev_digest"] is None
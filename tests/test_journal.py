@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from modules import journal
+
+# ==========================================
+# ЛОКАЛЬНИЙ ЖУРНАЛ ВИПРАВЛЕНЬ
+# ==========================================
+
+
+@pytest.fixture
+def journal_file(tmp_path, monkeypatch):
+    path = tmp_path / "corrections_journal.db"
+    monkeypatch.setattr(journal, "JOURNAL_FILE", str(path))
+    return path
+
+
+def test_missing_journal_is_empty(journal_file):
+    assert journal.version() == 0
+    entries = journal.latest()
+    assert entries.empty and list(entries.columns) == journal.ENTRY_COLUMNS
+    assert not journal_file.exists()
+
+
+def test_ids_grow_and_version_follows_them(journal_file):
+    first = journal.add(1, "chol", 5.2, patient="Петренко Іван", author="лікар")
+    second = journal.add(np.int64(2), "sbp", np.float64(140.0))
+    assert second["id"] > first["id"]
+    assert journal.version() == second["id"]
+    assert second["value"] == 140.0 and type(second["value"]) is float
+
+
+def test_latest_keeps_newest_value_per_patient_and_field_in_entry_order(journal_file):
+    journal.add(2, "chol", 5.0)
+    journal.add(1, "sex", "жінка")
+    journal.add(2, "chol", 6.5)      # та сама секунда - вирішує порядок внесення
+    journal.add(1, "waist", 90)
+    entries = journal.latest()
+    assert entries[["patient_key", "field", "value"]].values.tolist() == [
+        [1, "sex", "жінка"], [2, "chol", 6.5], [1, "waist", 90]]
+    assert entries["id"].is_monotonic_increasing
+
+
+def test_latest_since_returns_only_newer_changes(journal_file):
+    journal.add(1, "chol", 5.0)
+    journal.add(2, "sbp", 120)
+    seen = journal.version()
+    journal.add(1, "chol", 7.0)
+    journal.add(3, "waist", 101)
+    entries = journal.latest(since=seen)
+    assert entries[["patient_key", "field", "value"]].values.tolist() == [[1, "chol", 7.0], [3, "waist", 101]]
+    assert journal.latest(since=journal.version()).empty
@@ -0,0 +1,85 @@
+import json
+
+import pandas as pd
+import pytest
+
+from modules import data_manager, linkage, patient_index
+
+# ==========================================
+# МОЖЛИВІ ЗБІГИ І РІШЕННЯ ЛІКАРІВ
+# ==========================================
+
+KEY = patient_index.KEY_COLUMN
+
+
+@pytest.fixture
+def links_file(tmp_path, monkeypatch):
+    path = tmp_path / "patient_links.json"
+    monkeypatch.setattr(linkage, "LINKS_FILE", str(path))
+    monkeypatch.setattr(linkage, "_LINKS", None)
+    monkeypatch.setattr(linkage, "_PROPOSALS", [])
+    return path
+
+
+def _cohort(rows):
+    """rows: (ПІБ, дата народження, лікар заповнив, пацієнт заповнив)."""
+    names = [r[0] for r in rows]
+    dobs = pd.to_datetime([r[1] for r in rows], format="%d.%m.%Y")
+    return pd.DataFrame({KEY: patient_index.patient_ids(names, dobs), "ПІБ": names, "Дата народження": dobs,
+                         "Status_Doctor_Done": [r[2] for r in rows], "Status_Patient_Done": [r[3] for r in rows]})
+
+
+def test_propose_pairs_typos_with_same_birth_date(links_file):
+    df = _cohort([("Петренко Іван Олегович", "01.02.1970", True, False),
+                  ("Петренко Iван Олеговчи", "01.02.1970", False, True),   # латинська I і описка
+                  ("Коваль Олена Петрівна", "03.04.1965", True, False),
+                  ("Коваль Олена Петрівна", "04.03.1965", False, True),    # інша дата - інший блок
+                  ("Шевчук Андрій Ігорович", "01.02.1970", False, True)])  # та сама дата, інше ПІБ
+    proposals = linkage.propose(df)
+    assert list(proposals.columns) == linkage.PROPOSAL_COLUMNS
+    assert proposals[["doctor_name", "patient_name"]].values.tolist() == [
+        ["Петренко Іван Олегович", "Петренко Iван Олеговчи"]]
+    assert proposals["score"].iloc[0] >= linkage.MATCH_THRESHOLD
+
+
+def test_each_row_is_proposed_once_best_match_first(links_file):
+    df = _cohort([("Петренко Іван Олегович", "01.02.1970", True, False),
+                  ("Петренко Іван Олеговчи", "01.02.1970", False, True),
+                  ("Петренко Іван Олегови", "01.02.1970", False, True)])
+    proposals = linkage.propose(df)
+    assert len(proposals) == 1
+    assert proposals["patient_name"].iloc[0] == "Петренко Іван Олегови"
+
+
+def test_decisions_are_saved_and_read_back(links_file):
+    df = _cohort([("Петренко Іван Олегович", "01.02.1970", True, False),
+                  ("Петренко Iван Олеговчи", "01.02.1970", False, True)])
+    doctor_key, patient_key = (int(k) for k in df[KEY])
+    linkage.reject(doctor_key, patient_key)
+    assert linkage.propose(df).empty
+    linkage.confirm(doctor_key, patient_key)
+
+    saved = json.loads(links_file.read_text(encoding="utf-8"))
+    assert saved == {"confirmed": {str(patient_key): doctor_key}, "rejected": [[doctor_key, patient_key]]}
+    # Новий процес читає рішення з файлу
+    linkage._LINKS = None
+    links = linkage.load_links()
+    assert links["confirmed"] == {patient_key: doctor_key}
+    assert links["rejected"] == {(doctor_key, patient_key)}
+    assert linkage.linked_keys({patient_key}) == {patient_key, doctor_key}
+
+
+def test_resubmission_under_doctor_spelling_stays_one_row(links_file):
+    doctor = _cohort([("Петренко Іван Олегович", "01.02.1970", True, False)])
+    typo = _cohort([("Петренко Iван Олеговчи", "01.02.1970", False, True)])
+    linkage.confirm(int(doctor[KEY].iloc[0]), int(typo[KEY].iloc[0]))
+
+    # Перша анкета пацієнта - з опискою, повторна - вже так, як записав лікар
+    patient = pd.concat([typo, doctor.assign(Status_Doctor_Done=False, Status_Patient_Done=True)], ignore_index=True)
+    patient["Позначка часу"] = pd.to_datetime(["01.03.2025 10:00", "05.03.2025 10:00"], format="%d.%m.%Y %H:%M")
+    patient["Відповідь"] = ["перша", "повторна"]
+    merged = data_manager._merge_forms([doctor.drop(columns="Status_Patient_Done"),
+                                        patient.drop(columns="Status_Doctor_Done")])
+    assert merged[KEY].tolist() == doctor[KEY].tolist()
+    assert merged["Відповідь"].tolist() == ["повторна"]
+    assert merged[["Status_Doctor_Done", "Status_Patient_Done"]].values.tolist() == [[True, True]]
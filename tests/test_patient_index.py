@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from modules import dates, patient_index
+
+# ==========================================
+# ПОШУК ПАЦІЄНТІВ ЗА ІНДЕКСОМ
+# ==========================================
+
+
+def _cohort(rows):
+    return pd.DataFrame({"ПІБ": [r[0] for r in rows],
+                         "Дата народження": pd.to_datetime([r[1] for r in rows], format="%d.%m.%Y")})
+
+
+COHORT = _cohort([("Коваленко Петро Іванович", "01.02.1970"),
+                  ("Петренко Іван Олегович", "03.04.1965"),
+                  ("Петрук Олена Василівна", "05.06.1980"),
+                  ("Іваненко Марія Петрівна", "07.08.1975"),
+                  ("  петренко   іван олегович ", "03.04.1965")])   # той самий пацієнт, інше написання
+
+
+def test_same_patient_written_differently_is_one_entry():
+    index = patient_index.get_index(COHORT)
+    assert len(index["ordered"]) == 4
+    assert index["positions"]["петренко іван олегович|03.04.1965"] == 1
+
+
+def test_prefix_matches_come_before_substring_matches():
+    index = patient_index.get_index(COHORT)
+    found = patient_index.search(index, "Петр")
+    # Спершу ті, що починаються з запиту (за ключем), далі - ті, що лише містять його (за алфавітом)
+    assert found == ["петренко іван олегович|03.04.1965", "петрук олена василівна|05.06.1980",
+                     "іваненко марія петрівна|07.08.1975", "коваленко петро іванович|01.02.1970"]
+
+
+def test_query_is_normalized_and_matches_birth_date():
+    index = patient_index.get_index(COHORT)
+    assert patient_index.search(index, "  ПЕТРУК  ") == ["петрук олена василівна|05.06.1980"]
+    assert patient_index.search(index, "Пeтрук") == ["петрук олена василівна|05.06.1980"]   # латинська e
+    assert patient_index.search(index, "1980") == ["петрук олена василівна|05.06.1980"]
+
+
+def test_empty_query_lists_everyone_and_limit_applies():
+    index = patient_index.get_index(COHORT)
+    assert patient_index.search(index, "") == index["ordered"]
+    assert len(patient_index.search(index, "о", limit=2)) == 2
+    assert patient_index.search(index, "нікого") == []
+
+
+def test_index_is_shared_per_frame_and_carried_over():
+    index = patient_index.get_index(COHORT)
+    assert patient_index.get_index(COHORT) is index
+    updated = COHORT.copy()
+    patient_index.carry_over(COHORT, updated)
+    assert patient_index.get_index(updated) is index
+
+
+# ==========================================
+# ЦІЛІ КЛЮЧІ ПАЦІЄНТІВ І НОРМАЛІЗАЦІЯ ПІБ
+# ==========================================
+
+TRICKY_NAMES = ["Петренко Іван", "  петренко\tіван ", "Петренкo Iван", "Д’Артаньян Шарль", "Д`артаньян шарль",
+                "Ли Сон Хо", "Müller Jürgen", "ΑΘΗΝΑ", "O'Neil Anna", "", None, 123]
+
+
+def test_normalize_names_matches_single_name_version():
+    expected = ["" if name is None else patient_index.normalize_name(name) for name in TRICKY_NAMES]
+    assert patient_index.normalize_names(TRICKY_NAMES).tolist() == expected
+
+
+def test_normalize_names_matches_on_random_strings():
+    rng = np.random.default_rng(0)
+    alphabet = list("абвгґдеєжзиіїйкАБВІЇЄabcehikmoptxyABCEHKMOPTX '’ʼ`‘-\t\n  ßΣÅ")
+    names = ["".join(rng.choice(alphabet, rng.integers(0, 20))) for _ in range(2000)]
+    assert patient_index.normalize_names(names).tolist() == [patient_index.normalize_name(n) for n in names]
+
+
+def test_patient_ids_ignore_spelling_but_not_birth_date():
+    dobs = pd.to_datetime(["03.04.1965", "03.04.1965", "03.04.1965", "04.03.1965"], format="%d.%m.%Y")
+    keys = patient_index.patient_ids(["Петренко Іван", "  петренко  iван", "Петренко Іванна", "Петренко Іван"], dobs)
+    assert keys.dtype == np.int64
+    assert keys[0] == keys[1] and len(set(keys[[0, 2, 3]])) == 3
+    # Ключ рядка не залежить від сусідніх рядків - той самий у кожному джерелі й оновленні
+    assert patient_index.patient_ids(["Петренко Іван"], dobs[:1])[0] == keys[0]
+
+
+def test_missing_birth_date_is_not_the_epoch():
+    # fillna(0) у сирих формах: 0 замість дати - це NaT, а не 01.01.1970
+    dobs = dates.birth_dates(pd.Series([0, "0", np.nan, "01.01.1970"], dtype=object))
+    assert dobs.isna().tolist() == [True, True, True, False]
+    keys = patient_index.patient_ids(["Петренко Іван"] * 4, dobs)
+    assert keys[0] == keys[1] == keys[2] != keys[3]
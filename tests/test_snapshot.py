@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from modules import snapshot
+
+
+def _mixed_frame():
+    # Відповіді анкет: текст, 0 після fillna(0), текстова "0" і пропуски після злиття
+    answers = pd.Series(["Так", 0, "0", np.nan, "Ні"], dtype=object)
+    return pd.DataFrame({"answers": answers, "answers_cat": answers.astype("category"),
+                         "names": ["А", "Б", "В", "Г", "Ґ"], "numbers": [0, 1, 2, 3, 4],
+                         "codes": pd.Series([0, 0, 1, 2, 0], dtype=object)})
+
+
+def _cells(series):
+    """Значення разом з типом (0 і "0" - різні), пропуски окремо."""
+    return [None if pd.isna(v) else (type(v).__name__, v) for v in series.astype(object)]
+
+
+def test_snapshot_keeps_mixed_column_types(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    frame = _mixed_frame()
+    snapshot.save({"frame": frame}, {"note": "тест"}, {"raw": b"csv"})
+    frames, blobs, meta = snapshot.load()
+    restored = frames["frame"]
+    assert list(restored.columns) == list(frame.columns)
+    for col in frame.columns:
+        assert str(restored[col].dtype) == str(frame[col].dtype), col
+        assert _cells(restored[col]) == _cells(frame[col]), col
+    assert blobs == {"raw": b"csv"} and meta["note"] == "тест"
+
+
+def test_snapshot_of_other_version_is_ignored(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    snapshot.save({"frame": _mixed_frame()}, {})
+    monkeypatch.setattr(snapshot, "SNAPSHOT_VERSION", snapshot.SNAPSHOT_VERSION + 1)
+    assert snapshot.load() is None